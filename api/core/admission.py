@@ -0,0 +1,89 @@
+"""
+Admission control and load shedding.
+
+Requests are grouped into route classes by cost. When event-loop lag or the
+in-flight count of a class crosses its threshold, requests of that class are
+rejected early with 503 and Retry-After, starting with the most expensive
+classes. Health checks are never shed.
+"""
+import logging
+import math
+from typing import Any, Dict, Optional
+
+from api.core.config import settings
+from api.core.profiling import get_loop_monitor
+
+logger = logging.getLogger(__name__)
+
+CRITICAL = "critical"
+CHEAP = "cheap"
+NORMAL = "normal"
+LOW = "low"
+
+# Checked in order; the first matching prefix decides the class
+_LOW_PRIORITY_PREFIXES = ("/scrape", "/parse-pdf", "/store-data/bulk", "/bank/statements/pdf", "/bank/batch")
+_CRITICAL_PATHS = {"/", "/health"}
+# /bank routes that cost more than an in-memory lookup (a database round trip)
+_NORMAL_PATHS = {"/bank/balances/history"}
+
+def classify(path: str) -> str:
+    """Map a request path to its route class"""
+    if path in _CRITICAL_PATHS:
+        return CRITICAL
+    if path.startswith(_LOW_PRIORITY_PREFIXES):
+        return LOW
+    if path.startswith("/bank/statements/") and path.endswith(".pdf"):
+        return LOW
+    if path in _NORMAL_PATHS:
+        return NORMAL
+    if path.startswith(("/bank", "/debug")):
+        return CHEAP
+    return NORMAL
+
+class AdmissionController:
+    """Tracks in-flight work per route class and decides whether to admit a request"""
+
+    def __init__(self):
+        self.inflight: Dict[str, int] = {CRITICAL: 0, CHEAP: 0, NORMAL: 0, LOW: 0}
+        self.shed: Dict[str, int] = {CRITICAL: 0, CHEAP: 0, NORMAL: 0, LOW: 0}
+
+    def _limits(self, route_class: str):
+        """(max in-flight, max loop lag in ms) for a class; None means unlimited"""
+        if route_class == LOW:
+            return settings.ADMISSION_MAX_INFLIGHT_LOW, settings.ADMISSION_LOW_PRIORITY_LAG_MS
+        if route_class == NORMAL:
+            return settings.ADMISSION_MAX_INFLIGHT_NORMAL, settings.ADMISSION_NORMAL_LAG_MS
+        if route_class == CHEAP:
+            return settings.ADMISSION_MAX_INFLIGHT_CHEAP, None
+        return None, None
+
+    def try_admit(self, route_class: str) -> Optional[str]:
+        """Admit the request and return None, or return the reason it was shed"""
+        max_inflight, max_lag_ms = self._limits(route_class)
+        if max_lag_ms is not None:
+            lag_ms = get_loop_monitor().current_lag_ms()
+            if lag_ms > max_lag_ms:
+                self.shed[route_class] += 1
+                return f"event loop lag {lag_ms:.0f}ms"
+        if max_inflight is not None and self.inflight[route_class] >= max_inflight:
+            self.shed[route_class] += 1
+            return f"{self.inflight[route_class]} {route_class} requests in flight"
+        self.inflight[route_class] += 1
+        return None
+
+    def release(self, route_class: str) -> None:
+        self.inflight[route_class] -= 1
+
+    def retry_after(self) -> int:
+        """Suggest a retry delay that grows with the current lag"""
+        lag_seconds = get_loop_monitor().current_lag_ms() / 1000
+        return max(settings.ADMISSION_RETRY_AFTER_SECONDS, math.ceil(lag_seconds * 2))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lag_ms": round(get_loop_monitor().current_lag_ms(), 2),
+            "inflight": dict(self.inflight),
+            "shed": dict(self.shed),
+        }
+
+admission_controller = AdmissionController()
@@ -0,0 +1,340 @@
+"""
+Negotiated response compression.
+
+An ASGI middleware that compresses response bodies with zstd, brotli or gzip,
+whichever the client accepts and the server prefers (COMPRESSION_ENCODINGS).
+Complete bodies below COMPRESSION_MIN_BYTES, already-compressed content types
+and responses that already carry a Content-Encoding pass through untouched.
+Streamed bodies (StreamingResponse, FileResponse) are compressed chunk by
+chunk as they are sent.
+
+brotli and zstd need the optional brotli and zstandard packages; encodings
+whose package is missing are simply not offered. gzip is always available.
+"""
+import asyncio
+import logging
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Content types that are already compressed or must not be buffered
+_SKIP_TYPE_PREFIXES = ("image/", "video/", "audio/", "font/woff", "text/event-stream")
+_SKIP_TYPES = {
+    "application/zip", "application/gzip", "application/x-gzip", "application/zstd",
+    "application/x-bzip2", "application/x-xz", "application/x-7z-compressed", "application/x-rar-compressed",
+}
+# Bodies with a known Content-Length up to this size are gathered and compressed
+# in one go, even when they arrive in chunks (BaseHTTPMiddleware re-streams every response)
+_BUFFER_MAX_BYTES = 4 * 1024 * 1024
+# Complete bodies above this size are compressed off the event loop (the codecs release the GIL)
+_THREAD_MIN_BYTES = 256 * 1024
+
+class GzipCodec:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self) -> "_Stream":
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return _Stream(compressor.compress, compressor.flush)
+
+class BrotliCodec:
+    name = "br"
+
+    def __init__(self, quality: int):
+        import brotli
+        self._brotli = brotli
+        self.quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.compress(data, quality=self.quality)
+
+    def stream(self) -> "_Stream":
+        compressor = self._brotli.Compressor(quality=self.quality)
+        return _Stream(compressor.process, compressor.finish)
+
+class ZstdCodec:
+    """
+    zstd with a per-worker pool of compression contexts. A context holds
+    several hundred KB of tables, so it is reused across responses instead of
+    being set up for each one; a context serves one response at a time.
+    """
+    name = "zstd"
+
+    def __init__(self, level: int, pool_size: int = 8):
+        import zstandard
+        self._zstandard = zstandard
+        self.level = level
+        self.pool_size = pool_size
+        self._pool: List[Any] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            if self._pool:
+                return self._pool.pop()
+        return self._zstandard.ZstdCompressor(level=self.level)
+
+    def _release(self, context) -> None:
+        with self._lock:
+            if len(self._pool) < self.pool_size:
+                self._pool.append(context)
+
+    def compress(self, data: bytes) -> bytes:
+        context = self._acquire()
+        try:
+            return context.compress(data)
+        finally:
+            self._release(context)
+
+    def stream(self) -> "_Stream":
+        context = self._acquire()
+        compressor = context.compressobj()
+
+        def finish() -> bytes:
+            tail = compressor.flush()
+            self._release(context)
+            return tail
+
+        # A stream abandoned before finish() just drops its context
+        return _Stream(compressor.compress, finish)
+
+class _Stream:
+    """Incremental compressor for one streamed response"""
+
+    def __init__(self, compress, finish):
+        self.compress = compress
+        self.finish = finish
+
+def _build_codecs(names: Sequence[str]) -> Dict[str, Any]:
+    """Codecs for the configured encodings, in preference order, skipping missing packages"""
+    factories = {
+        "zstd": lambda: ZstdCodec(settings.COMPRESSION_ZSTD_LEVEL),
+        "br": lambda: BrotliCodec(settings.COMPRESSION_BROTLI_QUALITY),
+        "gzip": lambda: GzipCodec(settings.COMPRESSION_GZIP_LEVEL),
+    }
+    codecs = {}
+    for name in names:
+        if name not in factories:
+            logger.warning(f"Unknown compression encoding: {name}")
+            continue
+        try:
+            codecs[name] = factories[name]()
+        except ImportError:
+            logger.info(f"Compression encoding {name} unavailable (package not installed)")
+    return codecs
+
+def negotiate(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+    """
+    The encoding to use for an Accept-Encoding header: the highest q-value
+    among available encodings, ties going to the earlier (preferred) one.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+    best, best_q = None, 0.0
+    for name in available:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+class CompressionStats:
+    """Bytes in and out, and time spent compressing, per encoding"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encodings: Dict[str, Dict[str, float]] = {}
+        self.skipped: Dict[str, int] = {}
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, seconds: float, responses: int = 0) -> None:
+        with self._lock:
+            entry = self.encodings.setdefault(encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0})
+            entry["responses"] += responses
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["seconds"] += seconds
+
+    def record_skip(self, reason: str) -> None:
+        with self._lock:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            encodings = {}
+            for name, entry in self.encodings.items():
+                encodings[name] = {
+                    **entry,
+                    "seconds": round(entry["seconds"], 4),
+                    "ratio": round(entry["bytes_out"] / entry["bytes_in"], 3) if entry["bytes_in"] else None,
+                    "mb_per_second": round(entry["bytes_in"] / entry["seconds"] / 1e6, 1) if entry["seconds"] else None,
+                }
+            return {"encodings": encodings, "skipped": dict(self.skipped)}
+
+compression_stats = CompressionStats()
+
+def _header(headers: List[Any], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+def _skip_reason(status: int, headers: List[Any]) -> Optional[str]:
+    """Why a response must not be compressed, or None"""
+    if status < 200 or status in (204, 304) or _header(headers, b"content-range") is not None:
+        return "status"
+    if _header(headers, b"content-encoding") is not None:
+        return "encoded"
+    content_type = (_header(headers, b"content-type") or b"").decode("latin-1").split(";")[0].strip().lower()
+    if content_type in _SKIP_TYPES or content_type.startswith(_SKIP_TYPE_PREFIXES):
+        return "content_type"
+    length = _header(headers, b"content-length")
+    if length is not None and int(length) < settings.COMPRESSION_MIN_BYTES:
+        return "small"
+    return None
+
+class CompressionMiddleware:
+    """
+    Compresses HTTP responses with the negotiated encoding. A complete body
+    is compressed before the headers go out, and the time spent is added to
+    X-Process-Time. A streamed body is compressed as its chunks arrive, and
+    that time only shows up in compression_stats.
+    """
+
+    def __init__(self, app, encodings: Optional[Sequence[str]] = None):
+        self.app = app
+        names = encodings or [name.strip() for name in settings.COMPRESSION_ENCODINGS.split(",") if name.strip()]
+        self.codecs = _build_codecs(names)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept = next((value for key, value in scope["headers"] if key == b"accept-encoding"), b"")
+        encoding = negotiate(accept.decode("latin-1"), list(self.codecs)) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self.codecs[encoding], send).run(self.app, scope, receive)
+
+class _CompressedResponse:
+    """The send() wrapper for one request"""
+
+    def __init__(self, codec, send):
+        self.codec = codec
+        self.send = send
+        self.start: Optional[Dict[str, Any]] = None
+        self.passthrough = False
+        self.stream: Optional[_Stream] = None
+        self.buffered: Optional[List[bytes]] = None
+        self.bytes_in = self.bytes_out = 0
+        self.seconds = 0.0
+
+    async def run(self, app, scope, receive) -> None:
+        await app(scope, receive, self.on_send)
+
+    async def on_send(self, message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            reason = _skip_reason(message["status"], message.get("headers", []))
+            if reason:
+                compression_stats.record_skip(reason)
+                self.passthrough = True
+                await self.send(message)
+                return
+            length = _header(message.get("headers", []), b"content-length")
+            if length is not None and int(length) <= _BUFFER_MAX_BYTES:
+                self.buffered = []
+            return
+        if self.passthrough or message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.buffered is not None:
+            self.buffered.append(body)
+            if not more_body:
+                await self._send_complete(b"".join(self.buffered))
+            return
+        if self.stream is None and not more_body:
+            await self._send_complete(body)
+            return
+        if self.stream is None:
+            self.stream = self.codec.stream()
+            await self.send(self._start_message(None))
+        started = time.perf_counter()
+        chunk = self.stream.compress(body) if body else b""
+        if not more_body:
+            chunk += self.stream.finish()
+        self.seconds += time.perf_counter() - started
+        self.bytes_in += len(body)
+        self.bytes_out += len(chunk)
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+        if not more_body:
+            compression_stats.record(self.codec.name, self.bytes_in, self.bytes_out, self.seconds, responses=1)
+
+    async def _send_complete(self, body: bytes) -> None:
+        if len(body) < settings.COMPRESSION_MIN_BYTES:
+            compression_stats.record_skip("small")
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": False})
+            return
+        started = time.perf_counter()
+        if len(body) >= _THREAD_MIN_BYTES:
+            compressed = await asyncio.to_thread(self.codec.compress, body)
+        else:
+            compressed = self.codec.compress(body)
+        elapsed = time.perf_counter() - started
+        compression_stats.record(self.codec.name, len(body), len(compressed), elapsed, responses=1)
+        await self.send(self._start_message(len(compressed), elapsed))
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+    def _start_message(self, length: Optional[int], elapsed: float = 0.0) -> Dict[str, Any]:
+        """The held response start with encoding headers; length None drops Content-Length"""
+        headers = []
+        vary = None
+        for key, value in self.start.get("headers", []):
+            name = key.lower()
+            if name == b"content-length":
+                continue
+            if name == b"vary":
+                vary = value
+                continue
+            if name == b"x-process-time" and elapsed:
+                try:
+                    value = str(float(value) + elapsed).encode()
+                except ValueError:
+                    pass
+            headers.append((key, value))
+        headers.append((b"content-encoding", self.codec.name.encode()))
+        if vary is None:
+            vary = b"Accept-Encoding"
+        elif b"accept-encoding" not in vary.lower():
+            vary += b", Accept-Encoding"
+        headers.append((b"vary", vary))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return {**self.start, "headers": headers}
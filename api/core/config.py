@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, SecretStr
+from typing import Optional
 import os
 import secrets
 
@@ -28,6 +29,145 @@ class Settings(BaseSettings):
         "http://localhost:8081"  # Added for local testing
     ]
     
+    # Read-through cache settings ("memory" or "redis")
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_TTL_SECONDS: float = 30.0
+    CACHE_MAX_ENTRIES: int = 10000
+
+    # Bulk ingestion settings for /store-data/bulk
+    BULK_CHUNK_SIZE: int = 500
+    BULK_MAX_LINE_BYTES: int = 64 * 1024
+    BULK_MAX_REPORTED_ERRORS: int = 1000
+
+    # Idempotency-Key replay window for /store-data (path defaults to FILE_PATH + ".idempotency")
+    IDEMPOTENCY_TTL_SECONDS: float = 24 * 3600
+    IDEMPOTENCY_MAX_KEYS: int = 100000
+    IDEMPOTENCY_PATH: str = ""
+
+    # Tracing: comma-separated exporters ("memory", "file", "otlp").
+    # Sample rate defaults to 1.0 in development and 0.01 in production.
+    TRACE_EXPORTERS: str = "memory"
+    TRACE_SAMPLE_RATE: Optional[float] = None
+    TRACE_BUFFER_SIZE: int = 200
+    TRACE_FILE_PATH: str = ""
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318"
+
+    # Profiling and event-loop lag monitoring. Per-request profiles (X-Profile)
+    # need hooks on every task and to_thread call, so they are off unless enabled
+    REQUEST_PROFILING_ENABLED: bool = False
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+    LOOP_LAG_MONITOR_ENABLED: bool = True
+    LOOP_LAG_INTERVAL_MS: float = 100.0
+    LOOP_LAG_THRESHOLD_MS: float = 100.0
+
+    # Admission control: shed low-priority, then normal traffic under load
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_LOW_PRIORITY_LAG_MS: float = 150.0
+    ADMISSION_NORMAL_LAG_MS: float = 500.0
+    ADMISSION_MAX_INFLIGHT_LOW: int = 8
+    ADMISSION_MAX_INFLIGHT_NORMAL: int = 64
+    ADMISSION_MAX_INFLIGHT_CHEAP: int = 256
+    ADMISSION_RETRY_AFTER_SECONDS: int = 2
+
+    # Multi-worker mode: directory for mmap'd datasets and rendered artifacts
+    # shared by all workers (e.g. /dev/shm/sahl). Empty keeps data in-process.
+    SHARED_DATA_DIR: str = ""
+    STATEMENT_PDF_CACHE_DIR: str = ""
+    # Size cap of the statement file cache; least recently used files are evicted past it
+    STATEMENT_PDF_CACHE_MAX_MB: int = 512
+
+    # PDF uploads: hard size cap enforced while streaming; uploads up to the
+    # spool size stay in memory, larger ones spill to UPLOAD_SPILL_DIR (default: system temp)
+    UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_SPOOL_MAX_BYTES: int = 2 * 1024 * 1024
+    UPLOAD_SPILL_DIR: str = ""
+
+    # Statement PDF transaction extraction (0 workers = one per CPU, up to 4;
+    # 1 runs in-process without a pool)
+    STATEMENT_EXTRACT_WORKERS: int = 0
+    STATEMENT_EXTRACT_PAGES_PER_TASK: int = 4
+
+    # Balance scraping: "http" (plain HTTP session), "selenium" (headless Chrome)
+    # or "auto" (HTTP first, Selenium when the login page needs a browser)
+    SCRAPER_BACKEND: str = "auto"
+    SCRAPER_LOGIN_URL: str = "https://www.cihnet.co.ma"
+    SCRAPER_TIMEOUT_SECONDS: float = 15.0
+    SCRAPER_SESSION_TTL_SECONDS: float = 300.0
+    # Scraped balances: how long the last one is kept for max_age reads, and the
+    # share of max_age after which a logged-in session refreshes it in the background
+    SCRAPE_CACHE_TTL_SECONDS: float = 86400.0
+    SCRAPE_REFRESH_AHEAD_FRACTION: float = 0.5
+
+    # Balance history: most points one /bank/balances/history response may hold
+    BALANCE_HISTORY_MAX_POINTS: int = 400
+
+    # FX conversion: rates are base currency units per unit, loaded from
+    # FX_RATES_PATH (CSV date,currency,rate or JSON) or stand-in rates when empty
+    FX_BASE_CURRENCY: str = "MAD"
+    FX_RATES_PATH: str = ""
+    FX_CACHE_DAYS: int = 4096
+
+    # Bank API dataset generated by generate_dataset.py (empty: built-in mock
+    # data); decoded accounts and per-token search indexes kept in memory
+    BANK_DATASET_DIR: str = ""
+    BANK_DATASET_CACHE_ACCOUNTS: int = 1024
+    BANK_DATASET_CACHE_TOKENS: int = 256
+
+    # Response compression: encodings in server preference order (br and zstd
+    # need the optional brotli / zstandard packages) and the smallest complete
+    # body worth compressing
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # Supabase resilience: per-request timeout, circuit breaker (opens after N
+    # consecutive transient failures or slow calls, probes again after the reset
+    # time) and the journal transaction writes are queued in while it is open
+    # (default FILE_PATH + ".pending"), replayed in batches every interval
+    SUPABASE_TIMEOUT_SECONDS: float = 10.0
+    DB_BREAKER_FAILURE_THRESHOLD: int = 5
+    DB_BREAKER_RESET_SECONDS: float = 15.0
+    DB_SLOW_CALL_SECONDS: float = 5.0
+    DB_JOURNAL_PATH: str = ""
+    DB_REPLAY_BATCH_SIZE: int = 500
+    DB_REPLAY_INTERVAL_SECONDS: float = 5.0
+
+    # Item webhooks: persistent delivery queue (default FILE_PATH + ".webhooks.db"),
+    # per-endpoint connection/concurrency cap, events per POST (gathered over the
+    # batch window), retry backoff, and the HMAC signing secret (default: derived
+    # from API_KEY as HMAC-SHA256(API_KEY, "webhook-signing"), never API_KEY itself)
+    WEBHOOKS_ENABLED: bool = True
+    WEBHOOK_QUEUE_PATH: str = ""
+    WEBHOOK_SIGNING_SECRET: str = ""
+    # Allow webhook URLs on loopback/private/link-local hosts (local sinks in development only)
+    WEBHOOK_ALLOW_PRIVATE_URLS: bool = False
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT: int = 4
+    WEBHOOK_MAX_INFLIGHT: int = 64
+    WEBHOOK_BATCH_MAX_EVENTS: int = 50
+    WEBHOOK_BATCH_WINDOW_SECONDS: float = 0.2
+    WEBHOOK_MAX_ATTEMPTS: int = 10
+    WEBHOOK_RETRY_BASE_SECONDS: float = 2.0
+    WEBHOOK_RETRY_MAX_SECONDS: float = 3600.0
+
+    # /bank/batch: most operations per request, and how many run at once
+    BANK_BATCH_MAX_OPERATIONS: int = 1000
+    BANK_BATCH_MAX_CONCURRENCY: int = 8
+
+    # Statements: decoded closed-period summaries kept per process, and the
+    # month-end precompute of summaries and PDFs (accounts per second; the
+    # scheduler checks for a newly closed period at least this often)
+    STATEMENT_CACHE_ENTRIES: int = 10000
+    # How many closed months back statement PDFs can be requested
+    STATEMENT_HISTORY_MONTHS: int = 24
+    STATEMENT_PRECOMPUTE_ENABLED: bool = True
+    STATEMENT_PRECOMPUTE_RATE: float = 20.0
+    STATEMENT_PRECOMPUTE_CHECK_SECONDS: float = 3600.0
+
     # Environment settings
     ENVIRONMENT: str = Field(default="development", env="ENVIRONMENT")
     
@@ -0,0 +1,319 @@
+"""
+On-demand profiling and event-loop lag monitoring.
+
+Profiles are produced by a stack sampler thread that reads sys._current_frames(),
+so it works across awaits and in worker threads without instrumenting code.
+Per-request profiles only count samples of the request's own work: the loop
+thread while one of the request's tasks is running, and executor threads while
+they run the request's asyncio.to_thread calls (see install_request_profiling,
+installed only with REQUEST_PROFILING_ENABLED).
+The background profiler samples the whole process.
+Output uses the collapsed-stack format ("frame;frame;frame count") understood by
+flamegraph.pl, speedscope and similar tools.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Our own background threads are left out of profiles
+_INTERNAL_THREADS = {"stack-sampler", "loop-lag-watchdog", "otlp-exporter", "trace-file-writer"}
+
+# The sampler profiling the request this context belongs to
+_request_sampler: contextvars.ContextVar[Optional["StackSampler"]] = contextvars.ContextVar(
+    "request_sampler", default=None
+)
+
+class StackSampler:
+    """
+    Periodically samples thread stacks and aggregates them as collapsed stacks.
+    Given the event loop, it profiles only the request it was started in (it
+    must be started and stopped in that request's task); otherwise every thread.
+    """
+
+    def __init__(self, interval: float, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.interval = interval
+        self.loop = loop
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._thread_ids: Set[int] = set()
+        self._loop_thread_id: Optional[int] = None
+        self._token: Optional[contextvars.Token] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self.started_at = time.time()
+        if self.loop is not None:
+            self._loop_thread_id = threading.get_ident()
+            self._token = _request_sampler.set(self)
+            self.own_task(asyncio.current_task(self.loop))
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        if self._token is not None:
+            _request_sampler.reset(self._token)
+            self._token = None
+        self.stopped_at = self.stopped_at or time.time()
+
+    def own_task(self, task: Optional[asyncio.Task]) -> None:
+        """Count the loop thread's samples while this task runs"""
+        if task is not None:
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def run_owned(self, fn, *args, **kwargs):
+        """Run fn in the current (executor) thread, counting the thread's samples meanwhile"""
+        thread_id = threading.get_ident()
+        self._thread_ids.add(thread_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._thread_ids.discard(thread_id)
+
+    def _owns(self, thread_id: int) -> bool:
+        if self.loop is None:
+            return True
+        if thread_id == self._loop_thread_id:
+            return asyncio.current_task(self.loop) in self._tasks
+        return thread_id in self._thread_ids
+
+    def collapsed(self) -> str:
+        """Return samples in collapsed-stack format, hottest stacks first"""
+        return "\n".join(f"{stack} {count}" for stack, count in self._counts.most_common())
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or not self._owns(thread_id):
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                if names.get(thread_id) in _INTERNAL_THREADS:
+                    continue
+                stack = _collapse(frame)
+                if stack:
+                    self._counts[f"{names.get(thread_id, thread_id)};{stack}"] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+        self.stopped_at = time.time()
+
+def _collapse(frame) -> str:
+    """Render a frame chain root-first as 'func (file:line);...'"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+class _RequestAwareExecutor(ThreadPoolExecutor):
+    """Default executor that lets a profiled request's sampler follow its to_thread calls"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        sampler = _request_sampler.get()
+        if sampler is not None:
+            return super().submit(sampler.run_owned, fn, *args, **kwargs)
+        return super().submit(fn, *args, **kwargs)
+
+def _task_factory(loop, coro, **kwargs):
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    context = kwargs.get("context")
+    sampler = context.get(_request_sampler) if context is not None else _request_sampler.get()
+    if sampler is not None:
+        sampler.own_task(task)
+    return task
+
+def install_request_profiling(loop: asyncio.AbstractEventLoop) -> None:
+    """Let per-request samplers follow the tasks and to_thread calls their request starts"""
+    if loop.get_task_factory() is None:
+        loop.set_task_factory(_task_factory)
+    else:
+        logger.warning("Event loop has a custom task factory; request profiles will miss child tasks")
+    loop.set_default_executor(_RequestAwareExecutor(thread_name_prefix="asyncio"))
+
+class ProfileStore:
+    """Keeps the most recent per-request profiles for retrieval by ID"""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def add(self, path: str, sampler: StackSampler) -> str:
+        profile_id = secrets.token_hex(8)
+        self._profiles[profile_id] = {
+            "path": path,
+            "samples": sampler.samples,
+            "duration_s": round((sampler.stopped_at or time.time()) - (sampler.started_at or time.time()), 4),
+            "collapsed": sampler.collapsed(),
+        }
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {"id": profile_id, "path": p["path"], "samples": p["samples"], "duration_s": p["duration_s"]}
+            for profile_id, p in reversed(self._profiles.items())
+        ]
+
+class BackgroundProfiler:
+    """Process-wide sampling profiler that can be switched on for a bounded time"""
+
+    def __init__(self):
+        self.sampler: Optional[StackSampler] = None
+        self._timer: Optional[threading.Timer] = None
+
+    def start(self, seconds: float, interval: float) -> None:
+        if self.sampler is not None and self.sampler.running:
+            raise RuntimeError("Profiler is already running")
+        self.sampler = StackSampler(interval)
+        self.sampler.start()
+        self._timer = threading.Timer(seconds, self.stop)
+        self._timer.daemon = True
+        self._timer.start()
+        logger.warning(f"Background profiler started for {seconds}s")
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        if self.sampler is not None and self.sampler.running:
+            self.sampler.stop()
+            logger.warning(f"Background profiler stopped after {self.sampler.samples} samples")
+
+    def status(self) -> Dict[str, Any]:
+        if self.sampler is None:
+            return {"running": False, "samples": 0}
+        return {
+            "running": self.sampler.running,
+            "samples": self.sampler.samples,
+            "started_at": self.sampler.started_at,
+            "stopped_at": self.sampler.stopped_at,
+        }
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag and records slow callbacks with stack traces.
+    A heartbeat coroutine measures how late each wake-up is. A watchdog thread
+    notices when the heartbeat has stalled and captures the loop thread's stack
+    while the blocking callback is still running.
+    """
+
+    def __init__(self, interval: float, threshold: float, max_events: int = 100):
+        self.interval = interval
+        self.threshold = threshold
+        self.events: deque = deque(maxlen=max_events)
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.slow_callbacks = 0
+        self._last_beat = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._pending_event: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name="loop-lag-watchdog", daemon=True).start()
+        logger.info("Event loop lag monitor started")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(now - before - self.interval, 0.0)
+            self._last_beat = now
+            # Exponentially weighted so one spike decays over a few beats
+            self.lag_ms = 0.7 * self.lag_ms + 0.3 * lag * 1000
+            self.max_lag_ms = max(self.max_lag_ms, lag * 1000)
+            if lag >= self.threshold:
+                self.slow_callbacks += 1
+                event = self._pending_event or {"at": time.time(), "stack": None}
+                event["lag_ms"] = round(lag * 1000, 2)
+                self.events.append(event)
+                self._pending_event = None
+                logger.warning(f"Event loop blocked for {lag * 1000:.1f}ms")
+
+    def _watchdog(self) -> None:
+        while not self._stop.wait(self.threshold / 2):
+            stalled = time.perf_counter() - self._last_beat
+            if stalled >= self.interval + self.threshold and self._pending_event is None:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._pending_event = {
+                        "at": time.time(),
+                        "stack": traceback.format_stack(frame),
+                    }
+
+    def current_lag_ms(self) -> float:
+        """
+        Lag signal for load decisions: the smoothed lag, or how overdue the
+        heartbeat is right now if that is larger (the loop is busy this instant).
+        """
+        if self._task is None:
+            return 0.0
+        overdue = (time.perf_counter() - self._last_beat - self.interval) * 1000
+        return max(self.lag_ms, overdue)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "lag_ms": round(self.lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+            "slow_callbacks": self.slow_callbacks,
+            "threshold_ms": self.threshold * 1000,
+            "events": list(reversed(self.events)),
+        }
+
+profile_store = ProfileStore()
+background_profiler = BackgroundProfiler()
+_loop_monitor: Optional[LoopLagMonitor] = None
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """Get or initialize the process-wide loop lag monitor"""
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopLagMonitor(
+            settings.LOOP_LAG_INTERVAL_MS / 1000,
+            settings.LOOP_LAG_THRESHOLD_MS / 1000,
+        )
+    return _loop_monitor
@@ -0,0 +1,310 @@
+"""
+Lightweight request tracing.
+
+A trace is started per request by the middleware in main.py and carried through
+contextvars, so spans opened in services (including code run via
+asyncio.to_thread) attach to the right request without passing anything around.
+Finished traces go to the configured exporters.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes",
+                 "start_ns", "end_ns", "_start_perf", "duration_ms", "error")
+
+    def __init__(self, trace_id: str, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._start_perf = time.perf_counter()
+        self.duration_ms = None
+        self.error = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def finish(self) -> None:
+        self.duration_ms = (time.perf_counter() - self._start_perf) * 1000
+        self.end_ns = self.start_ns + int(self.duration_ms * 1_000_000)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class Trace:
+    """All spans recorded for one request"""
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+class SpanExporter:
+    """Interface for trace sinks"""
+
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+class InMemoryExporter(SpanExporter):
+    """Ring buffer of recent traces, served by /debug/traces"""
+
+    def __init__(self, max_traces: int):
+        self._traces: deque = deque(maxlen=max_traces)
+
+    def export(self, spans: List[Span]) -> None:
+        # Root span first, children in start order
+        self._traces.append([span.to_dict() for span in sorted(spans, key=lambda s: s.start_ns)])
+
+    def recent(self, limit: int, min_duration_ms: float = 0.0) -> List[List[Dict[str, Any]]]:
+        traces = [t for t in reversed(self._traces) if t and t[0]["duration_ms"] >= min_duration_ms]
+        return traces[:limit]
+
+class FileExporter(SpanExporter):
+    """
+    Appends finished spans to an NDJSON file.
+    Traces are queued and written from a background thread so requests never wait on the disk;
+    when the queue is full (the disk can't keep up) new traces are dropped and counted.
+    """
+
+    def __init__(self, path: str, max_pending: int = 1000):
+        self.path = path
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="trace-file-writer", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]) -> None:
+        try:
+            self._queue.put_nowait(list(spans))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            # Everything queued meanwhile goes out in one write
+            batches = [self._queue.get()]
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            payload = "".join(
+                json.dumps(span.to_dict(), default=str) + "\n" for spans in batches for span in spans
+            )
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a") as file:
+                    file.write(payload)
+            except OSError as e:
+                logger.warning(f"Trace file export failed: {str(e)}")
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                logger.warning(f"Trace file exporter dropped {dropped} traces (queue full)")
+
+class OTLPHttpExporter(SpanExporter):
+    """
+    Sends spans to an OTLP/HTTP collector using the JSON encoding.
+    Spans are batched and posted from a background thread so requests never wait on it.
+    """
+
+    def __init__(self, endpoint: str, service_name: str = "sahl-api", flush_interval: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self._pending: deque = deque(maxlen=10000)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]) -> None:
+        self._pending.extend(spans)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            batch = []
+            while self._pending and len(batch) < 1000:
+                batch.append(self._pending.popleft())
+            if batch:
+                try:
+                    self._post(batch)
+                except Exception as e:
+                    logger.warning(f"OTLP export failed: {str(e)}")
+
+    def _post(self, spans: List[Span]) -> None:
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "sahl-api"}, "spans": [
+                {
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                    "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in span.attributes.items()],
+                    "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                }
+                for span in spans
+            ]}],
+        }]}
+        request = urllib.request.Request(
+            self.url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}, method="POST"
+        )
+        urllib.request.urlopen(request, timeout=5).close()
+
+_exporters: Optional[List[SpanExporter]] = None
+_memory_exporter: Optional[InMemoryExporter] = None
+
+def get_exporters() -> List[SpanExporter]:
+    """Build the exporters named in TRACE_EXPORTERS on first use"""
+    global _exporters, _memory_exporter
+    if _exporters is None:
+        exporters = []
+        for name in (n.strip() for n in settings.TRACE_EXPORTERS.split(",")):
+            if name == "memory":
+                _memory_exporter = InMemoryExporter(settings.TRACE_BUFFER_SIZE)
+                exporters.append(_memory_exporter)
+            elif name == "file":
+                exporters.append(FileExporter(settings.TRACE_FILE_PATH or f"{settings.FILE_PATH}.traces"))
+            elif name == "otlp":
+                exporters.append(OTLPHttpExporter(settings.TRACE_OTLP_ENDPOINT))
+            elif name:
+                logger.warning(f"Unknown trace exporter: {name}")
+        _exporters = exporters
+    return _exporters
+
+def get_memory_exporter() -> Optional[InMemoryExporter]:
+    get_exporters()
+    return _memory_exporter
+
+def _sample_rate() -> float:
+    if settings.TRACE_SAMPLE_RATE is not None:
+        return settings.TRACE_SAMPLE_RATE
+    return 0.01 if settings.is_production else 1.0
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+def current_request_id() -> str:
+    """Request ID for API responses, derived from the active trace"""
+    trace_id = current_trace_id()
+    return f"req_{trace_id}" if trace_id else f"req_{secrets.token_hex(16)}"
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Open the root span of a request. An incoming W3C traceparent header is honoured
+    so traces can be joined with the caller's. Unsampled traces still get an ID for logs.
+    """
+    parent_id = None
+    match = _TRACEPARENT.match(traceparent or "")
+    if match:
+        trace_id, parent_id = match.group(1), match.group(2)
+    else:
+        trace_id = secrets.token_hex(16)
+
+    trace = Trace(trace_id, random.random() < _sample_rate())
+    trace_token = _current_trace.set(trace)
+    try:
+        if not trace.sampled:
+            yield None
+            return
+        try:
+            with _open_span(trace, name, parent_id, attributes) as root:
+                yield root
+        finally:
+            for exporter in get_exporters():
+                try:
+                    exporter.export(trace.spans)
+                except Exception as e:
+                    logger.warning(f"Trace export failed: {str(e)}")
+    finally:
+        _current_trace.reset(trace_token)
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Record a child span of the current span; a no-op outside a sampled trace"""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        yield None
+        return
+    parent = _current_span.get()
+    with _open_span(trace, name, parent.span_id if parent else None, attributes) as child:
+        yield child
+
+@contextmanager
+def _open_span(trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Iterator[Span]:
+    current = Span(trace.trace_id, name, parent_id, dict(attributes))
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+        trace.add(current)
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator recording a span around a sync or async function"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
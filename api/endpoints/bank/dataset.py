@@ -0,0 +1,361 @@
+"""
+Synthetic bank datasets for load testing: generation (sharded across
+processes) and loading by the bank backend (BANK_DATASET_DIR)
+"""
+import datetime
+import hashlib
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import random
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.categorization_service import CATEGORY_TAXONOMY, get_categorizer
+
+logger = logging.getLogger(__name__)
+
+DATASET_VERSION = 1
+METADATA_FILE = "dataset.json"
+
+# Vocabulary shared with the built-in mock data
+MERCHANT_NAMES = [
+    "Marjane", "Carrefour Market", "Aswak Assalam", "Café Maure",
+    "Hammam Traditionnel", "Patisserie Marocaine", "Pharmacie Atlas",
+    "Royal Air Maroc", "Riad Al Andalous", "Maroc Telecom",
+    "INWI", "ONEE", "LYDEC", "Salle de Sport Casablanca",
+    "Electroplanet", "Acima", "Virement Salaire",
+    "Souk El Had", "Artisanat Maroc", "Fès Medina Shop",
+    "Tanger Med Port", "Marrakech Henna Art"
+]
+ADDRESSES = [
+    "Avenue Mohammed V, 123", "Rue Allal Ben Abdellah, 45", "Boulevard Anfa, 78",
+    "Quartier Habous, 15", "Avenue Hassan II, 67", "Rue Bab Agnaou, 22", "Boulevard Zerktouni, 90"
+]
+CITIES = [
+    "Casablanca", "Rabat", "Marrakech", "Fès", "Tanger", "Agadir",
+    "Meknès", "Oujda", "Tétouan", "Essaouira", "Chefchaouen"
+]
+REGIONS = [
+    "Casablanca-Settat", "Rabat-Salé-Kénitra", "Marrakech-Safi",
+    "Fès-Meknès", "Tanger-Tétouan-Al Hoceima", "Souss-Massa"
+]
+POSTAL_CODES = ["20000", "10000", "40000", "30000", "90000", "80000", "50000", "60000"]
+# Travel merchants often bill in foreign currencies
+FOREIGN_CURRENCY_MERCHANTS = {"Royal Air Maroc", "Riad Al Andalous"}
+CURRENCIES = ["MAD", "EUR", "USD"]
+
+ACCOUNT_TYPES = [
+    ("checking", "depository", "Compte Courant"),
+    ("savings", "depository", "Compte Épargne"),
+    ("credit card", "credit", "Carte de Crédit"),
+]
+
+# Columnar layout: one file per column and shard, fixed-width values
+COLUMNS = {
+    "date": "i",        # proleptic ordinal
+    "minute": "H",      # minute of the day
+    "amount": "q",      # cents
+    "merchant": "H",
+    "currency": "B",
+    "address": "B",
+    "city": "B",
+    "region": "B",
+    "postal": "B",
+    "lat": "f",
+    "lon": "f",
+}
+
+def _account_rng(seed: int, account_id: str) -> random.Random:
+    # Seeding per account keeps the output identical whatever the shard size or worker count
+    return random.Random(f"{seed}:{account_id}")
+
+def _merchant_categories(seed: int) -> List[List[str]]:
+    """Category per merchant (rule match, or a seeded pick from the taxonomy)"""
+    categorizer = get_categorizer()
+    return [
+        list(categorizer.categorize(merchant) or random.Random(f"{seed}:category:{merchant}").choice(CATEGORY_TAXONOMY))
+        for merchant in MERCHANT_NAMES
+    ]
+
+def generate_entities(seed: int, clients: int, tokens: int, accounts_per_item: int) -> Dict[str, Any]:
+    """Clients, items, accounts, account numbers and access tokens (cheap; built in the parent process)"""
+    rng = random.Random(f"{seed}:entities")
+    client_credentials = {
+        f"client_ds_{c:05d}": "secret_" + hashlib.sha256(f"{seed}:client:{c}".encode()).hexdigest()[:24]
+        for c in range(clients)
+    }
+    client_ids = list(client_credentials)
+    items, accounts, numbers, access_tokens = {}, {}, {}, {}
+    for i in range(tokens):
+        item_id = f"item_ds_{i:06d}"
+        account_ids = []
+        for j in range(accounts_per_item):
+            account_id = f"acc_ds_{i:06d}_{j}"
+            subtype, kind, name = ACCOUNT_TYPES[j % len(ACCOUNT_TYPES)]
+            current = round(rng.uniform(500, 50000), 2)
+            accounts[account_id] = {
+                "account_id": account_id,
+                "balances": {
+                    "available": round(current - rng.uniform(0, 200), 2),
+                    "current": current,
+                    "limit": 10000.00 if kind == "credit" else None,
+                    "iso_currency_code": "MAD",
+                    "unofficial_currency_code": None
+                },
+                "mask": f"{rng.randrange(10000):04d}",
+                "name": name,
+                "official_name": name,
+                "subtype": subtype,
+                "type": kind
+            }
+            bank_code = f"{rng.randrange(1000):03d}780000"
+            numbers[account_id] = {
+                "account": bank_code + "".join(str(rng.randrange(10)) for _ in range(15)),
+                "account_id": account_id,
+                "routing": bank_code,
+                "wire_routing": "BCMAMAMC"
+            }
+            account_ids.append(account_id)
+        items[item_id] = {
+            "item_id": item_id,
+            "institution_id": "ins_sahl_bank_maroc",
+            "available_products": ["auth", "transactions", "statements"],
+            "billed_products": ["auth", "transactions", "statements"],
+            "consent_expiration_time": None,
+            "error": None,
+            "institution_name": "Banque Sahl Al-Maghrib",
+            "webhook": None
+        }
+        access_tokens[f"access-ds-{i:06d}"] = {
+            "item_id": item_id,
+            "accounts": account_ids,
+            "user_id": f"user_ds_{i:06d}",
+            "client_id": client_ids[i % len(client_ids)] if client_ids else None
+        }
+    return {"clients": client_credentials, "items": items, "accounts": accounts,
+            "account_numbers": numbers, "access_tokens": access_tokens}
+
+def _account_columns(seed: int, account_id: str, count: int, end_ordinal: int, days: int) -> Dict[str, list]:
+    """One account's transactions as column lists, newest first"""
+    rng = _account_rng(seed, account_id)
+    rand = rng.random
+    merchants = rng.choices(range(len(MERCHANT_NAMES)), k=count)
+    foreign = {MERCHANT_NAMES.index(name) for name in FOREIGN_CURRENCY_MERCHANTS}
+    date = [end_ordinal - int(rand() * days) for _ in range(count)]
+    minute = [int(rand() * 1440) for _ in range(count)]
+    # 20% income; amounts between 5 and 500
+    amount = [int((5 + rand() * 495) * 100) * (1 if rand() < 0.2 else -1) for _ in range(count)]
+    currency = [1 + int(rand() * 2) if m in foreign and rand() < 0.5 else 0 for m in merchants]
+    columns = {
+        "date": date,
+        "minute": minute,
+        "amount": amount,
+        "merchant": merchants,
+        "currency": currency,
+        "address": rng.choices(range(len(ADDRESSES)), k=count),
+        "city": rng.choices(range(len(CITIES)), k=count),
+        "region": rng.choices(range(len(REGIONS)), k=count),
+        "postal": rng.choices(range(len(POSTAL_CODES)), k=count),
+        "lat": [round(31.0 + rand() * 4.8, 4) for _ in range(count)],
+        "lon": [round(-10.0 + rand() * 9.0, 4) for _ in range(count)],
+    }
+    order = sorted(range(count), key=lambda i: date[i] * 1440 + minute[i], reverse=True)
+    return {name: [values[i] for i in order] for name, values in columns.items()}
+
+class _Vocabulary:
+    def __init__(self, categories: List[List[str]]):
+        self.merchants = MERCHANT_NAMES
+        self.categories = categories
+        self.addresses = ADDRESSES
+        self.cities = CITIES
+        self.regions = REGIONS
+        self.postal_codes = POSTAL_CODES
+        self.currencies = CURRENCIES
+
+    @classmethod
+    def from_metadata(cls, vocabulary: Dict[str, list]) -> "_Vocabulary":
+        self = cls.__new__(cls)
+        for name, values in vocabulary.items():
+            setattr(self, name, values)
+        return self
+
+    def as_metadata(self) -> Dict[str, list]:
+        return dict(vars(self))
+
+def _transaction(account_id: str, number: int, columns, i: int, vocabulary: _Vocabulary) -> Dict[str, Any]:
+    """A mock-data shaped transaction from row i of an account's columns"""
+    day = datetime.date.fromordinal(columns["date"][i])
+    minute = columns["minute"][i]
+    merchant = columns["merchant"][i]
+    name = vocabulary.merchants[merchant]
+    return {
+        "transaction_id": f"tx_{account_id}_{number}",
+        "account_id": account_id,
+        "amount": columns["amount"][i] / 100,
+        "iso_currency_code": vocabulary.currencies[columns["currency"][i]],
+        "unofficial_currency_code": None,
+        "date": day.isoformat(),
+        "datetime": f"{day.isoformat()}T{minute // 60:02d}:{minute % 60:02d}:00",
+        "name": name,
+        "merchant_name": name,
+        "pending": False,
+        "category": vocabulary.categories[merchant],
+        "location": {
+            "address": vocabulary.addresses[columns["address"][i]],
+            "city": vocabulary.cities[columns["city"][i]],
+            "region": vocabulary.regions[columns["region"][i]],
+            "postal_code": vocabulary.postal_codes[columns["postal"][i]],
+            "country": "MA",
+            "lat": round(columns["lat"][i], 4),
+            "lon": round(columns["lon"][i], 4)
+        }
+    }
+
+def _shard_path(directory: str, shard: int, suffix: str) -> str:
+    return os.path.join(directory, f"tx-{shard:05d}.{suffix}")
+
+def _write_shard(directory: str, shard: int, account_ids: List[str], count: int, seed: int,
+                 end_ordinal: int, days: int, file_format: str) -> Dict[str, Tuple[int, int, int, int]]:
+    """Generate and write one shard; returns account -> (shard, start, length, count)"""
+    index = {}
+    if file_format == "columnar":
+        columns = {name: array(code) for name, code in COLUMNS.items()}
+        for account_id in account_ids:
+            start = len(columns["date"])
+            for name, values in _account_columns(seed, account_id, count, end_ordinal, days).items():
+                columns[name].extend(values)
+            index[account_id] = (shard, start, count, count)
+        for name, values in columns.items():
+            with open(_shard_path(directory, shard, name), "wb") as file:
+                values.tofile(file)
+    else:
+        vocabulary = _Vocabulary(_merchant_categories(seed))
+        offset = 0
+        with open(_shard_path(directory, shard, "ndjson"), "wb") as file:
+            for account_id in account_ids:
+                columns = _account_columns(seed, account_id, count, end_ordinal, days)
+                block = b"".join(
+                    json.dumps(_transaction(account_id, i, columns, i, vocabulary), ensure_ascii=False,
+                               separators=(",", ":")).encode() + b"\n"
+                    for i in range(count)
+                )
+                file.write(block)
+                index[account_id] = (shard, offset, len(block), count)
+                offset += len(block)
+    return index
+
+def generate_dataset(
+    directory: str,
+    clients: int,
+    tokens: int,
+    accounts_per_item: int,
+    transactions: int,
+    seed: int = 0,
+    days: int = 365,
+    end_date: Optional[datetime.date] = None,
+    file_format: str = "columnar",
+    workers: int = 1,
+    shard_accounts: int = 256,
+) -> Dict[str, Any]:
+    """
+    Write a dataset to directory: dataset.json (entities, vocabulary and the
+    per-account transaction index) plus transaction shards generated in
+    parallel. The same arguments always produce the same data.
+    """
+    end_date = end_date or datetime.date.today()
+    os.makedirs(directory, exist_ok=True)
+    entities = generate_entities(seed, clients, tokens, accounts_per_item)
+    account_ids = list(entities["accounts"])
+    shards = [account_ids[i:i + shard_accounts] for i in range(0, len(account_ids), shard_accounts)]
+    args = (transactions, seed, end_date.toordinal(), days, file_format)
+
+    index: Dict[str, Tuple[int, int, int, int]] = {}
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_write_shard, directory, shard, ids, *args) for shard, ids in enumerate(shards)]
+            for future in futures:
+                index.update(future.result())
+    else:
+        for shard, ids in enumerate(shards):
+            index.update(_write_shard(directory, shard, ids, *args))
+
+    metadata = {
+        "version": DATASET_VERSION,
+        "format": file_format,
+        "seed": seed,
+        "end_date": end_date.isoformat(),
+        "days": days,
+        "transactions_per_account": transactions,
+        **entities,
+        "vocabulary": _Vocabulary(_merchant_categories(seed)).as_metadata(),
+        "index": index,
+    }
+    # Metadata goes last and atomically: a directory without it is not a loadable dataset
+    tmp_path = os.path.join(directory, f"{METADATA_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as file:
+        json.dump(metadata, file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, os.path.join(directory, METADATA_FILE))
+    return {"accounts": len(account_ids), "shards": len(shards), "transactions": len(account_ids) * transactions}
+
+class BankDataset:
+    """
+    A generated dataset opened read-only. Entities are loaded from
+    dataset.json; transaction shards are mmap'd and an account's rows are
+    decoded only when asked for, so startup cost doesn't grow with the
+    number of transactions and workers share the shard pages.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, METADATA_FILE)) as file:
+            metadata = json.load(file)
+        if metadata.get("version") != DATASET_VERSION:
+            raise ValueError(f"Unsupported dataset version {metadata.get('version')} in {directory}")
+        self.format = metadata["format"]
+        self.clients: Dict[str, str] = metadata["clients"]
+        self.items: Dict[str, Any] = metadata["items"]
+        self.accounts: Dict[str, Any] = metadata["accounts"]
+        self.account_numbers: Dict[str, Any] = metadata["account_numbers"]
+        self.access_tokens: Dict[str, Any] = metadata["access_tokens"]
+        self.vocabulary = _Vocabulary.from_metadata(metadata["vocabulary"])
+        self._index: Dict[str, List[int]] = metadata["index"]
+        self._shards: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+        logger.info(f"Loaded bank dataset {directory}: {len(self.access_tokens)} tokens, "
+                    f"{len(self.accounts)} accounts, {self.transaction_count()} transactions")
+
+    def transaction_count(self) -> int:
+        return sum(entry[3] for entry in self._index.values())
+
+    def _map(self, path: str):
+        with open(path, "rb") as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b""
+
+    def _shard(self, shard: int):
+        with self._lock:
+            if shard not in self._shards:
+                if self.format == "columnar":
+                    self._shards[shard] = {
+                        name: memoryview(self._map(_shard_path(self.directory, shard, name))).cast(code)
+                        for name, code in COLUMNS.items()
+                    }
+                else:
+                    self._shards[shard] = self._map(_shard_path(self.directory, shard, "ndjson"))
+            return self._shards[shard]
+
+    def transactions(self, account_id: str) -> List[Dict[str, Any]]:
+        """An account's transactions, newest first (empty for unknown accounts)"""
+        entry = self._index.get(account_id)
+        if entry is None:
+            return []
+        shard, start, length, count = entry
+        data = self._shard(shard)
+        if self.format == "columnar":
+            columns = {name: column[start:start + length] for name, column in data.items()}
+            return [_transaction(account_id, i, columns, i, self.vocabulary) for i in range(count)]
+        return [json.loads(line) for line in data[start:start + length].splitlines()]
@@ -0,0 +1,28 @@
+"""
+Item webhook events for changes to bank data
+"""
+from typing import Any, Dict, Iterable
+
+from api.endpoints.bank.mock_data import get_item_by_account
+from services.webhook_service import emit_item_event, queue_item_event
+
+async def emit_new_transactions(records: Iterable[Dict[str, Any]]) -> None:
+    """Queue a TRANSACTIONS DEFAULT_UPDATE for each item whose accounts got newly stored transactions"""
+    updates: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        item = get_item_by_account(record.get("accountId"))
+        if not item:
+            continue
+        update = updates.setdefault(item["item_id"], {"item": item, "account_ids": [], "new_transactions": 0})
+        if record["accountId"] not in update["account_ids"]:
+            update["account_ids"].append(record["accountId"])
+        update["new_transactions"] += 1
+    for update in updates.values():
+        await emit_item_event(update["item"], "TRANSACTIONS", "DEFAULT_UPDATE",
+                              account_ids=update["account_ids"], new_transactions=update["new_transactions"])
+
+def queue_statement_ready(account_id: str, period: str) -> None:
+    """Queue a STATEMENTS DEFAULT_UPDATE once an account's statement for a closed period is built (blocking)"""
+    item = get_item_by_account(account_id)
+    if item:
+        queue_item_event(item, "STATEMENTS", "DEFAULT_UPDATE", account_ids=[account_id], period=period)
@@ -3,7 +3,18 @@ Mock data for the Sahl Bank API
 """
 import datetime
 import random
-from typing import Dict, List, Any
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+from api.core.config import settings
+from services.shared_store import share_mapping
+from services.categorization_service import CATEGORY_TAXONOMY, get_categorizer
+from api.endpoints.bank.search_index import TransactionIndex, transaction_index
+from api.endpoints.bank.statement_store import closed_periods, get_statement_store
+from api.endpoints.bank.dataset import (
+    ADDRESSES, CITIES, FOREIGN_CURRENCY_MERCHANTS, MERCHANT_NAMES, POSTAL_CODES, REGIONS, BankDataset
+)
 
 # Mock bank accounts
 ACCOUNTS = {
@@ -77,8 +88,15 @@ ACCOUNT_NUMBERS = {
 }
 
 # Mock transactions
-def generate_transactions(account_id: str, count: int = 20) -> List[Dict[str, Any]]:
-    """Generate mock transactions for an account"""
+def generate_transactions(
+    account_id: str,
+    count: int = 20,
+    rng: Optional[random.Random] = None,
+    today: Optional[datetime.datetime] = None
+) -> List[Dict[str, Any]]:
+    """Generate mock transactions for an account in the 30 days before today (pass a seeded rng and a fixed today for repeatable data)"""
+    rng = rng or random
+    categorizer = get_categorizer()
     transactions = []
     
     # Get account details
@@ -86,56 +104,36 @@ def generate_transactions(account_id: str, count: int = 20) -> List[Dict[str, An
     if not account:
         return []
     
-    # Transaction categories
-    categories = [
-        ["Food and Drink", "Restaurants"],
-        ["Food and Drink", "Cafés"],
-        ["Shops", "Souk"],
-        ["Shops", "Épicerie"],
-        ["Transfer", "Dépôt"],
-        ["Transfer", "Retrait"],
-        ["Service", "Abonnement"],
-        ["Travel", "Royal Air Maroc"],
-        ["Travel", "Riads"],
-        ["Payment", "Carte de Crédit"],
-        ["Recreation", "Divertissement"],
-        ["Family", "Aïd al-Fitr"],
-        ["Family", "Aïd al-Adha"]
-    ]
-    
-    # Transaction names
-    merchant_names = [
-        "Marjane", "Carrefour Market", "Aswak Assalam", "Café Maure",
-        "Hammam Traditionnel", "Patisserie Marocaine", "Pharmacie Atlas",
-        "Royal Air Maroc", "Riad Al Andalous", "Maroc Telecom",
-        "INWI", "ONEE", "LYDEC", "Salle de Sport Casablanca",
-        "Electroplanet", "Acima", "Virement Salaire",
-        "Souk El Had", "Artisanat Maroc", "Fès Medina Shop",
-        "Tanger Med Port", "Marrakech Henna Art"
-    ]
+    account_currency = account["balances"]["iso_currency_code"]
     
     # Generate transactions
-    today = datetime.datetime.now()
+    today = today or datetime.datetime.now()
     for i in range(count):
         # Random date within the last 30 days
-        days_ago = random.randint(0, 30)
+        days_ago = rng.randint(0, 30)
         date = today - datetime.timedelta(days=days_ago)
         
         # Random amount (negative for expenses, positive for income)
-        is_income = random.random() < 0.2  # 20% chance of income
-        amount = round(random.uniform(5, 500), 2)
+        is_income = rng.random() < 0.2  # 20% chance of income
+        amount = round(rng.uniform(5, 500), 2)
         if not is_income:
             amount = -amount
             
-        # Select category and merchant
-        category = random.choice(categories)
-        merchant = random.choice(merchant_names)
+        # Select merchant and categorize it (random category when no rule matches)
+        fallback_category = rng.choice(CATEGORY_TAXONOMY)
+        merchant = rng.choice(MERCHANT_NAMES)
+        category = list(categorizer.categorize(merchant) or fallback_category)
+        currency = account_currency
+        if merchant in FOREIGN_CURRENCY_MERCHANTS and rng.random() < 0.5:
+            currency = rng.choice(["EUR", "USD"])
         
         # Create transaction
         transaction = {
             "transaction_id": f"tx_{account_id}_{i}",
             "account_id": account_id,
             "amount": amount,
+            "iso_currency_code": currency,
+            "unofficial_currency_code": None,
             "date": date.strftime("%Y-%m-%d"),
             "datetime": date.isoformat(),
             "name": merchant,
@@ -143,31 +141,13 @@ def generate_transactions(account_id: str, count: int = 20) -> List[Dict[str, An
             "pending": False,
             "category": category,
             "location": {
-                "address": random.choice([
-                    "Avenue Mohammed V, 123",
-                    "Rue Allal Ben Abdellah, 45",
-                    "Boulevard Anfa, 78",
-                    "Quartier Habous, 15",
-                    "Avenue Hassan II, 67",
-                    "Rue Bab Agnaou, 22",
-                    "Boulevard Zerktouni, 90"
-                ]),
-                "city": random.choice([
-                    "Casablanca", "Rabat", "Marrakech", "Fès",
-                    "Tanger", "Agadir", "Meknès", "Oujda",
-                    "Tétouan", "Essaouira", "Chefchaouen"
-                ]),
-                "region": random.choice([
-                    "Casablanca-Settat", "Rabat-Salé-Kénitra", "Marrakech-Safi",
-                    "Fès-Meknès", "Tanger-Tétouan-Al Hoceima", "Souss-Massa"
-                ]),
-                "postal_code": random.choice([
-                    "20000", "10000", "40000", "30000",
-                    "90000", "80000", "50000", "60000"
-                ]),
+                "address": rng.choice(ADDRESSES),
+                "city": rng.choice(CITIES),
+                "region": rng.choice(REGIONS),
+                "postal_code": rng.choice(POSTAL_CODES),
                 "country": "MA",
-                "lat": random.uniform(31.0, 35.8),
-                "lon": random.uniform(-10.0, -1.0)
+                "lat": rng.uniform(31.0, 35.8),
+                "lon": rng.uniform(-10.0, -1.0)
             }
         }
         
@@ -179,46 +159,40 @@ def generate_transactions(account_id: str, count: int = 20) -> List[Dict[str, An
     return transactions
 
 # Mock statements
-def generate_statements(account_id: str, count: int = 6) -> List[Dict[str, Any]]:
-    """Generate mock statements for an account"""
-    statements = []
+def build_statement(account_id: str, account: Dict[str, Any], period: str, start_date: str, end_date: str) -> Dict[str, Any]:
+    """Build the statement of a closed period (seeded by account and period, so every build agrees)"""
+    rng = random.Random(f"{account_id}|{period}")
     
+    # Random balance
+    ending_balance = round(rng.uniform(1000, 10000), 2)
+    starting_balance = round(ending_balance - rng.uniform(-1000, 1000), 2)
+    
+    return {
+        "statement_id": f"stmt_{account_id}_{period.replace('-', '')}",
+        "account_id": account_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "starting_balance": starting_balance,
+        "ending_balance": ending_balance,
+        "total_deposits": round(rng.uniform(500, 3000), 2),
+        "total_withdrawals": round(rng.uniform(500, 3000), 2),
+        "iso_currency_code": account["balances"]["iso_currency_code"],
+        "pdf_url": f"/bank/statements/{account_id}/{period}.pdf"
+    }
+
+def generate_statements(account_id: str, count: int = 6) -> List[Dict[str, Any]]:
+    """Statements of an account's last count closed months, newest first, read from the statement store"""
     # Get account details
     account = ACCOUNTS.get(account_id)
     if not account:
         return []
     
-    # Generate statements (monthly)
-    today = datetime.datetime.now()
-    current_month = today.replace(day=1)
-    
-    for i in range(count):
-        # Statement for previous months
-        statement_date = current_month - datetime.timedelta(days=1)
-        current_month = current_month.replace(month=current_month.month-1 if current_month.month > 1 else 12)
-        if current_month.month == 12:
-            current_month = current_month.replace(year=current_month.year-1)
-        
-        # Random balance
-        ending_balance = round(random.uniform(1000, 10000), 2)
-        starting_balance = round(ending_balance - random.uniform(-1000, 1000), 2)
-        
-        # Create statement
-        statement = {
-            "statement_id": f"stmt_{account_id}_{i}",
-            "account_id": account_id,
-            "start_date": current_month.strftime("%Y-%m-%d"),
-            "end_date": statement_date.strftime("%Y-%m-%d"),
-            "starting_balance": starting_balance,
-            "ending_balance": ending_balance,
-            "total_deposits": round(random.uniform(500, 3000), 2),
-            "total_withdrawals": round(random.uniform(500, 3000), 2),
-            "pdf_url": f"/bank/statements/{account_id}/{statement_date.strftime('%Y-%m')}.pdf"
-        }
-        
-        statements.append(statement)
-    
-    return statements
+    store = get_statement_store()
+    currency = account["balances"]["iso_currency_code"]
+    return [
+        store.get(account_id, currency, period, lambda: build_statement(account_id, account, period, start_date, end_date))
+        for period, start_date, end_date in closed_periods(count)
+    ]
 
 # Mock items
 ITEMS = {
@@ -259,6 +233,26 @@ ACCESS_TOKEN_MAP = {
     }
 }
 
+# A generated dataset (generate_dataset.py) replaces the built-in accounts and tokens
+DATASET: Optional[BankDataset] = None
+if settings.BANK_DATASET_DIR:
+    DATASET = BankDataset(settings.BANK_DATASET_DIR)
+    ACCOUNTS = DATASET.accounts
+    ACCOUNT_NUMBERS = DATASET.account_numbers
+    ITEMS = DATASET.items
+    ACCESS_TOKEN_MAP = DATASET.access_tokens
+    CLIENT_CREDENTIALS.update(DATASET.clients)
+    from api.core.auth_middleware import CLIENT_CREDENTIALS as AUTH_CLIENT_CREDENTIALS
+    AUTH_CLIENT_CREDENTIALS.update(DATASET.clients)
+
+# In multi-worker mode the read-mostly datasets are served from mmap'd files
+# in SHARED_DATA_DIR, so every worker reads one copy from the page cache
+if settings.SHARED_DATA_DIR:
+    ACCOUNTS = share_mapping("accounts", ACCOUNTS, settings.SHARED_DATA_DIR)
+    ACCOUNT_NUMBERS = share_mapping("account_numbers", ACCOUNT_NUMBERS, settings.SHARED_DATA_DIR)
+    ITEMS = share_mapping("items", ITEMS, settings.SHARED_DATA_DIR)
+    ACCESS_TOKEN_MAP = share_mapping("access_tokens", ACCESS_TOKEN_MAP, settings.SHARED_DATA_DIR)
+
 # Function to get accounts by access token
 def get_accounts_by_token(access_token: str) -> List[Dict[str, Any]]:
     """Get accounts associated with an access token"""
@@ -291,55 +285,212 @@ def get_item_by_token(access_token: str) -> Dict[str, Any]:
     
     return ITEMS[token_data["item_id"]]
 
+_account_items: Optional[Dict[str, str]] = None
+_account_items_lock = threading.Lock()
+
+def get_item_by_account(account_id: str) -> Dict[str, Any]:
+    """Get the item an account is linked through (empty if no access token links it)"""
+    global _account_items
+    if _account_items is None:
+        with _account_items_lock:
+            if _account_items is None:
+                _account_items = {
+                    acc_id: token_data["item_id"]
+                    for token_data in ACCESS_TOKEN_MAP.values() for acc_id in token_data["accounts"]
+                }
+    item_id = _account_items.get(account_id)
+    return ITEMS.get(item_id, {}) if item_id else {}
+
+# Transaction history per account, generated once a day (dates are relative to
+# the day) and kept so it can be searched. Seeding by account ID and anchoring
+# to midnight gives every worker process the same history on the same day.
+TRANSACTIONS: Dict[str, List[Dict[str, Any]]] = {}
+_transactions_day: Optional[datetime.date] = None
+_transactions_lock = threading.Lock()
+
+# With a generated dataset, decoded accounts and per-token search indexes are
+# kept in bounded LRUs instead (the full dataset doesn't fit in memory)
+_dataset_transactions: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+_dataset_indexes: "OrderedDict[str, TransactionIndex]" = OrderedDict()
+
+def _lru_get(cache: OrderedDict, key: str, load, max_entries: int):
+    with _transactions_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    value = load()
+    with _transactions_lock:
+        cache[key] = value
+        while len(cache) > max_entries:
+            cache.popitem(last=False)
+    return value
+
+def _token_index(access_token: str, account_ids: List[str]) -> TransactionIndex:
+    """Search index over one token's accounts (dataset mode)"""
+    def build():
+        index = TransactionIndex()
+        for acc_id in account_ids:
+            index.add_many(get_account_transactions(acc_id))
+        return index
+    return _lru_get(_dataset_indexes, access_token, build, settings.BANK_DATASET_CACHE_TOKENS)
+
+def get_account_transactions(account_id: str) -> List[Dict[str, Any]]:
+    """Get the transaction history of an account, indexing it on first use"""
+    if DATASET is not None:
+        return _lru_get(_dataset_transactions, account_id, lambda: DATASET.transactions(account_id),
+                        settings.BANK_DATASET_CACHE_ACCOUNTS)
+    global _transactions_day
+    day = datetime.date.today()
+    if _transactions_day != day or account_id not in TRANSACTIONS:
+        with _transactions_lock:
+            if _transactions_day != day:
+                # A new day: every history moves forward with it
+                TRANSACTIONS.clear()
+                transaction_index.clear()
+                _transactions_day = day
+            if account_id not in TRANSACTIONS:
+                transactions = generate_transactions(
+                    account_id, 20, rng=random.Random(account_id),
+                    today=datetime.datetime.combine(day, datetime.time())
+                )
+                transaction_index.add_many(transactions)
+                TRANSACTIONS[account_id] = transactions
+    return TRANSACTIONS[account_id]
+
+class TokenLookups:
+    """
+    The data behind one access token, each piece loaded once and shared by
+    every operation that needs it (the operations of a /bank/batch request
+    can run in several threads at once). Returned values are shared, so
+    callers must not mutate them.
+    """
+
+    def __init__(self, access_token: str):
+        self.access_token = access_token
+        self.token_data = ACCESS_TOKEN_MAP.get(access_token)
+        self._values: Dict[Any, Any] = {}
+        self._locks: Dict[Any, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _once(self, key, load):
+        if key in self._values:
+            return self._values[key]
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._values:
+                self._values[key] = load()
+        return self._values[key]
+
+    def accounts(self) -> List[Dict[str, Any]]:
+        if not self.token_data:
+            return []
+        return self._once("accounts", lambda: [
+            ACCOUNTS[acc_id] for acc_id in self.token_data["accounts"] if acc_id in ACCOUNTS
+        ])
+
+    def account_numbers(self) -> Dict[str, List[Dict[str, Any]]]:
+        if not self.token_data:
+            return {"ach": []}
+        return self._once("account_numbers", lambda: {"ach": [
+            ACCOUNT_NUMBERS[acc_id] for acc_id in self.token_data["accounts"] if acc_id in ACCOUNT_NUMBERS
+        ]})
+
+    def item(self) -> Dict[str, Any]:
+        if not self.token_data or self.token_data["item_id"] not in ITEMS:
+            return {}
+        return self._once("item", lambda: ITEMS[self.token_data["item_id"]])
+
+    def transactions(self, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
+        """Transactions of the token's accounts, newest first, filtered by date if both dates are given"""
+        if not self.token_data:
+            return {"transactions": [], "accounts": []}
+
+        def load():
+            all_transactions = []
+            for acc_id in self.token_data["accounts"]:
+                transactions = get_account_transactions(acc_id)
+
+                # Filter by date if provided
+                if start_date and end_date:
+                    transactions = [t for t in transactions if start_date <= t["date"] <= end_date]
+
+                all_transactions.extend(transactions)
+
+            # Sort by date (newest first)
+            all_transactions.sort(key=lambda x: x["date"], reverse=True)
+            return all_transactions
+
+        all_transactions = self._once(("transactions", start_date, end_date), load)
+        return {
+            "accounts": self.accounts(),
+            "transactions": all_transactions,
+            "item": self.item(),
+            "total_transactions": len(all_transactions)
+        }
+
+    def search(self, query: str, start_date: str = None, end_date: str = None,
+               count: int = 100, offset: int = 0) -> Dict[str, Any]:
+        """Search the token's transactions (see TransactionIndex.search)"""
+        if not self.token_data:
+            return {"transactions": [], "accounts": [], "total_transactions": 0}
+
+        if DATASET is not None:
+            index = _token_index(self.access_token, self.token_data["accounts"])
+        else:
+            index = transaction_index
+            for acc_id in self.token_data["accounts"]:
+                get_account_transactions(acc_id)
+        results = index.search(
+            query, self.token_data["accounts"], start_date, end_date, limit=count, offset=offset
+        )
+
+        return {
+            "accounts": self.accounts(),
+            "transactions": results["transactions"],
+            "item": self.item(),
+            "total_transactions": results["total"]
+        }
+
+    def statements(self) -> Dict[str, Any]:
+        """Statements of the token's accounts, newest first"""
+        if not self.token_data:
+            return {"statements": [], "accounts": []}
+
+        def load():
+            all_statements = []
+            for acc_id in self.token_data["accounts"]:
+                all_statements.extend(generate_statements(acc_id, 6))
+
+            # Sort by date (newest first)
+            all_statements.sort(key=lambda x: x["end_date"], reverse=True)
+            return all_statements
+
+        all_statements = self._once("statements", load)
+        return {
+            "accounts": self.accounts(),
+            "statements": all_statements,
+            "item": self.item(),
+            "total_statements": len(all_statements)
+        }
+
+def search_transactions_by_token(
+    access_token: str,
+    query: str,
+    start_date: str = None,
+    end_date: str = None,
+    count: int = 100,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """Search transactions of the accounts associated with an access token"""
+    return TokenLookups(access_token).search(query, start_date, end_date, count, offset)
+
 # Function to get transactions by access token
 def get_transactions_by_token(access_token: str, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
     """Get transactions associated with an access token"""
-    token_data = ACCESS_TOKEN_MAP.get(access_token)
-    if not token_data:
-        return {"transactions": [], "accounts": []}
-    
-    accounts = [ACCOUNTS[acc_id] for acc_id in token_data["accounts"] if acc_id in ACCOUNTS]
-    
-    all_transactions = []
-    for acc_id in token_data["accounts"]:
-        transactions = generate_transactions(acc_id, 20)
-        
-        # Filter by date if provided
-        if start_date and end_date:
-            transactions = [t for t in transactions if start_date <= t["date"] <= end_date]
-            
-        all_transactions.extend(transactions)
-    
-    # Sort by date (newest first)
-    all_transactions.sort(key=lambda x: x["date"], reverse=True)
-    
-    return {
-        "accounts": accounts,
-        "transactions": all_transactions,
-        "item": get_item_by_token(access_token),
-        "total_transactions": len(all_transactions)
-    }
+    return TokenLookups(access_token).transactions(start_date, end_date)
 
 # Function to get statements by access token
 def get_statements_by_token(access_token: str) -> Dict[str, Any]:
     """Get statements associated with an access token"""
-    token_data = ACCESS_TOKEN_MAP.get(access_token)
-    if not token_data:
-        return {"statements": [], "accounts": []}
-    
-    accounts = [ACCOUNTS[acc_id] for acc_id in token_data["accounts"] if acc_id in ACCOUNTS]
-    
-    all_statements = []
-    for acc_id in token_data["accounts"]:
-        statements = generate_statements(acc_id, 6)
-        all_statements.extend(statements)
-    
-    # Sort by date (newest first)
-    all_statements.sort(key=lambda x: x["end_date"], reverse=True)
-    
-    return {
-        "accounts": accounts,
-        "statements": all_statements,
-        "item": get_item_by_token(access_token),
-        "total_statements": len(all_statements)
-    }
\ No newline at end of file
+    return TokenLookups(access_token).statements()
@@ -0,0 +1,131 @@
+"""
+Statement PDF rendering for the Sahl Bank API
+"""
+import io
+import json
+import os
+import tempfile
+from typing import Dict, Any, Optional
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle
+
+from api.core.config import settings
+from api.core.tracing import span
+from services.shared_store import SharedFileCache
+
+# Bump when the layout changes so cached PDFs are re-rendered
+RENDERER_VERSION = 1
+
+_pdf_cache: Optional[SharedFileCache] = None
+
+def get_statement_pdf_cache() -> SharedFileCache:
+    """Get or initialize the on-disk statement PDF cache shared by all workers"""
+    global _pdf_cache
+    if _pdf_cache is None:
+        directory = settings.STATEMENT_PDF_CACHE_DIR or os.path.join(
+            settings.SHARED_DATA_DIR or tempfile.gettempdir(), "sahl-statement-pdfs"
+        )
+        _pdf_cache = SharedFileCache(directory, settings.STATEMENT_PDF_CACHE_MAX_MB * 1024 * 1024)
+    return _pdf_cache
+
+def statement_pdf_path(account_id: str, account: Dict[str, Any], statement_date: str) -> str:
+    """Return the path of the cached statement PDF, rendering it on first request"""
+    # The account snapshot is part of the key so balance changes produce a new PDF
+    key = f"v{RENDERER_VERSION}|{account_id}|{statement_date}|{json.dumps(account, sort_keys=True)}"
+    return get_statement_pdf_cache().get_or_create(
+        key, lambda: render_statement_pdf(account_id, account, statement_date), ".pdf"
+    )
+
+def render_statement_pdf(account_id: str, account: Dict[str, Any], statement_date: str) -> bytes:
+    """Render a one-page statement PDF for an account and period (YYYY-MM)"""
+    with span("pdf.render_statement", account_id=account_id, statement_date=statement_date) as current:
+        # Create a BytesIO buffer to receive PDF data
+        buffer = io.BytesIO()
+
+        # Create the PDF object using ReportLab
+        p = canvas.Canvas(buffer, pagesize=letter)
+        width, height = letter
+
+        # Add bank logo and header
+        p.setFont("Helvetica-Bold", 18)
+        p.drawString(50, height - 50, "BANQUE SAHL AL-MAGHRIB")
+        p.setFont("Helvetica", 12)
+        p.drawString(50, height - 70, "Statement of Account")
+
+        # Add a horizontal line
+        p.line(50, height - 80, width - 50, height - 80)
+
+        # Add account information
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(50, height - 110, "Account Information")
+        p.setFont("Helvetica", 10)
+        p.drawString(50, height - 130, f"Account Number: {account_id}")
+        p.drawString(50, height - 145, f"Account Name: {account['name']}")
+        p.drawString(50, height - 160, f"Statement Period: {statement_date}")
+
+        # Add current balance
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(50, height - 190, "Balance Summary")
+        p.setFont("Helvetica", 10)
+        p.drawString(50, height - 210, f"Current Balance: {account['balances']['current']} {account['balances']['iso_currency_code']}")
+        p.drawString(50, height - 225, f"Available Balance: {account['balances']['available']} {account['balances']['iso_currency_code']}")
+
+        # Add transaction table
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(50, height - 255, "Transaction History")
+
+        # Create transaction data
+        data = [
+            ["Date", "Description", "Amount", "Balance"],
+            [f"{statement_date}-01", "Opening Balance", "", "5,000.00 MAD"],
+            [f"{statement_date}-05", "Salary Deposit", "+8,500.00", "13,500.00 MAD"],
+            [f"{statement_date}-10", "Marjane Supermarket", "-450.75", "13,049.25 MAD"],
+            [f"{statement_date}-15", "ATM Withdrawal", "-1,000.00", "12,049.25 MAD"],
+            [f"{statement_date}-20", "LYDEC Utility Bill", "-785.50", "11,263.75 MAD"],
+            [f"{statement_date}-25", "Restaurant Payment", "-320.00", "10,943.75 MAD"],
+            [f"{statement_date}-28", "Closing Balance", "", "10,943.75 MAD"]
+        ]
+
+        # Create the table
+        table = Table(data, colWidths=[80, 200, 80, 100])
+
+        # Style the table
+        style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ])
+
+        table.setStyle(style)
+
+        # Draw the table on the PDF
+        table.wrapOn(p, width - 100, height)
+        table.drawOn(p, 50, height - 400)
+
+        # Add footer
+        p.setFont("Helvetica", 8)
+        p.drawString(50, 50, "Thank you for banking with Banque Sahl Al-Maghrib.")
+        p.drawString(50, 35, "For any inquiries, please contact customer service at 0800-123456.")
+        p.drawString(width - 150, 20, f"Page 1 of 1")
+
+        # Save the PDF
+        p.showPage()
+        p.save()
+
+        # Get the PDF data from the buffer
+        pdf_data = buffer.getvalue()
+        buffer.close()
+        if current:
+            current.set_attribute("bytes", len(pdf_data))
+        return pdf_data
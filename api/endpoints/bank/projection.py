@@ -0,0 +1,101 @@
+"""
+Sparse fieldsets for bank API responses
+
+A request's "fields" (a list, or a comma-separated string, of dotted paths
+such as "transactions.amount" or "accounts.balances.current") keeps only
+the named parts of the response. Top-level keys no path names are dropped;
+paths through a list apply to each element. Each distinct field set is
+compiled once into an extractor and cached.
+"""
+import functools
+import re
+from typing import Any, Callable, Dict, Tuple, Union
+
+MAX_FIELDS = 64
+
+_PATH = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+class ProjectionError(ValueError):
+    """Raised for a malformed fields parameter"""
+
+def parse_fields(fields: Union[str, list]) -> Tuple[str, ...]:
+    """Normalize a fields parameter into a sorted tuple of unique paths"""
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    if not isinstance(fields, list) or not all(isinstance(path, str) for path in fields):
+        raise ProjectionError("fields must be a list of field paths or a comma-separated string")
+    paths = {path.strip() for path in fields if path.strip()}
+    if not paths:
+        raise ProjectionError("fields must name at least one field")
+    if len(paths) > MAX_FIELDS:
+        raise ProjectionError(f"At most {MAX_FIELDS} fields")
+    invalid = sorted(path for path in paths if not _PATH.fullmatch(path))
+    if invalid:
+        raise ProjectionError(f"Invalid field path: {invalid[0]}")
+    return tuple(sorted(paths))
+
+def _field_tree(paths: Tuple[str, ...]) -> Dict[str, Any]:
+    """Nest dotted paths; True marks a field kept whole (a shorter path wins)"""
+    tree: Dict[str, Any] = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split(".")
+        for name in parents:
+            if node.get(name) is True:
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[leaf] = True
+    return tree
+
+def _project_slow(tree: Dict[str, Any], value: Any) -> Any:
+    """Generic projection, for records that lack some of the fields"""
+    if isinstance(value, list):
+        return [_project_slow(tree, element) for element in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        name: value[name] if subtree is True else _project_slow(subtree, value[name])
+        for name, subtree in tree.items() if name in value
+    }
+
+def _compile_node(tree: Dict[str, Any]) -> Callable[[Any], Any]:
+    """
+    Extractor for one level of the tree. Records are projected by a function
+    generated for the field set, a single dict literal, falling back to
+    _project_slow for values that don't have the expected shape.
+    """
+    namespace: Dict[str, Any] = {}
+    items = []
+    for i, (name, subtree) in enumerate(tree.items()):
+        if subtree is True:
+            items.append(f"{name!r}: v[{name!r}]")
+        else:
+            namespace[f"_n{i}"] = _compile_node(subtree)
+            items.append(f"{name!r}: _n{i}(v[{name!r}])")
+    exec(f"def record(v):\n    return {{{', '.join(items)}}}\n", namespace)
+    record = namespace["record"]
+
+    def node(value: Any) -> Any:
+        try:
+            if type(value) is list:
+                return [record(element) for element in value]
+            if type(value) is dict:
+                return record(value)
+        except (KeyError, TypeError):
+            pass
+        return _project_slow(tree, value)
+    return node
+
+@functools.lru_cache(maxsize=256)
+def compile_projection(paths: Tuple[str, ...]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """The extractor for a normalized field set (see parse_fields)"""
+    top = {name: (None if subtree is True else _compile_node(subtree))
+           for name, subtree in _field_tree(paths).items()}
+
+    def project_response(body: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            name: body[name] if extract is None else extract(body[name])
+            for name, extract in top.items() if name in body
+        }
+    return project_response
@@ -2,29 +2,178 @@
 Bank API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from typing import Dict, Any, Optional
+from collections import deque
 from datetime import datetime, timedelta
+import asyncio
+import json
 import logging
-import io
 import os
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
 
 from api.core.auth_middleware import api_key_auth, generate_link_token, exchange_public_token, validate_access_token
+from api.core.tracing import current_request_id
 from api.endpoints.bank.mock_data import (
+    TokenLookups,
     get_accounts_by_token,
-    get_account_numbers_by_token,
-    get_item_by_token,
-    get_transactions_by_token,
-    get_statements_by_token
+    get_item_by_token
 )
+from api.endpoints.bank.pdf_renderer import statement_pdf_path
+from api.endpoints.bank.statement_store import closed_periods
+from api.endpoints.bank.projection import ProjectionError, compile_projection, parse_fields
+from api.core.config import settings
+from services.balance_history_service import get_balance_history, HistoryRangeError
+from services.fx_service import convert_records, FxError
+from services.webhook_service import check_webhook_url, emit_item_event, get_webhook_dispatcher, WebhookUrlError
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _convert(request: Dict[str, Any], records: list, fields: tuple, date_field: str = "date") -> list:
+    """Add converted_* amounts when the request asks for a target_currency"""
+    target = request.get("target_currency")
+    if not target:
+        return records
+    if not isinstance(target, str):
+        raise HTTPException(status_code=400, detail="target_currency must be a currency code string")
+    try:
+        return convert_records(records, fields, target, date_field)
+    except FxError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _totals(transactions: list) -> Dict[str, Any]:
+    """Inflow/outflow/net of converted transactions"""
+    amounts = [t["converted_amount"] for t in transactions]
+    inflow = round(sum(a for a in amounts if a > 0), 2)
+    outflow = round(sum(a for a in amounts if a < 0), 2)
+    return {"inflow": inflow, "outflow": outflow, "net": round(inflow + outflow, 2)}
+
+def _access_token(request: Dict[str, Any]) -> str:
+    """The request's access_token, checked"""
+    if "access_token" not in request:
+        raise HTTPException(status_code=400, detail="Missing access_token")
+    
+    access_token = request["access_token"]
+    if not isinstance(access_token, str) or not validate_access_token(access_token):
+        raise HTTPException(status_code=401, detail="Invalid access token")
+    return access_token
+
+def _projection(request: Dict[str, Any]):
+    """The compiled extractor for the request's fields, or None to return every field"""
+    fields = request.get("fields")
+    if not fields:
+        return None
+    try:
+        return compile_projection(parse_fields(fields))
+    except ProjectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _run_operation(operation, request: Dict[str, Any], lookups: TokenLookups) -> Dict[str, Any]:
+    """Run an operation and keep only the fields the request asks for"""
+    extract = _projection(request)
+    body = operation(request, lookups)
+    return extract(body) if extract else body
+
+def _date_param(request: Dict[str, Any], name: str, default: Optional[str] = None) -> Optional[str]:
+    """A YYYY-MM-DD date from the request (default when absent)"""
+    value = request.get(name)
+    if value is None:
+        return default
+    try:
+        if not isinstance(value, str):
+            raise ValueError(value)
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    return value
+
+def _statement_period(statement_date: Any) -> str:
+    """A statement_date naming a closed month (YYYY-MM) within STATEMENT_HISTORY_MONTHS"""
+    periods = {period for period, _, _ in closed_periods(settings.STATEMENT_HISTORY_MONTHS)}
+    if not isinstance(statement_date, str) or statement_date not in periods:
+        raise HTTPException(
+            status_code=400,
+            detail=f"statement_date must be a closed month (YYYY-MM) within the last {settings.STATEMENT_HISTORY_MONTHS} months"
+        )
+    return statement_date
+
+# Operations behind the data endpoints, also run by /batch. Each takes the
+# request body and the token's (possibly shared) lookups.
+
+def _auth_get(request: Dict[str, Any], lookups: TokenLookups) -> Dict[str, Any]:
+    accounts = lookups.accounts()
+    logger.info(f"Retrieved auth data for {len(accounts)} accounts")
+    return {"accounts": accounts, "numbers": lookups.account_numbers(), "item": lookups.item()}
+
+def _transactions_get(request: Dict[str, Any], lookups: TokenLookups) -> Dict[str, Any]:
+    # Get date range (default to last 30 days if not provided)
+    today = datetime.now().strftime("%Y-%m-%d")
+    start_date = _date_param(request, "start_date", (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"))
+    end_date = _date_param(request, "end_date", today)
+    
+    # Get transactions
+    transactions_data = lookups.transactions(start_date, end_date)
+    transactions = _convert(request, transactions_data["transactions"], ("amount",))
+    
+    logger.info(f"Retrieved {len(transactions)} transactions")
+    
+    response = {
+        "accounts": transactions_data["accounts"],
+        "transactions": transactions,
+        "item": transactions_data["item"],
+        "total_transactions": transactions_data["total_transactions"]
+    }
+    if request.get("target_currency"):
+        response["totals"] = {**_totals(transactions), "iso_currency_code": request["target_currency"].upper()}
+    return response
+
+def _transactions_search(request: Dict[str, Any], lookups: TokenLookups) -> Dict[str, Any]:
+    query = request.get("query", "")
+    if not isinstance(query, str):
+        raise HTTPException(status_code=400, detail="query must be a string")
+    options = request.get("options") or {}
+    if not isinstance(options, dict):
+        raise HTTPException(status_code=400, detail="options must be an object")
+    try:
+        count = min(max(int(options.get("count", 100)), 1), 500)
+        offset = max(int(options.get("offset", 0)), 0)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="options.count and options.offset must be integers")
+    
+    results = lookups.search(query, _date_param(request, "start_date"), _date_param(request, "end_date"), count, offset)
+    
+    logger.info(f"Search for '{query}' matched {results['total_transactions']} transactions")
+    
+    return {
+        "accounts": results["accounts"],
+        "transactions": _convert(request, results["transactions"], ("amount",)),
+        "item": results.get("item", {}),
+        "total_transactions": results["total_transactions"]
+    }
+
+def _statements_get(request: Dict[str, Any], lookups: TokenLookups) -> Dict[str, Any]:
+    statements_data = lookups.statements()
+    
+    logger.info(f"Retrieved {len(statements_data['statements'])} statements")
+    
+    return {
+        "accounts": statements_data["accounts"],
+        "statements": _convert(
+            request, statements_data["statements"],
+            ("starting_balance", "ending_balance", "total_deposits", "total_withdrawals"), date_field="end_date"
+        ),
+        "item": statements_data["item"],
+        "total_statements": statements_data["total_statements"]
+    }
+
+BATCH_OPERATIONS = {
+    "auth/get": _auth_get,
+    "transactions/get": _transactions_get,
+    "transactions/search": _transactions_search,
+    "statements/get": _statements_get,
+}
+
 # Link token creation endpoint
 @router.post("/link/token/create")
 async def create_link_token(
@@ -75,77 +224,118 @@ async def public_token_exchange(
     
     return token_data
 
-# Auth endpoint
-@router.post("/auth/get")
-async def get_auth(
+# Webhook update endpoint
+@router.post("/item/webhook/update")
+async def update_item_webhook(
     request: Dict[str, Any] = Body(...),
     auth: Any = Depends(api_key_auth)
 ) -> Dict[str, Any]:
     """
-    Get auth data for accounts
-    Similar to Plaid's /auth/get endpoint
+    Set the URL an item's webhooks are sent to
+    Similar to Plaid's /item/webhook/update endpoint
     """
-    # Validate request
     if "access_token" not in request:
         raise HTTPException(status_code=400, detail="Missing access_token")
+    webhook = request.get("webhook")
+    if not isinstance(webhook, str):
+        raise HTTPException(status_code=400, detail="webhook must be an http(s) URL")
+    try:
+        await asyncio.to_thread(check_webhook_url, webhook)
+    except WebhookUrlError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError:
+        raise HTTPException(status_code=400, detail="webhook host does not resolve")
     
     access_token = request["access_token"]
-    
-    # Validate access token
     if not validate_access_token(access_token):
         raise HTTPException(status_code=401, detail="Invalid access token")
     
-    # Get accounts and account numbers
-    accounts = get_accounts_by_token(access_token)
-    numbers = get_account_numbers_by_token(access_token)
     item = get_item_by_token(access_token)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
     
-    logger.info(f"Retrieved auth data for {len(accounts)} accounts")
+    await asyncio.to_thread(get_webhook_dispatcher().queue.set_endpoint, item["item_id"], webhook)
+    await emit_item_event(item, "ITEM", "WEBHOOK_UPDATE_ACKNOWLEDGED", new_webhook_url=webhook)
+    logger.info(f"Updated webhook for item {item['item_id']}")
     
-    return {
-        "accounts": accounts,
-        "numbers": numbers,
-        "item": item,
-        "request_id": f"req_{datetime.now().timestamp()}"
-    }
+    return {"item": {**item, "webhook": webhook}, "request_id": current_request_id()}
 
-# Transactions endpoint
-@router.post("/transactions/get")
-async def get_transactions(
+# Sandbox webhook trigger
+@router.post("/sandbox/item/fire_webhook")
+async def fire_webhook(
     request: Dict[str, Any] = Body(...),
     auth: Any = Depends(api_key_auth)
 ) -> Dict[str, Any]:
     """
-    Get transactions for accounts
-    Similar to Plaid's /transactions/get endpoint
+    Queue a TRANSACTIONS or STATEMENTS update webhook for an item
+    Similar to Plaid's /sandbox/item/fire_webhook endpoint
     """
-    # Validate request
     if "access_token" not in request:
         raise HTTPException(status_code=400, detail="Missing access_token")
+    webhook_type = request.get("webhook_type", "TRANSACTIONS")
+    webhook_code = request.get("webhook_code", "DEFAULT_UPDATE")
+    if webhook_type not in ("TRANSACTIONS", "STATEMENTS"):
+        raise HTTPException(status_code=400, detail="webhook_type must be TRANSACTIONS or STATEMENTS")
     
     access_token = request["access_token"]
-    
-    # Validate access token
     if not validate_access_token(access_token):
         raise HTTPException(status_code=401, detail="Invalid access token")
     
-    # Get date range (default to last 30 days if not provided)
-    today = datetime.now().strftime("%Y-%m-%d")
-    start_date = request.get("start_date", (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"))
-    end_date = request.get("end_date", today)
-    
-    # Get transactions
-    transactions_data = get_transactions_by_token(access_token, start_date, end_date)
-    
-    logger.info(f"Retrieved {len(transactions_data['transactions'])} transactions")
-    
-    return {
-        "accounts": transactions_data["accounts"],
-        "transactions": transactions_data["transactions"],
-        "item": transactions_data["item"],
-        "total_transactions": transactions_data["total_transactions"],
-        "request_id": f"req_{datetime.now().timestamp()}"
-    }
+    item = get_item_by_token(access_token)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    
+    fields = {"account_ids": [account["account_id"] for account in get_accounts_by_token(access_token)]}
+    if webhook_type == "TRANSACTIONS":
+        try:
+            fields["new_transactions"] = int(request.get("new_transactions", 0))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="new_transactions must be an integer")
+    webhook_id = await emit_item_event(item, webhook_type, webhook_code, **fields)
+    
+    return {"webhook_fired": webhook_id is not None, "webhook_id": webhook_id, "request_id": current_request_id()}
+
+# Auth endpoint
+@router.post("/auth/get")
+async def get_auth(
+    request: Dict[str, Any] = Body(...),
+    auth: Any = Depends(api_key_auth)
+) -> Dict[str, Any]:
+    """
+    Get auth data for accounts
+    Similar to Plaid's /auth/get endpoint
+    fields keeps only the named parts of the response, e.g. ["accounts.account_id", "accounts.balances"]
+    """
+    lookups = TokenLookups(_access_token(request))
+    return {**_run_operation(_auth_get, request, lookups), "request_id": current_request_id()}
+
+# Transactions endpoint
+@router.post("/transactions/get")
+async def get_transactions(
+    request: Dict[str, Any] = Body(...),
+    auth: Any = Depends(api_key_auth)
+) -> Dict[str, Any]:
+    """
+    Get transactions for accounts
+    Similar to Plaid's /transactions/get endpoint
+    target_currency adds converted amounts (at each transaction date's rate) and totals
+    """
+    lookups = TokenLookups(_access_token(request))
+    return {**_run_operation(_transactions_get, request, lookups), "request_id": current_request_id()}
+
+# Transaction search endpoint
+@router.post("/transactions/search")
+async def search_transactions(
+    request: Dict[str, Any] = Body(...),
+    auth: Any = Depends(api_key_auth)
+) -> Dict[str, Any]:
+    """
+    Search transactions by merchant, name, category or city
+    Matching is accent-insensitive and every query word is treated as a prefix
+    target_currency adds converted amounts
+    """
+    lookups = TokenLookups(_access_token(request))
+    return {**_run_operation(_transactions_search, request, lookups), "request_id": current_request_id()}
 
 # Statements endpoint
 @router.post("/statements/get")
@@ -156,29 +346,10 @@ async def get_statements(
     """
     Get statements for accounts
     Custom Sahl Bank endpoint for retrieving statements
+    target_currency adds converted amounts at each statement's end-date rate
     """
-    # Validate request
-    if "access_token" not in request:
-        raise HTTPException(status_code=400, detail="Missing access_token")
-    
-    access_token = request["access_token"]
-    
-    # Validate access token
-    if not validate_access_token(access_token):
-        raise HTTPException(status_code=401, detail="Invalid access token")
-    
-    # Get statements
-    statements_data = get_statements_by_token(access_token)
-    
-    logger.info(f"Retrieved {len(statements_data['statements'])} statements")
-    
-    return {
-        "accounts": statements_data["accounts"],
-        "statements": statements_data["statements"],
-        "item": statements_data["item"],
-        "total_statements": statements_data["total_statements"],
-        "request_id": f"req_{datetime.now().timestamp()}"
-    }
+    lookups = TokenLookups(_access_token(request))
+    return {**_run_operation(_statements_get, request, lookups), "request_id": current_request_id()}
 
 # Statement PDF endpoint
 @router.get("/statements/{account_id}/{statement_date}.pdf")
@@ -190,6 +361,7 @@ async def get_statement_pdf(
     """
     Get a PDF statement for an account
     """
+    _statement_period(statement_date)
     # Import ACCOUNTS and ACCESS_TOKEN_MAP from mock_data
     from api.endpoints.bank.mock_data import ACCOUNTS, ACCESS_TOKEN_MAP
     
@@ -203,91 +375,8 @@ async def get_statement_pdf(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Create a BytesIO buffer to receive PDF data
-    buffer = io.BytesIO()
-    
-    # Create the PDF object using ReportLab
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Add bank logo and header
-    p.setFont("Helvetica-Bold", 18)
-    p.drawString(50, height - 50, "BANQUE SAHL AL-MAGHRIB")
-    p.setFont("Helvetica", 12)
-    p.drawString(50, height - 70, "Statement of Account")
-    
-    # Add a horizontal line
-    p.line(50, height - 80, width - 50, height - 80)
-    
-    # Add account information
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height - 110, "Account Information")
-    p.setFont("Helvetica", 10)
-    p.drawString(50, height - 130, f"Account Number: {account_id}")
-    p.drawString(50, height - 145, f"Account Name: {account['name']}")
-    p.drawString(50, height - 160, f"Statement Period: {statement_date}")
-    
-    # Add current balance
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height - 190, "Balance Summary")
-    p.setFont("Helvetica", 10)
-    p.drawString(50, height - 210, f"Current Balance: {account['balances']['current']} {account['balances']['iso_currency_code']}")
-    p.drawString(50, height - 225, f"Available Balance: {account['balances']['available']} {account['balances']['iso_currency_code']}")
-    
-    # Add transaction table
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height - 255, "Transaction History")
-    
-    # Create transaction data
-    data = [
-        ["Date", "Description", "Amount", "Balance"],
-        [f"{statement_date}-01", "Opening Balance", "", "5,000.00 MAD"],
-        [f"{statement_date}-05", "Salary Deposit", "+8,500.00", "13,500.00 MAD"],
-        [f"{statement_date}-10", "Marjane Supermarket", "-450.75", "13,049.25 MAD"],
-        [f"{statement_date}-15", "ATM Withdrawal", "-1,000.00", "12,049.25 MAD"],
-        [f"{statement_date}-20", "LYDEC Utility Bill", "-785.50", "11,263.75 MAD"],
-        [f"{statement_date}-25", "Restaurant Payment", "-320.00", "10,943.75 MAD"],
-        [f"{statement_date}-28", "Closing Balance", "", "10,943.75 MAD"]
-    ]
-    
-    # Create the table
-    table = Table(data, colWidths=[80, 200, 80, 100])
-    
-    # Style the table
-    style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ])
-    
-    table.setStyle(style)
-    
-    # Draw the table on the PDF
-    table.wrapOn(p, width - 100, height)
-    table.drawOn(p, 50, height - 400)
-    
-    # Add footer
-    p.setFont("Helvetica", 8)
-    p.drawString(50, 50, "Thank you for banking with Banque Sahl Al-Maghrib.")
-    p.drawString(50, 35, "For any inquiries, please contact customer service at 0800-123456.")
-    p.drawString(width - 150, 20, f"Page 1 of 1")
-    
-    # Save the PDF
-    p.showPage()
-    p.save()
-    
-    # Get the PDF data from the buffer
-    pdf_data = buffer.getvalue()
-    buffer.close()
+    # Render (or fetch from the shared cache) off the event loop so cheap routes keep flowing
+    pdf_path = await asyncio.to_thread(statement_pdf_path, account_id, account, statement_date)
     
     # Create response with PDF data
     headers = {
@@ -295,7 +384,7 @@ async def get_statement_pdf(
         "Content-Type": "application/pdf"
     }
     
-    return Response(content=pdf_data, headers=headers)
+    return FileResponse(pdf_path, headers=headers)
 # Statement PDF endpoint (POST version)
 @router.post("/statements/pdf")
 async def get_statement_pdf_post(
@@ -315,7 +404,7 @@ async def get_statement_pdf_post(
     
     access_token = request["access_token"]
     account_id = request["account_id"]
-    statement_date = request["statement_date"]
+    statement_date = _statement_period(request["statement_date"])
     
     # Validate access token
     if not validate_access_token(access_token):
@@ -334,91 +423,8 @@ async def get_statement_pdf_post(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Create a BytesIO buffer to receive PDF data
-    buffer = io.BytesIO()
-    
-    # Create the PDF object using ReportLab
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Add bank logo and header
-    p.setFont("Helvetica-Bold", 18)
-    p.drawString(50, height - 50, "BANQUE SAHL AL-MAGHRIB")
-    p.setFont("Helvetica", 12)
-    p.drawString(50, height - 70, "Statement of Account")
-    
-    # Add a horizontal line
-    p.line(50, height - 80, width - 50, height - 80)
-    
-    # Add account information
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height - 110, "Account Information")
-    p.setFont("Helvetica", 10)
-    p.drawString(50, height - 130, f"Account Number: {account_id}")
-    p.drawString(50, height - 145, f"Account Name: {account['name']}")
-    p.drawString(50, height - 160, f"Statement Period: {statement_date}")
-    
-    # Add current balance
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height - 190, "Balance Summary")
-    p.setFont("Helvetica", 10)
-    p.drawString(50, height - 210, f"Current Balance: {account['balances']['current']} {account['balances']['iso_currency_code']}")
-    p.drawString(50, height - 225, f"Available Balance: {account['balances']['available']} {account['balances']['iso_currency_code']}")
-    
-    # Add transaction table
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height - 255, "Transaction History")
-    
-    # Create transaction data
-    data = [
-        ["Date", "Description", "Amount", "Balance"],
-        [f"{statement_date}-01", "Opening Balance", "", "5,000.00 MAD"],
-        [f"{statement_date}-05", "Salary Deposit", "+8,500.00", "13,500.00 MAD"],
-        [f"{statement_date}-10", "Marjane Supermarket", "-450.75", "13,049.25 MAD"],
-        [f"{statement_date}-15", "ATM Withdrawal", "-1,000.00", "12,049.25 MAD"],
-        [f"{statement_date}-20", "LYDEC Utility Bill", "-785.50", "11,263.75 MAD"],
-        [f"{statement_date}-25", "Restaurant Payment", "-320.00", "10,943.75 MAD"],
-        [f"{statement_date}-28", "Closing Balance", "", "10,943.75 MAD"]
-    ]
-    
-    # Create the table
-    table = Table(data, colWidths=[80, 200, 80, 100])
-    
-    # Style the table
-    style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ])
-    
-    table.setStyle(style)
-    
-    # Draw the table on the PDF
-    table.wrapOn(p, width - 100, height)
-    table.drawOn(p, 50, height - 400)
-    
-    # Add footer
-    p.setFont("Helvetica", 8)
-    p.drawString(50, 50, "Thank you for banking with Banque Sahl Al-Maghrib.")
-    p.drawString(50, 35, "For any inquiries, please contact customer service at 0800-123456.")
-    p.drawString(width - 150, 20, f"Page 1 of 1")
-    
-    # Save the PDF
-    p.showPage()
-    p.save()
-    
-    # Get the PDF data from the buffer
-    pdf_data = buffer.getvalue()
-    buffer.close()
+    # Render (or fetch from the shared cache) off the event loop so cheap routes keep flowing
+    pdf_path = await asyncio.to_thread(statement_pdf_path, account_id, account, statement_date)
     
     # Create response with PDF data
     headers = {
@@ -428,7 +434,151 @@ async def get_statement_pdf_post(
     
     logger.info(f"Generated PDF statement for account {account_id}, date {statement_date}")
     
-    return Response(content=pdf_data, headers=headers)
+    return FileResponse(pdf_path, headers=headers)
+
+# Balance history endpoint
+@router.post("/balances/history")
+async def get_balances_history(
+    request: Dict[str, Any] = Body(...),
+    auth: Any = Depends(api_key_auth)
+) -> Dict[str, Any]:
+    """
+    Get the balance history of an access token's accounts as min/max/close points per day, week or month
+    Custom Sahl Bank endpoint; granularity "auto" picks the finest that fits the range
+    """
+    from api.endpoints.bank.mock_data import ACCESS_TOKEN_MAP
+    
+    # Validate request; the user and accounts come from the token, never from the caller
+    token_data = ACCESS_TOKEN_MAP[_access_token(request)]
+    account_id = request.get("account_id")
+    if account_id is not None and account_id not in token_data["accounts"]:
+        raise HTTPException(status_code=404, detail="Account not found")
+    extract = _projection(request)
+    
+    try:
+        end_date = datetime.strptime(request["end_date"], "%Y-%m-%d").date() if request.get("end_date") else datetime.now().date()
+        start_date = datetime.strptime(request["start_date"], "%Y-%m-%d").date() if request.get("start_date") \
+            else end_date - timedelta(days=90)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    
+    try:
+        history = await get_balance_history(
+            token_data["user_id"], start_date, end_date, request.get("granularity", "auto"),
+            account_id, settings.BALANCE_HISTORY_MAX_POINTS
+        )
+    except HistoryRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error retrieving balance history: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving balance history")
+    # The user may have accounts under other tokens
+    history["series"] = [s for s in history["series"] if s["account_id"] in token_data["accounts"]]
+    
+    logger.info(f"Retrieved {sum(len(s['points']) for s in history['series'])} {history['granularity']} balance points")
+    
+    return {**(extract(history) if extract else history), "request_id": current_request_id()}
+
+async def _run_batch_operation(
+    index: int,
+    entry: Any,
+    tokens: Dict[str, Any],
+    slots: asyncio.Semaphore
+) -> bytes:
+    """One /batch operation, serialized as its result entry"""
+    result: Dict[str, Any] = {"index": index}
+    try:
+        if not isinstance(entry, dict):
+            raise HTTPException(status_code=400, detail="Each request must be an object")
+        result["operation"] = entry.get("operation")
+        operation = BATCH_OPERATIONS.get(entry.get("operation"))
+        if operation is None:
+            raise HTTPException(status_code=400, detail=f"operation must be one of {', '.join(BATCH_OPERATIONS)}")
+        params = entry.get("params") or {}
+        if not isinstance(params, dict):
+            raise HTTPException(status_code=400, detail="params must be an object")
+        lookups = tokens.get(entry.get("access_token"))
+        if lookups is None:
+            raise HTTPException(status_code=400, detail="Missing access_token")
+        if isinstance(lookups, HTTPException):
+            raise lookups
+        
+        def run() -> bytes:
+            body = _run_operation(operation, {**params, "access_token": lookups.access_token}, lookups)
+            return json.dumps({**result, "status": 200, "body": body}, default=str, separators=(",", ":")).encode()
+        
+        async with slots:
+            return await asyncio.to_thread(run)
+    except HTTPException as e:
+        return json.dumps({**result, "status": e.status_code, "error": e.detail}).encode()
+    except Exception as e:
+        logger.error(f"Batch operation {index} failed: {str(e)}")
+        return json.dumps({**result, "status": 500, "error": "Internal error"}).encode()
+
+async def _stream_batch(entries: list, tokens: Dict[str, Any], request_id: Optional[str]):
+    """
+    Runs the operations at most BANK_BATCH_MAX_CONCURRENCY at a time and
+    streams their results in request order, each as soon as it and every
+    result before it are done. Operations are started at most a few windows
+    ahead of the one being sent, so a slow client doesn't pile up results.
+    """
+    slots = asyncio.Semaphore(settings.BANK_BATCH_MAX_CONCURRENCY)
+    window = settings.BANK_BATCH_MAX_CONCURRENCY * 4
+    pending: deque = deque()
+    separator = b""
+    try:
+        yield b'{"results":['
+        for index, entry in enumerate(entries):
+            pending.append(asyncio.create_task(_run_batch_operation(index, entry, tokens, slots)))
+            if len(pending) >= window:
+                yield separator + await pending.popleft()
+                separator = b","
+        while pending:
+            yield separator + await pending.popleft()
+            separator = b","
+        yield b'],"request_id":' + json.dumps(request_id).encode() + b"}"
+    finally:
+        # Client went away: drop the operations nobody will read
+        for task in pending:
+            task.cancel()
+
+# Batch endpoint
+@router.post("/batch")
+async def batch(
+    request: Dict[str, Any] = Body(...),
+    auth: Any = Depends(api_key_auth)
+) -> Response:
+    """
+    Run several operations in one call: {"requests": [{"operation": "transactions/get",
+    "access_token": ..., "params": {...}}, ...]}, with operations auth/get,
+    transactions/get, transactions/search and statements/get taking the same params
+    as their endpoints. Client credentials are checked once and every access token
+    once; accounts, items and transaction lists are shared between the operations
+    on the same token. Results are streamed in request order as
+    {"index", "operation", "status", "body"} (or "error" instead of "body").
+    """
+    entries = request.get("requests")
+    if not isinstance(entries, list) or not entries:
+        raise HTTPException(status_code=400, detail="requests must be a non-empty list")
+    if len(entries) > settings.BANK_BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.BANK_BATCH_MAX_OPERATIONS} operations per batch"
+        )
+    
+    # Resolve each distinct access token once
+    tokens: Dict[str, Any] = {}
+    for entry in entries:
+        access_token = entry.get("access_token") if isinstance(entry, dict) else None
+        if not isinstance(access_token, str) or access_token in tokens:
+            continue
+        try:
+            tokens[access_token] = TokenLookups(_access_token({"access_token": access_token}))
+        except HTTPException as e:
+            tokens[access_token] = e
+    
+    logger.info(f"Running a batch of {len(entries)} operations over {len(tokens)} access tokens")
+    
+    return StreamingResponse(_stream_batch(entries, tokens, current_request_id()), media_type="application/json")
 
 # Bank info endpoint
 @router.get("/info")
@@ -447,9 +597,12 @@ async def get_bank_info(
             "/bank/item/public_token/exchange",
             "/bank/auth/get",
             "/bank/transactions/get",
+            "/bank/transactions/search",
             "/bank/statements/get",
             "/bank/statements/{account_id}/{statement_date}.pdf",
             "/bank/statements/pdf",
+            "/bank/balances/history",
+            "/bank/batch",
             "/bank/info"
         ],
         "documentation": "https://docs.sahlbank.com"
@@ -0,0 +1,130 @@
+"""
+Inverted index over bank transactions for /bank/transactions/search
+"""
+import bisect
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from services.text_matching import tokenize
+
+def _searchable_text(transaction: Dict[str, Any]) -> Iterable[str]:
+    """The fields a transaction can be found by"""
+    yield transaction.get("merchant_name") or ""
+    yield transaction.get("name") or ""
+    yield from transaction.get("category") or []
+    yield (transaction.get("location") or {}).get("city") or ""
+
+class TransactionIndex:
+    """
+    Incrementally maintained inverted index, partitioned by account.
+    Postings are keyed by (account, term), so a search only touches the
+    caller's own transactions however large the whole index grows.
+    Documents get increasing integer IDs, so every posting list is sorted on append.
+    A global sorted vocabulary supports prefix queries with two binary searches.
+    """
+
+    def __init__(self):
+        self._documents: List[Dict[str, Any]] = []
+        self._dates = array("I")
+        self._account_codes: Dict[str, int] = {}
+        self._account_documents: Dict[int, array] = {}
+        self._postings: Dict[Tuple[int, str], array] = {}
+        self._vocabulary: List[str] = []
+        self._terms: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def clear(self) -> None:
+        """Drop every document"""
+        with self._lock:
+            self._documents = []
+            self._dates = array("I")
+            self._account_codes = {}
+            self._account_documents = {}
+            self._postings = {}
+            self._vocabulary = []
+            self._terms = set()
+
+    def add(self, transaction: Dict[str, Any]) -> None:
+        self.add_many([transaction])
+
+    def add_many(self, transactions: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            for transaction in transactions:
+                doc_id = len(self._documents)
+                self._documents.append(transaction)
+                self._dates.append(int(transaction["date"].replace("-", "")))
+                account = self._account_codes.setdefault(transaction["account_id"], len(self._account_codes))
+                self._account_documents.setdefault(account, array("I")).append(doc_id)
+                for term in {token for text in _searchable_text(transaction) for token in tokenize(text)}:
+                    postings = self._postings.get((account, term))
+                    if postings is None:
+                        postings = self._postings[(account, term)] = array("I")
+                        if term not in self._terms:
+                            self._terms.add(term)
+                            bisect.insort(self._vocabulary, term)
+                    postings.append(doc_id)
+
+    def _expand(self, token: str, prefix: bool) -> List[str]:
+        """Vocabulary terms matched by a query token"""
+        if not prefix:
+            return [token] if token in self._terms else []
+        start = bisect.bisect_left(self._vocabulary, token)
+        end = bisect.bisect_left(self._vocabulary, token + "\uffff")
+        return self._vocabulary[start:end]
+
+    def search(
+        self,
+        query: str,
+        account_ids: Iterable[str],
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        prefix: bool = True,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Return transactions matching every query token, newest first.
+        Results are restricted to the given accounts and inclusive YYYY-MM-DD date range.
+        A blank query matches everything; one with no searchable tokens (only
+        punctuation or unsupported script) matches nothing.
+        """
+        tokens = tokenize(query)
+        if not tokens and query.strip():
+            return {"transactions": [], "total": 0}
+        low = int(start_date.replace("-", "")) if start_date else 0
+        high = int(end_date.replace("-", "")) if end_date else 99999999
+
+        with self._lock:
+            accounts = [self._account_codes[a] for a in account_ids if a in self._account_codes]
+            expanded = [self._expand(token, prefix) for token in tokens]
+            dates = self._dates
+            hits: List[int] = []
+            for account in accounts:
+                if not tokens:
+                    hits.extend(self._account_documents.get(account, ()))
+                    continue
+                candidates = None
+                token_sets = []
+                for terms in expanded:
+                    matches: Set[int] = set()
+                    for term in terms:
+                        matches.update(self._postings.get((account, term), ()))
+                    token_sets.append(matches)
+                # Intersect the most selective sets first
+                for matches in sorted(token_sets, key=len):
+                    candidates = matches if candidates is None else candidates & matches
+                    if not candidates:
+                        break
+                hits.extend(candidates or ())
+
+            hits = [doc_id for doc_id in hits if low <= dates[doc_id] <= high]
+            hits.sort(key=lambda doc_id: (dates[doc_id], doc_id), reverse=True)
+            page = [self._documents[doc_id] for doc_id in hits[offset:offset + limit]]
+
+        return {"transactions": page, "total": len(hits)}
+
+transaction_index = TransactionIndex()
@@ -0,0 +1,176 @@
+"""
+Month-end statement precomputation for the Sahl Bank API
+"""
+import asyncio
+import bisect
+import datetime
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from api.core.config import settings
+from api.endpoints.bank import mock_data
+from api.endpoints.bank.item_events import queue_statement_ready
+from api.endpoints.bank.pdf_renderer import get_statement_pdf_cache, statement_pdf_path
+from api.endpoints.bank.statement_store import closed_periods
+
+logger = logging.getLogger(__name__)
+
+# Progress is saved after this many accounts (a restart redoes at most these, which is harmless)
+CHECKPOINT_EVERY = 50
+
+def _seconds_until_next_period(now: Optional[datetime.datetime] = None) -> float:
+    now = now or datetime.datetime.now()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    next_start = (month_start + datetime.timedelta(days=32)).replace(day=1)
+    return (next_start - now).total_seconds()
+
+class StatementPrecomputer:
+    """
+    Background task that, once a month closes, builds every account's
+    statement summaries and the new month's PDF, at most STATEMENT_PRECOMPUTE_RATE
+    accounts per second, so the month-start rush only reads stored files.
+    Accounts are visited in ID order and progress is checkpointed to the
+    statement cache directory, so a restart resumes where the last run
+    stopped. Accounts that fail are kept in the state and retried, after the
+    pass and on later runs; the period is complete once none are left.
+    With several workers, one runs it at a time.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._task: Optional[asyncio.Task] = None
+        self.current: Optional[Dict[str, Any]] = None
+        self.stats = {"runs": 0, "accounts": 0, "errors": 0, "last_completed": None}
+
+    def _state_path(self, period: str) -> str:
+        return os.path.join(self.directory, f"precompute-{period}.json")
+
+    def load_state(self, period: str) -> Dict[str, Any]:
+        try:
+            with open(self._state_path(period)) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {"period": period, "cursor": None, "accounts": 0, "failed": [], "complete": False}
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        path = self._state_path(state["period"])
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(state, file)
+        os.replace(temp_path, path)
+
+    @contextmanager
+    def _exclusive(self):
+        """Yields True for the one process allowed to precompute right now"""
+        with open(os.path.join(self.directory, "precompute.lock"), "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _precompute_account(self, account_id: str, period: str) -> None:
+        account = mock_data.ACCOUNTS.get(account_id)
+        if not account:
+            return
+        # The same calls the statement endpoints make, so their next request finds these
+        # (the listing covers several months; only the newly closed one is new)
+        mock_data.generate_statements(account_id)
+        statement_pdf_path(account_id, account, period)
+        # Clients learn of the new statement instead of polling (at least once: a resumed run may repeat a few)
+        queue_statement_ready(account_id, period)
+
+    async def _attempt(self, account_id: str, period: str, interval: float) -> bool:
+        """Precompute one account, paced to interval; returns whether it succeeded"""
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(self._precompute_account, account_id, period)
+            self.stats["accounts"] += 1
+            succeeded = True
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Statement precompute failed for {account_id} {period}: {str(e)}")
+            succeeded = False
+        await asyncio.sleep(max(interval - (time.monotonic() - started), 0))
+        return succeeded
+
+    async def precompute(self, today: Optional[datetime.date] = None) -> Dict[str, Any]:
+        """Precompute the latest closed period, resuming a previous run of it; returns its state"""
+        period = closed_periods(1, today)[0][0]
+        state = await asyncio.to_thread(self.load_state, period)
+        if state["complete"]:
+            return state
+        with self._exclusive() as owner:
+            if not owner:
+                return state
+            # Another worker may have finished it before we took the lock
+            state = await asyncio.to_thread(self.load_state, period)
+            if state["complete"]:
+                return state
+
+            account_ids = await asyncio.to_thread(lambda: sorted(mock_data.ACCOUNTS))
+            start = bisect.bisect_right(account_ids, state["cursor"]) if state["cursor"] is not None else 0
+            logger.info(f"Precomputing {period} statements for {len(account_ids) - start} of {len(account_ids)} accounts")
+            self.current = state
+            self.stats["runs"] += 1
+            interval = 1.0 / settings.STATEMENT_PRECOMPUTE_RATE if settings.STATEMENT_PRECOMPUTE_RATE > 0 else 0.0
+            failed = state.setdefault("failed", [])
+            try:
+                for position in range(start, len(account_ids)):
+                    account_id = account_ids[position]
+                    if not await self._attempt(account_id, period, interval) and account_id not in failed:
+                        failed.append(account_id)
+                    state["cursor"] = account_id
+                    state["accounts"] += 1
+                    if state["accounts"] % CHECKPOINT_EVERY == 0:
+                        await asyncio.to_thread(self._save_state, state)
+                # Another try for the accounts that failed, in this pass or an earlier run
+                for account_id in list(failed):
+                    if await self._attempt(account_id, period, interval):
+                        failed.remove(account_id)
+                state["complete"] = not failed
+                if failed:
+                    logger.warning(f"{len(failed)} {period} statements failed to precompute; retrying them next run")
+                else:
+                    self.stats["last_completed"] = period
+                    logger.info(f"Precomputed {period} statements for {state['accounts']} accounts")
+            finally:
+                await asyncio.to_thread(self._save_state, state)
+                self.current = None
+        return state
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.precompute()
+            except Exception as e:
+                logger.error(f"Statement precompute run failed: {str(e)}")
+            await asyncio.sleep(min(_seconds_until_next_period(), settings.STATEMENT_PRECOMPUTE_CHECK_SECONDS))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info("Statement precompute scheduler started")
+
+    def snapshot(self) -> Dict[str, Any]:
+        period = closed_periods(1)[0][0]
+        return {**self.stats, "running": self.current is not None,
+                "latest_period": self.current or self.load_state(period)}
+
+_precomputer: Optional[StatementPrecomputer] = None
+
+def get_statement_precomputer() -> StatementPrecomputer:
+    """Get or initialize the statement precompute scheduler (state lives in the statement cache directory)"""
+    global _precomputer
+    if _precomputer is None:
+        _precomputer = StatementPrecomputer(get_statement_pdf_cache().directory)
+    return _precomputer
@@ -0,0 +1,68 @@
+"""
+Closed statement periods and their stored summaries for the Sahl Bank API
+"""
+import datetime
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from api.core.config import settings
+from api.endpoints.bank.pdf_renderer import get_statement_pdf_cache
+
+# Bump when the summary fields change so stored summaries are rebuilt
+SUMMARY_VERSION = 1
+
+def closed_periods(count: int, today: Optional[datetime.date] = None) -> List[Tuple[str, str, str]]:
+    """The last count closed monthly periods as (YYYY-MM, start date, end date), newest first"""
+    month_start = (today or datetime.date.today()).replace(day=1)
+    periods = []
+    for _ in range(count):
+        end = month_start - datetime.timedelta(days=1)
+        month_start = end.replace(day=1)
+        periods.append((end.strftime("%Y-%m"), month_start.isoformat(), end.isoformat()))
+    return periods
+
+class StatementStore:
+    """
+    Statement summaries of closed periods. A closed period's summary never
+    changes, so it is built once, written to the statement file cache shared
+    by all workers (next to the rendered PDFs) and kept decoded in a
+    per-process LRU.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(account_id: str, currency: str, period: str) -> str:
+        return f"summary|v{SUMMARY_VERSION}|{account_id}|{period}|{currency}"
+
+    def get(self, account_id: str, currency: str, period: str, build: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """The stored summary of a period, built and stored first if there is none"""
+        key = self._key(account_id, currency, period)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        path = get_statement_pdf_cache().get_or_create(
+            key, lambda: json.dumps(build(), separators=(",", ":")).encode(), ".json"
+        )
+        with open(path, "rb") as file:
+            summary = json.loads(file.read())
+        with self._lock:
+            self._entries[key] = summary
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return summary
+
+_statement_store: Optional[StatementStore] = None
+
+def get_statement_store() -> StatementStore:
+    """Get or initialize the statement summary store"""
+    global _statement_store
+    if _statement_store is None:
+        _statement_store = StatementStore(settings.STATEMENT_CACHE_ENTRIES)
+    return _statement_store
@@ -1,13 +1,19 @@
 import os
 import json
+import hashlib
 import logging
+import zlib
 from datetime import datetime
-from fastapi import APIRouter, Request, HTTPException, Header, Depends
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from fastapi import APIRouter, Request, HTTPException, Header, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from api.core.config import settings
-from services.data_service import read_data, write_data
-from services.db_service import DatabaseService
+from services.data_service import write_data, write_data_batch, iter_data_lines
+from services.db_service import DatabaseService, InvalidCursor, FAILED, QUEUED, STORED
+from services.categorization_service import get_categorizer, category_label
+from services.idempotency_service import get_idempotency_store, IdempotencyConflict
+from api.endpoints.bank.item_events import emit_new_transactions
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -16,47 +22,305 @@ class StoreDataInput(BaseModel):
     id: str
     balance: float
     accountId: str
+    amount: Optional[float] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    transaction_date: Optional[str] = None
+
+def _categorize_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill in the category of records that have a description but no category"""
+    pending = [record for record in records if record.get("description") and not record.get("category")]
+    categories = get_categorizer().categorize_many(record["description"] for record in pending)
+    for record, category in zip(pending, categories):
+        if category:
+            record["category"] = category_label(category)
+    return records
 
 @router.post("/")
-async def store_data(request: Request, api_key: str = Header(..., alias="sahl-api-key")):
+async def store_data(
+    request: Request,
+    api_key: str = Header(..., alias="sahl-api-key"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
     """
     Validates API key, then stores incoming JSON data to Supabase.
+    With an Idempotency-Key header, a retried request gets the original
+    response back without writing again.
     """
     if api_key != settings.API_KEY:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    
+
+    raw_body = await request.body()
+    store = get_idempotency_store() if idempotency_key else None
+    if store:
+        try:
+            replay = await store.begin(idempotency_key, hashlib.sha256(raw_body).hexdigest())
+        except IdempotencyConflict:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+        if replay is not None:
+            status_code, content = replay
+            logger.info(f"Replaying stored response for Idempotency-Key {idempotency_key}")
+            return JSONResponse(content=content, status_code=status_code, headers={"Idempotent-Replayed": "true"})
+
+    completed = False
     try:
-        body = await request.json()
+        body = json.loads(raw_body)
         data_input = StoreDataInput(**body)
+        record = _categorize_records([data_input.model_dump(exclude_none=True)])[0]
         
-        # Store in Supabase
-        db_success = await DatabaseService.store_transaction(data_input.dict())
+        # Store in Supabase (queued for replay while the database is unavailable)
+        outcome = await DatabaseService.store_transaction(record)
         
         # Also keep file-based backup
-        write_data(data_input.dict())
+        write_data(record)
+        if outcome != FAILED:
+            await emit_new_transactions([record])
         
-        return JSONResponse(content={
-            "success": db_success,
-            "message": "Data saved successfully to database"
-        })
+        content = {
+            "success": outcome != FAILED,
+            "queued": outcome == QUEUED,
+            "message": {
+                STORED: "Data saved successfully to database",
+                QUEUED: "Database unavailable; data queued and will be saved when it recovers",
+                FAILED: "Database write failed",
+            }[outcome]
+        }
+        # Only accepted writes are remembered, so a failed attempt can be retried
+        if store and outcome != FAILED:
+            await store.complete(idempotency_key, 200, content)
+            completed = True
+        return JSONResponse(content=content)
     except Exception as e:
         logger.error(f"Error saving data: {str(e)}")
         raise HTTPException(status_code=500, detail="Error saving data")
+    finally:
+        # Also on cancellation (client gone), or retries with this key would wait forever
+        if store and not completed:
+            store.abort(idempotency_key)
+
+@router.post("/bulk")
+async def store_data_bulk(request: Request, api_key: str = Header(..., alias="sahl-api-key")):
+    """
+    Validates API key, then ingests a streamed NDJSON body (optionally gzip-compressed).
+    Records are validated line by line and stored in chunked bulk inserts,
+    so memory stays bounded by the chunk size rather than the body size.
+    """
+    if api_key != settings.API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    received = stored = failed = 0
+    errors = []
+    chunk = []
+    chunk_lines = []
+
+    def record_error(line_number: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < settings.BULK_MAX_REPORTED_ERRORS:
+            errors.append({"line": line_number, "error": message})
+
+    async def flush():
+        nonlocal stored
+        _categorize_records(chunk)
+        db_stored = await DatabaseService.store_transactions(chunk)
+        if db_stored == len(chunk):
+            stored += db_stored
+            await emit_new_transactions(chunk)
+        else:
+            for line_number in chunk_lines:
+                record_error(line_number, "Database insert failed")
+        # Keep file-based backup of every valid record, as for single writes
+        write_data_batch(chunk)
+        chunk.clear()
+        chunk_lines.clear()
+
+    try:
+        async for line_number, line in _iter_ndjson_lines(request):
+            received += 1
+            if line is None:
+                record_error(line_number, f"Line exceeds {settings.BULK_MAX_LINE_BYTES} bytes")
+                continue
+            try:
+                data_input = StoreDataInput.model_validate_json(line)
+            except ValidationError as e:
+                record_error(line_number, _format_validation_error(e))
+                continue
+            chunk.append(data_input.model_dump(exclude_none=True))
+            chunk_lines.append(line_number)
+            if len(chunk) >= settings.BULK_CHUNK_SIZE:
+                await flush()
+        if chunk:
+            await flush()
+    except zlib.error as e:
+        logger.error(f"Invalid gzip body in bulk upload: {str(e)}")
+        raise HTTPException(status_code=400, detail="Invalid gzip body")
+    except Exception as e:
+        logger.error(f"Error in bulk data upload: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error saving data")
+
+    logger.info(f"Bulk upload finished: {received} received, {stored} stored, {failed} failed")
+    return JSONResponse(content={
+        "success": failed == 0,
+        "received": received,
+        "stored": stored,
+        "failed": failed,
+        "errors": errors,
+        "errorsTruncated": failed > len(errors)
+    })
+
+async def _iter_ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Yield (line_number, line) pairs from a streamed NDJSON body.
+    Gzip bodies are detected from the headers or the magic bytes and inflated incrementally,
+    each network chunk in pieces of at most BULK_MAX_LINE_BYTES whose lines are yielded
+    before the next piece is inflated (a high-ratio chunk never sits in memory whole).
+    Lines longer than BULK_MAX_LINE_BYTES are yielded as None and skipped.
+    """
+    max_line = settings.BULK_MAX_LINE_BYTES
+    compressed = request.headers.get("content-encoding", "").lower() == "gzip" or \
+        request.headers.get("content-type", "").split(";")[0].strip() in ("application/gzip", "application/x-gzip")
+    decompressor = None
+    sniffed = False
+    buffer = b""
+    line_number = 0
+    skipping = False
+
+    async for raw in request.stream():
+        if not raw:
+            continue
+        if not sniffed:
+            sniffed = True
+            if compressed or raw[:2] == b"\x1f\x8b":
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        pieces = (raw,) if decompressor is None else _inflate(decompressor, raw, max_line)
+        for piece in pieces:
+            buffer += piece
+            start = 0
+            while True:
+                end = buffer.find(b"\n", start)
+                if end == -1:
+                    break
+                line = buffer[start:end].strip()
+                start = end + 1
+                if skipping:
+                    skipping = False
+                    continue
+                line_number += 1
+                if line:
+                    yield line_number, line if len(line) <= max_line else None
+            buffer = buffer[start:]
+            if len(buffer) > max_line and not skipping:
+                # Report the oversized line once and drop it until its newline
+                line_number += 1
+                yield line_number, None
+                skipping = True
+            if skipping:
+                buffer = b""
+
+    line = buffer.strip()
+    if line and not skipping:
+        line_number += 1
+        yield line_number, line
+
+def _inflate(decompressor, raw: bytes, max_size: int) -> Iterator[bytes]:
+    """Inflate raw lazily, max_size bytes at a time"""
+    data = decompressor.decompress(raw, max_size)
+    while data:
+        yield data
+        if not decompressor.unconsumed_tail:
+            break
+        data = decompressor.decompress(decompressor.unconsumed_tail, max_size)
+
+def _format_validation_error(error: ValidationError) -> str:
+    """Summarize a Pydantic validation error for the per-line report"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'record'}: {err['msg']}"
+        for err in error.errors()
+    )
 
 @router.get("/")
-async def get_data(api_key: str = Header(..., alias="sahl-api-key")):
+async def get_data(
+    api_key: str = Header(..., alias="sahl-api-key"),
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    stream: bool = Query(False)
+):
     """
     Returns stored data if the provided API key is valid.
+    - limit/cursor page through the backup journal in write order
+    - since/until filter on the dateSaved timestamp
+    - stream=true returns the page as NDJSON instead of a JSON envelope
+    Only the requested slice of the file is read, located through its index.
     """
     if api_key != settings.API_KEY:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    
+
+    try:
+        start = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
     try:
-        # Try to get data from file backup
-        data = read_data()
-        if not data:
+        # Read from file backup
+        lines, next_cursor = iter_data_lines(start, limit, since, until)
+        first_line = next(lines, None)
+        headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+
+        if stream:
+            return StreamingResponse(
+                _stream_ndjson(first_line, lines),
+                media_type="application/x-ndjson",
+                headers=headers
+            )
+        if first_line is None:
             return JSONResponse(content={"success": False, "message": "No data found", "path": settings.FILE_PATH})
-        return JSONResponse(content={"success": True, "data": data})
+        return StreamingResponse(
+            _stream_json_envelope(first_line, lines, next_cursor),
+            media_type="application/json",
+            headers=headers
+        )
     except Exception as e:
         logger.error(f"Error reading data: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading data")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error reading data")
+
+@router.get("/transactions")
+async def get_transactions(
+    api_key: str = Header(..., alias="sahl-api-key"),
+    account_id: str = Query(...),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    category: Optional[str] = Query(None)
+):
+    """
+    Returns an account's stored transactions from the database, newest first.
+    Pass nextCursor back as cursor for the following page; since/until bound
+    created_at and category must match exactly.
+    """
+    if api_key != settings.API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    try:
+        page = await DatabaseService.get_transactions_page(account_id, limit, cursor, since, until, category)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content={"success": True, "data": page["transactions"], "nextCursor": page["next_cursor"]})
+
+def _stream_ndjson(first_line: Optional[bytes], lines: Iterator[bytes]) -> Iterator[bytes]:
+    """Emit journal lines as NDJSON"""
+    if first_line is None:
+        return
+    yield first_line + b"\n"
+    for line in lines:
+        yield line + b"\n"
+
+def _stream_json_envelope(first_line: bytes, lines: Iterator[bytes], next_cursor: Optional[int]) -> Iterator[bytes]:
+    """Wrap journal lines in the {"success": true, "data": [...]} envelope without re-parsing them"""
+    yield b'{"success":true,"data":[' + first_line
+    for line in lines:
+        yield b"," + line
+    yield b'],"nextCursor":' + json.dumps(None if next_cursor is None else str(next_cursor)).encode() + b"}"
@@ -0,0 +1,143 @@
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+import logging
+from api.core.config import settings
+from api.core.tracing import get_memory_exporter
+from api.core.profiling import profile_store, background_profiler, get_loop_monitor
+from api.core.admission import admission_controller
+from api.core.compression import compression_stats
+from services.scraping_service import scrape_metrics
+from services.db_service import get_db_breaker
+from services.write_journal import get_write_journal
+from services.webhook_service import get_webhook_dispatcher
+from api.endpoints.bank.statement_scheduler import get_statement_precomputer
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _require_admin(api_key: str):
+    """Debug endpoints expose internals, so they require the service API key"""
+    if api_key != settings.API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+@router.get("/traces")
+async def get_traces(
+    api_key: str = Header(..., alias="sahl-api-key"),
+    limit: int = Query(20, ge=1, le=500),
+    min_duration_ms: float = Query(0.0, ge=0)
+):
+    """
+    Returns the most recent sampled traces from the in-memory ring buffer, newest first.
+    Each trace is a list of spans with the request's root span first.
+    """
+    _require_admin(api_key)
+
+    exporter = get_memory_exporter()
+    if exporter is None:
+        return JSONResponse(content={"success": False, "message": "In-memory trace exporter is disabled"})
+    traces = exporter.recent(limit, min_duration_ms)
+    return JSONResponse(content={"success": True, "traces": traces, "count": len(traces)})
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str, api_key: str = Header(..., alias="sahl-api-key")):
+    """Returns a single trace from the in-memory ring buffer"""
+    _require_admin(api_key)
+
+    exporter = get_memory_exporter()
+    if exporter is not None:
+        for trace in exporter.recent(settings.TRACE_BUFFER_SIZE):
+            if trace and trace[0]["trace_id"] == trace_id:
+                return JSONResponse(content={"success": True, "spans": trace})
+    raise HTTPException(status_code=404, detail="Trace not found")
+
+@router.get("/profiles")
+async def list_profiles(api_key: str = Header(..., alias="sahl-api-key")):
+    """Lists recent per-request profiles captured with the X-Profile header (REQUEST_PROFILING_ENABLED)"""
+    _require_admin(api_key)
+    return JSONResponse(content={"success": True, "profiles": profile_store.list()})
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, api_key: str = Header(..., alias="sahl-api-key")):
+    """Returns a per-request profile in collapsed-stack (flame graph) format"""
+    _require_admin(api_key)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["collapsed"])
+
+@router.post("/profiler/start")
+async def start_profiler(
+    api_key: str = Header(..., alias="sahl-api-key"),
+    seconds: float = Query(30.0, gt=0, le=300),
+    interval_ms: float = Query(10.0, ge=1, le=1000)
+):
+    """Switches on the background sampling profiler for a bounded number of seconds"""
+    _require_admin(api_key)
+    try:
+        background_profiler.start(seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return JSONResponse(content={"success": True, **background_profiler.status()})
+
+@router.post("/profiler/stop")
+async def stop_profiler(api_key: str = Header(..., alias="sahl-api-key")):
+    """Stops the background profiler early"""
+    _require_admin(api_key)
+    background_profiler.stop()
+    return JSONResponse(content={"success": True, **background_profiler.status()})
+
+@router.get("/profiler")
+async def get_profiler(
+    api_key: str = Header(..., alias="sahl-api-key"),
+    format: str = Query("json", pattern="^(json|collapsed)$")
+):
+    """Returns the background profiler status, or its samples in collapsed-stack format"""
+    _require_admin(api_key)
+    if format == "collapsed":
+        if background_profiler.sampler is None:
+            raise HTTPException(status_code=404, detail="Profiler has not been run")
+        return PlainTextResponse(background_profiler.sampler.collapsed())
+    return JSONResponse(content={"success": True, **background_profiler.status()})
+
+@router.get("/loop-lag")
+async def get_loop_lag(api_key: str = Header(..., alias="sahl-api-key")):
+    """Returns event-loop lag statistics and recent slow callbacks with their stacks"""
+    _require_admin(api_key)
+    return JSONResponse(content={"success": True, **get_loop_monitor().snapshot()})
+
+@router.get("/admission")
+async def get_admission(api_key: str = Header(..., alias="sahl-api-key")):
+    """Returns in-flight and shed request counts per route class"""
+    _require_admin(api_key)
+    return JSONResponse(content={"success": True, **admission_controller.stats()})
+
+@router.get("/scraper")
+async def get_scraper_metrics(api_key: str = Header(..., alias="sahl-api-key")):
+    """Returns scrape success counts and latencies per backend and step, and balance cache hit counts"""
+    _require_admin(api_key)
+    return JSONResponse(content={"success": True, **scrape_metrics.snapshot()})
+
+@router.get("/compression")
+async def get_compression_stats(api_key: str = Header(..., alias="sahl-api-key")):
+    """Returns compressed bytes in and out, and compression time, per encoding, plus skipped responses by reason"""
+    _require_admin(api_key)
+    return JSONResponse(content={"success": True, **compression_stats.snapshot()})
+
+@router.get("/db")
+async def get_db_status(api_key: str = Header(..., alias="sahl-api-key")):
+    """Returns the Supabase circuit breaker state and the pending write journal backlog"""
+    _require_admin(api_key)
+    return JSONResponse(content={"success": True, "breaker": get_db_breaker().snapshot(),
+                                 "journal": get_write_journal().stats()})
+
+@router.get("/webhooks")
+async def get_webhook_stats(api_key: str = Header(..., alias="sahl-api-key")):
+    """Returns webhook delivery counts and the outbound queue by status"""
+    _require_admin(api_key)
+    return JSONResponse(content={"success": True, **get_webhook_dispatcher().snapshot()})
+
+@router.get("/statements")
+async def get_statement_precompute_status(api_key: str = Header(..., alias="sahl-api-key")):
+    """Returns the month-end statement precompute progress for the latest closed period"""
+    _require_admin(api_key)
+    return JSONResponse(content={"success": True, **get_statement_precomputer().snapshot()})
@@ -1,62 +1,133 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Request, status
 from fastapi.responses import JSONResponse
-import tempfile
+import asyncio
+import datetime
 import magic
 import logging
-from services.pdf_service import parse_pdf
-from pathlib import Path
+from typing import Optional, Union
+from pydantic import BaseModel, Field, ValidationError
+from api.core.config import settings
+from api.core.tracing import span
+from services.pdf_service import iter_page_texts
+from services.verification_service import DocumentVerifier
+from services.statement_service import get_extraction_executor, iter_statement_rows, to_bank_transaction, to_store_record
+from services.upload_service import (
+    receive_upload, UploadBuffer, UploadTooLarge, UnsupportedUpload, MalformedUpload
+)
+from services.db_service import DatabaseService
+from services.data_service import write_data_batch
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+PREVIEW_CHARS = 500
 ALLOWED_MIME_TYPES = {"application/pdf", "application/x-pdf"}
 
-@router.post("/", status_code=status.HTTP_202_ACCEPTED)
+class ParsePdfForm(BaseModel):
+    documentName: Optional[str] = Field(None, max_length=100)
+    verification: bool = False
+    holderName: Optional[str] = Field(None, max_length=100)
+    accountNumber: Optional[str] = Field(None, max_length=64)
+    iban: Optional[str] = Field(None, max_length=64)
+    statementStart: Optional[datetime.date] = None
+    statementEnd: Optional[datetime.date] = None
+    mode: str = Field("text", pattern="^(text|transactions)$")
+    accountId: Optional[str] = Field(None, max_length=100)
+    store: bool = False
+
+# The body is parsed by hand, so describe the multipart form for the API docs
+_FORM_SCHEMA = ParsePdfForm.model_json_schema()
+_FORM_SCHEMA["properties"] = {"pdf": {"type": "string", "format": "binary"}, **_FORM_SCHEMA["properties"]}
+_FORM_SCHEMA["required"] = ["pdf"]
+
+def _sniff_pdf(head: bytes) -> None:
+    """Validate file type using magic numbers on the first bytes received"""
+    mime_type = magic.from_buffer(head, mime=True)
+    if mime_type not in ALLOWED_MIME_TYPES:
+        logger.warning(f"Rejected invalid file type: {mime_type}")
+        raise UnsupportedUpload("Only PDF files are accepted")
+
+@router.post(
+    "/",
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": _FORM_SCHEMA}}}}
+)
 async def parse_pdf_endpoint(
-    pdf: UploadFile = File(..., max_length=MAX_FILE_SIZE),
-    documentName: str = Form(None, max_length=100),
-    verification: bool = Form(False)
+    request: Request,
+    api_key: Optional[str] = Header(None, alias="sahl-api-key")
 ):
     """
     Secure PDF processing endpoint with validation:
-    - Limits file size to 10MB
-    - Verifies actual file type using magic numbers
-    - Processes files on disk to avoid memory issues
+    - Limits file size to UPLOAD_MAX_BYTES (10MB) while the body streams in
+    - Verifies actual file type using magic numbers on the first chunk
+    - Keeps uploads up to UPLOAD_SPOOL_MAX_BYTES in memory, spooling larger ones to disk
+    With verification=true, the document is checked for every supplied field
+    (documentName, holderName, accountNumber, iban, statementStart/End).
+    With mode=transactions, statement rows are extracted page by page and
+    returned as transactions; store=true also saves them for accountId.
     """
     try:
-        # Validate file type using magic numbers
-        file_header = await pdf.read(2048)
-        await pdf.seek(0)
-        mime_type = magic.from_buffer(file_header, mime=True)
-        
-        if mime_type not in ALLOWED_MIME_TYPES:
-            logger.warning(f"Rejected invalid file type: {mime_type}")
+        fields, filename, upload = await receive_upload(
+            request,
+            "pdf",
+            max_bytes=settings.UPLOAD_MAX_BYTES,
+            spool_max_bytes=settings.UPLOAD_SPOOL_MAX_BYTES,
+            sniff=_sniff_pdf,
+            spill_dir=settings.UPLOAD_SPILL_DIR,
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UnsupportedUpload as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except MalformedUpload as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    try:
+        try:
+            form = ParsePdfForm.model_validate(fields)
+        except ValidationError as e:
             raise HTTPException(
-                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-                detail="Only PDF files are accepted"
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=e.errors(include_url=False, include_context=False)
             )
+        if form.store:
+            if api_key != settings.API_KEY:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+            if form.mode != "transactions" or not form.accountId:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="store requires mode=transactions and an accountId"
+                )
+
+        if form.mode == "transactions":
+            # Pool workers run in other processes and need a path; in-process extraction reads the bytes directly
+            source: Union[str, bytes] = upload.getvalue() \
+                if upload.in_memory and get_extraction_executor() is None else upload.as_path()
+            return await _extract_transactions(
+                source, form.accountId or "statement", upload.sha256.hexdigest()[:16], form.store
+            )
+
+        verifier = None
+        if form.verification:
+            verifier = DocumentVerifier(form.model_dump(include={
+                "documentName", "holderName", "accountNumber", "iban", "statementStart", "statementEnd"
+            }))
+            if not verifier.fields:
+                verifier = None
+
+        with span("pdf.analyze_text", verification=verifier is not None, bytes=upload.size):
+            preview, analyzed_chars = await asyncio.to_thread(_analyze_text, upload, verifier)
 
-        # Process in temporary directory
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_path = Path(tmp_dir) / pdf.filename
-            with tmp_path.open("wb") as buffer:
-                while content := await pdf.read(1024 * 1024):  # 1MB chunks
-                    buffer.write(content)
-            
-            full_text = parse_pdf(tmp_path)
-            
-            # Analysis logic preserved
-            fraudRisk = False
-            if verification and documentName:
-                fraudRisk = documentName not in full_text
-
-            return {
-                "success": True,
-                "extractedText": full_text[:500],
-                "fraudRisk": fraudRisk,
-                "analyzedChars": len(full_text)
-            }
+        verification_result = verifier.results() if verifier else None
+        result = {
+            "success": True,
+            "extractedText": preview,
+            "fraudRisk": not verification_result["verified"] if verifier else False,
+            "analyzedChars": analyzed_chars
+        }
+        if verification_result:
+            result["verification"] = verification_result
+        return result
 
     except HTTPException:
         raise
@@ -65,4 +136,78 @@ async def parse_pdf_endpoint(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="PDF processing error"
-        )
\ No newline at end of file
+        )
+    finally:
+        upload.close()
+
+def _analyze_text(upload: UploadBuffer, verifier: Optional[DocumentVerifier]) -> tuple:
+    """
+    Read the document page by page, keeping a text preview and feeding the verifier.
+    Verification stops reading as soon as every field is resolved.
+    """
+    preview = ""
+    analyzed_chars = 0
+    for page_number, text in enumerate(iter_page_texts(upload.open())):
+        analyzed_chars += len(text)
+        if len(preview) < PREVIEW_CHARS:
+            preview += text[:PREVIEW_CHARS - len(preview)]
+        if verifier and verifier.feed(page_number, text):
+            break
+    return preview, analyzed_chars
+
+async def _extract_transactions(source: Union[str, bytes], account_id: str, statement_digest: str, store: bool) -> dict:
+    """
+    Extract statement transactions page by page.
+    Rows are stored in BULK_CHUNK_SIZE batches as pages arrive, so storage
+    overlaps extraction of the remaining pages.
+    """
+    statement_id = f"stmt_{statement_digest}"
+    transactions = []
+    chunk = []
+    pages = stored = unstored = 0
+    balance = None
+
+    async def flush():
+        nonlocal stored, unstored
+        db_stored = await DatabaseService.store_transactions(chunk)
+        stored += db_stored
+        unstored += len(chunk) - db_stored
+        write_data_batch(chunk)
+        chunk.clear()
+
+    with span("statement.extract", account_id=account_id, store=store) as current:
+        async for page_number, rows in iter_statement_rows(source):
+            pages += 1
+            for row in rows:
+                # Fill gaps in the balance column from the running balance
+                if row["balance"] is None and balance is not None:
+                    row["balance"] = round(balance + row["amount"], 2)
+                balance = row["balance"]
+                row["page"] = page_number + 1
+                index = len(transactions)
+                transactions.append(to_bank_transaction(row, account_id, index))
+                if store:
+                    if row["balance"] is None:
+                        unstored += 1
+                        continue
+                    chunk.append(to_store_record(row, account_id, statement_id, index))
+                    if len(chunk) >= settings.BULK_CHUNK_SIZE:
+                        await flush()
+        if chunk:
+            await flush()
+        if current:
+            current.set_attribute("pages", pages)
+            current.set_attribute("transactions", len(transactions))
+
+    logger.info(f"Extracted {len(transactions)} transactions from {pages} statement pages")
+    result = {
+        "success": True,
+        "mode": "transactions",
+        "statementId": statement_id,
+        "pages": pages,
+        "transactionCount": len(transactions),
+        "transactions": transactions,
+    }
+    if store:
+        result.update({"stored": stored, "unstored": unstored})
+    return result
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Header
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from services.scraping_service import scrape_balance
+from pydantic import BaseModel, Field
+from api.core.config import settings
+from services.scraping_service import ScraperSessionMissing
+from services.scraped_balance_service import get_scraped_balance
 
 router = APIRouter()
 
@@ -9,17 +12,26 @@ class ScrapeInput(BaseModel):
     username: str
     password: str
     otp: str = None
+    # Accept a balance scraped up to this many seconds ago instead of logging in
+    max_age: Optional[float] = Field(None, ge=0)
 
 @router.post("/")
-async def scrape_endpoint(input_data: ScrapeInput):
+async def scrape_endpoint(input_data: ScrapeInput, api_key: Optional[str] = Header(None, alias="sahl-api-key")):
     """
     Handles login and scraping flow.
     - If no OTP is provided, initiates login and returns "OTP_REQUIRED".
     - If OTP is provided, submits it and returns the extracted balance.
+    - With max_age, a recent enough scraped balance is returned without logging in
+      (for the same credentials, or any stored balance with the service API key).
     """
     try:
-        result = scrape_balance(input_data.username, input_data.password, input_data.otp)
+        result = await get_scraped_balance(
+            input_data.username, input_data.password, input_data.otp,
+            max_age=input_data.max_age, trusted=api_key is not None and api_key == settings.API_KEY,
+        )
         return JSONResponse(content=result)
+    except ScraperSessionMissing as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         print("Error in scraping endpoint:", e)
-        raise HTTPException(status_code=500, detail=f"Scraping failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Scraping failed: {str(e)}")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Batch Endpoint Benchmark
+
+Generates a small bank dataset, starts the API under uvicorn and fetches
+auth, transactions and statements for every access token twice: as separate
+/bank/auth/get, /bank/transactions/get and /bank/statements/get calls (with
+--clients concurrent connections, as a dashboard does today) and as
+/bank/batch requests of --batch-size operations. Reports requests made,
+wall time, bytes received and time to the first batch result.
+
+Usage:
+    python bench_batch.py --tokens 300 --transactions 50 --batch-size 300
+
+Requires the SUPABASE_URL/SUPABASE_KEY environment variables (any value works;
+the benchmarked routes don't use them).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from api.endpoints.bank.dataset import generate_dataset
+
+OPERATIONS = [
+    ("auth/get", {}),
+    ("transactions/get", {"start_date": "2000-01-01", "end_date": "2100-01-01"}),
+    ("statements/get", {}),
+]
+
+async def separate_calls(client, headers, tokens, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+    received = 0
+
+    async def call(operation, access_token, params):
+        nonlocal received
+        async with slots:
+            response = await client.post(f"/bank/{operation}", json={"access_token": access_token, **params}, headers=headers)
+            response.raise_for_status()
+            received += len(response.content)
+
+    await asyncio.gather(*(call(operation, token, params) for token in tokens for operation, params in OPERATIONS))
+    return len(tokens) * len(OPERATIONS), received
+
+async def batched_calls(client, headers, tokens, batch_size):
+    entries = [{"operation": operation, "access_token": token, "params": params}
+               for token in tokens for operation, params in OPERATIONS]
+    received, requests, first_result = 0, 0, None
+    started = time.perf_counter()
+    for start in range(0, len(entries), batch_size):
+        chunk = entries[start:start + batch_size]
+        parts = []
+        async with client.stream("POST", "/bank/batch", json={"requests": chunk}, headers=headers) as response:
+            response.raise_for_status()
+            async for data in response.aiter_bytes():
+                if first_result is None and b'"index"' in data:
+                    first_result = time.perf_counter() - started
+                parts.append(data)
+        body = b"".join(parts)
+        requests += 1
+        received += len(body)
+        results = json.loads(body)["results"]
+        assert [result["index"] for result in results] == list(range(len(chunk)))
+        assert all(result["status"] == 200 for result in results), results[0]
+    return requests, received, first_result
+
+async def run(args, headers, tokens):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120,
+                                 headers={"Accept-Encoding": "identity"}) as client:
+        await client.post("/bank/batch", json={"requests": [{"operation": "auth/get", "access_token": tokens[0]}]},
+                          headers=headers)
+        start = time.perf_counter()
+        requests, received = await separate_calls(client, headers, tokens, args.clients)
+        elapsed = time.perf_counter() - start
+        print(f"{'separate calls':<16} {requests:>8} {elapsed:>8.2f} {received / 1e6:>9.1f}")
+        start = time.perf_counter()
+        requests, received, first_result = await batched_calls(client, headers, tokens, args.batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{'/bank/batch':<16} {requests:>8} {elapsed:>8.2f} {received / 1e6:>9.1f}  "
+              f"(first result after {first_result * 1000:.0f} ms)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-token bank calls with /bank/batch")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--transactions", type=int, default=50, help="Transactions per account")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent connections for separate calls")
+    parser.add_argument("--batch-size", type=int, default=300, help="Operations per /bank/batch request")
+    args = parser.parse_args()
+
+    dataset_dir = tempfile.mkdtemp(prefix="sahl-batch-")
+    generate_dataset(dataset_dir, clients=1, tokens=args.tokens, accounts_per_item=2,
+                     transactions=args.transactions, days=30)
+    with open(os.path.join(dataset_dir, "dataset.json")) as file:
+        client_id, client_secret = next(iter(json.load(file)["clients"].items()))
+    headers = {"X-Client-ID": client_id, "X-Client-Secret": client_secret}
+    tokens = [f"access-ds-{i:06d}" for i in range(args.tokens)]
+
+    env = {**os.environ, "BANK_DATASET_DIR": dataset_dir, "ADMISSION_CONTROL_ENABLED": "false"}
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+                               "--log-level", "warning"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{args.port}/health")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        print(f"{'mode':<16} {'requests':>8} {'seconds':>8} {'MB':>9}")
+        asyncio.run(run(args, headers, tokens))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Categorization Benchmark
+
+Measures how many transaction descriptions per second the merchant
+categorizer handles, both for unique descriptions (every lookup scans the
+text) and for a realistic repeated mix (most lookups hit the memo cache).
+
+Usage:
+    python bench_categorization.py --count 500000 --unique 20000
+"""
+
+import argparse
+import random
+import time
+
+from services.categorization_service import Categorizer, MERCHANT_RULES
+
+MERCHANTS = [
+    "Marjane", "Carrefour Market", "Aswak Assalam", "Café Maure",
+    "Hammam Traditionnel", "Patisserie Marocaine", "Pharmacie Atlas",
+    "Royal Air Maroc", "Riad Al Andalous", "Maroc Telecom", "INWI", "ONEE",
+    "LYDEC", "Salle de Sport Casablanca", "Electroplanet", "Acima",
+    "Virement Salaire", "Souk El Had", "Artisanat Maroc", "Fès Medina Shop",
+    "Tanger Med Port", "Marrakech Henna Art", "Librairie Nationale",
+]
+
+def make_descriptions(count, seed):
+    """Statement-style descriptions: prefix, merchant, reference and city"""
+    rng = random.Random(seed)
+    prefixes = ["PAIEMENT CB", "ACHAT TPE", "PRLV SEPA", "VIR RECU", "RETRAIT GAB", ""]
+    cities = ["CASABLANCA", "RABAT", "MARRAKECH", "FES", "TANGER", "AGADIR"]
+    return [
+        f"{rng.choice(prefixes)} {rng.choice(MERCHANTS).upper()} {rng.randint(100000, 999999)} {rng.choice(cities)}"
+        for _ in range(count)
+    ]
+
+def measure(label, descriptions, cache_size):
+    categorizer = Categorizer(MERCHANT_RULES, cache_size=cache_size)
+    start = time.perf_counter()
+    results = categorizer.categorize_many(descriptions)
+    elapsed = time.perf_counter() - start
+    matched = sum(1 for result in results if result)
+    print(f"{label:<22}{len(descriptions):>10}{len(descriptions) / elapsed:>14,.0f}{matched / len(descriptions):>10.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Merchant categorization benchmark")
+    parser.add_argument("--count", type=int, default=500000, help="Descriptions per run")
+    parser.add_argument("--unique", type=int, default=20000, help="Distinct descriptions in the repeated mix")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    unique = make_descriptions(args.count, args.seed)
+    pool = make_descriptions(args.unique, args.seed + 1)
+    rng = random.Random(args.seed)
+    repeated = [rng.choice(pool) for _ in range(args.count)]
+
+    print(f"{'run':<22}{'count':>10}{'desc/s':>14}{'matched':>10}")
+    measure("unique (no cache)", unique, cache_size=0)
+    measure("repeated (cached)", repeated, cache_size=100000)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Response Compression Benchmark
+
+Fetches real response bodies from the app (transaction list, statement
+list, statement PDF) and compresses each with every available encoding and
+a few levels. Reports the compressed size, bytes saved, compression CPU
+time, and the net time saved on a link of --link-mbps (transfer time saved
+minus compression time). Set BANK_DATASET_DIR to draw the bodies from a
+generated dataset instead of the built-in mock data.
+
+Usage:
+    python bench_compression.py --repeat 20 --link-mbps 2
+"""
+
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from api.core.compression import BrotliCodec, GzipCodec, ZstdCodec
+from main import app
+
+AUTH = {"X-Client-ID": "client_123456", "X-Client-Secret": "secret_abcdef123456", "Accept-Encoding": "identity"}
+
+def fetch_bodies(client, access_token):
+    from api.endpoints.bank.mock_data import ACCESS_TOKEN_MAP
+    account_id = ACCESS_TOKEN_MAP[access_token]["accounts"][0]
+    window = {"access_token": access_token, "start_date": "2000-01-01", "end_date": "2100-01-01"}
+    requests = {
+        "transactions": ("POST", "/bank/transactions/get", window),
+        "statements": ("POST", "/bank/statements/get", window),
+        "statement_pdf": ("POST", "/bank/statements/pdf",
+                          {"access_token": access_token, "account_id": account_id, "statement_date": "2024-01"}),
+    }
+    bodies = {}
+    for name, (method, path, payload) in requests.items():
+        response = client.request(method, path, json=payload, headers=AUTH)
+        response.raise_for_status()
+        bodies[name] = response.content
+    return bodies
+
+def codecs():
+    candidates = [
+        lambda: GzipCodec(1), lambda: GzipCodec(6), lambda: GzipCodec(9),
+        lambda: BrotliCodec(1), lambda: BrotliCodec(5), lambda: BrotliCodec(11),
+        lambda: ZstdCodec(1), lambda: ZstdCodec(3), lambda: ZstdCodec(9),
+    ]
+    available = []
+    for make in candidates:
+        try:
+            available.append(make())
+        except ImportError:
+            pass
+    return available
+
+def level(codec):
+    return getattr(codec, "level", getattr(codec, "quality", None))
+
+def main():
+    parser = argparse.ArgumentParser(description="Response compression benchmark")
+    parser.add_argument("--access-token", default="access-token-1")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--link-mbps", type=float, default=2.0, help="Client link speed for the net time column")
+    args = parser.parse_args()
+
+    bodies = fetch_bodies(TestClient(app), args.access_token)
+    bytes_per_ms = args.link_mbps * 1e6 / 8 / 1000
+    print(f"{'body':<14} {'encoding':<8} {'level':>5} {'bytes':>9} {'out':>8} {'ratio':>6} "
+          f"{'cpu ms':>8} {'MB/s':>7} {'saved KB/cpu ms':>16} {'net ms':>8}")
+    for name, body in bodies.items():
+        for codec in codecs():
+            start = time.process_time()
+            for _ in range(args.repeat):
+                compressed = codec.compress(body)
+            cpu_ms = (time.process_time() - start) / args.repeat * 1000
+            saved = len(body) - len(compressed)
+            net_ms = saved / bytes_per_ms - cpu_ms
+            per_cpu = saved / 1024 / cpu_ms if cpu_ms else float("inf")
+            print(f"{name:<14} {codec.name:<8} {level(codec):>5} {len(body):>9} {len(compressed):>8} "
+                  f"{len(compressed) / len(body):>6.3f} {cpu_ms:>8.3f} {len(body) / cpu_ms / 1000 if cpu_ms else 0:>7.1f} "
+                  f"{per_cpu:>16.1f} {net_ms:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Database Failure Injection Run
+
+Starts the PostgREST stand-in (stub_postgrest.py) and sends transactions
+through POST /store-data/, each followed by a read of the account's
+transactions, while the stand-in moves through a series of phases: healthy,
+slow (slower than SUPABASE_TIMEOUT_SECONDS), down, a lost acknowledgement,
+and healthy again. For each phase it reports write and read latency, how
+many writes were stored or queued, and the circuit breaker state at its end.
+It then waits for the journal to drain and checks that every transaction
+reached the database exactly once, in the order it was sent.
+
+Usage:
+    python bench_db_faults.py --writes 40 --phase-seconds 3 --timeout 0.5 --reset 2
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from stub_postgrest import create_app
+
+def start_stub(port):
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Inject Supabase failures and check that queued writes are replayed")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--writes", type=int, default=40, help="Writes per phase")
+    parser.add_argument("--phase-seconds", type=float, default=3.0, help="Writes are spread over this long per phase")
+    parser.add_argument("--timeout", type=float, default=0.5, help="SUPABASE_TIMEOUT_SECONDS")
+    parser.add_argument("--reset", type=float, default=2.0, help="DB_BREAKER_RESET_SECONDS")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sahl-faults-")
+    os.environ.update({
+        "SUPABASE_URL": f"http://127.0.0.1:{args.port}",
+        "SUPABASE_KEY": "stub.stub.stub",
+        "API_KEY": os.environ.get("API_KEY", "bench-key"),
+        "FILE_PATH": os.path.join(workdir, "data.json"),
+        "SUPABASE_TIMEOUT_SECONDS": str(args.timeout),
+        "DB_BREAKER_RESET_SECONDS": str(args.reset),
+        "DB_SLOW_CALL_SECONDS": str(args.timeout),
+        "DB_REPLAY_INTERVAL_SECONDS": "0.25",
+        "DB_REPLAY_BATCH_SIZE": "16",
+        "ADMISSION_CONTROL_ENABLED": "false",
+    })
+    start_stub(args.port)
+    stub = httpx.Client(base_url=f"http://127.0.0.1:{args.port}")
+
+    # Imported after the environment is set, so settings pick it up
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.write_journal import get_write_journal
+    from services.db_service import get_db_breaker
+
+    phases = [
+        ("healthy", {"mode": "ok"}),
+        ("slow", {"mode": "slow", "delay_ms": args.timeout * 3000}),
+        ("down", {"mode": "down"}),
+        ("lost ack", {"mode": "lost_ack", "count": 1}),
+        ("healthy", {"mode": "ok"}),
+    ]
+    sent = 0
+    headers = {"sahl-api-key": os.environ["API_KEY"]}
+    with TestClient(app) as client:
+        print(f"{'phase':<11} {'writes':>6} {'stored':>6} {'queued':>6} {'failed':>6} {'p50 ms':>8} {'max ms':>8} "
+              f"{'read p50':>9} {'read max':>9}  breaker")
+        for name, fault in phases:
+            stub.post("/_faults", json=fault)
+            phase_start = time.perf_counter()
+            latencies, reads, outcomes = [], [], {"stored": 0, "queued": 0, "failed": 0}
+            for i in range(args.writes):
+                time.sleep(max(phase_start + i * args.phase_seconds / args.writes - time.perf_counter(), 0))
+                body = {"id": str(sent), "balance": 1000.0 + sent, "accountId": "acc_faults", "amount": 1.0, "category": "Test"}
+                start = time.perf_counter()
+                content = client.post("/store-data/", json=body, headers=headers).json()
+                latencies.append((time.perf_counter() - start) * 1000)
+                outcomes["failed" if not content["success"] else "queued" if content["queued"] else "stored"] += 1
+                sent += 1
+                start = time.perf_counter()
+                client.get("/store-data/transactions", params={"account_id": "acc_faults", "limit": 5}, headers=headers)
+                reads.append((time.perf_counter() - start) * 1000)
+            print(f"{name:<11} {args.writes:>6} {outcomes['stored']:>6} {outcomes['queued']:>6} {outcomes['failed']:>6} "
+                  f"{statistics.median(latencies):>8.1f} {max(latencies):>8.1f} "
+                  f"{statistics.median(reads):>9.1f} {max(reads):>9.1f}  {get_db_breaker().state}")
+
+        deadline = time.time() + args.drain_timeout
+        while get_write_journal().has_pending() and time.time() < deadline:
+            time.sleep(0.1)
+        print(f"Breaker: {get_db_breaker().snapshot()}")
+        print(f"Journal drained: {not get_write_journal().has_pending()}  {get_write_journal().stats()}")
+
+    rows = stub.get("/_rows/transactions").json()
+    ids = [int(row["id"]) for row in rows]
+    duplicates = len(ids) - len(set(ids))
+    print(f"Rows in database: {len(rows)} of {sent} sent, duplicates: {duplicates}, "
+          f"in send order: {ids == sorted(ids)}")
+    missing = sorted(set(range(sent)) - set(ids))
+    if missing:
+        print(f"Missing: {missing[:20]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+FX Conversion Benchmark
+
+Converts a transaction list into a target currency two ways: one rate
+lookup per transaction (binary search + division every time), and the
+batch path (FxTable.convert_many) that resolves each day's factor vector
+once from the per-day cache. Checks both give the same amounts.
+
+Usage:
+    python bench_fx.py --transactions 200000 --days 365
+"""
+
+import argparse
+import datetime
+import random
+import time
+
+from services.fx_service import FxTable
+
+def make_transactions(count, days, seed):
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    currencies = ["MAD"] * 8 + ["EUR", "USD"]
+    return (
+        [round(rng.uniform(-500, 500), 2) for _ in range(count)],
+        [rng.choice(currencies) for _ in range(count)],
+        [(today - datetime.timedelta(days=rng.randint(0, days - 1))).isoformat() for _ in range(count)],
+    )
+
+def per_item(table, amounts, currencies, days, target):
+    """Uncached lookup for every transaction"""
+    converted = []
+    for amount, currency, day in zip(amounts, currencies, days):
+        row = table._row_for(day)
+        rates = table._rows[row]
+        converted.append(round(amount * (rates[table.position(currency)] / rates[table.position(target)]), 2))
+    return converted
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-item vs batch FX conversion")
+    parser.add_argument("--transactions", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--target", default="EUR")
+    args = parser.parse_args()
+
+    table = FxTable.stand_in("MAD")
+    amounts, currencies, days = make_transactions(args.transactions, args.days, seed=42)
+
+    start = time.perf_counter()
+    expected = per_item(table, amounts, currencies, days, args.target)
+    per_item_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    converted = table.convert_many(amounts, currencies, days, args.target)
+    batch_seconds = time.perf_counter() - start
+    assert converted == expected, "batch and per-item conversion disagree"
+
+    start = time.perf_counter()
+    table.convert_many(amounts, currencies, days, args.target)
+    warm_seconds = time.perf_counter() - start
+
+    print(f"{args.transactions} transactions over {args.days} days -> {args.target}")
+    print(f"  per-item lookup:     {args.transactions / per_item_seconds:,.0f}/s")
+    print(f"  batch (cold cache):  {args.transactions / batch_seconds:,.0f}/s")
+    print(f"  batch (warm cache):  {args.transactions / warm_seconds:,.0f}/s")
+
+if __name__ == "__main__":
+    main()
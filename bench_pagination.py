@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Pagination Benchmark
+
+Compares per-page latency of OFFSET pagination and keyset pagination on
+(created_at, id) at increasing page depths. The keyset query is the one
+DatabaseService.get_transactions_page sends through PostgREST:
+created_at <= c AND (created_at < c OR id < i) ORDER BY created_at DESC,
+id DESC, served by the (accountId, created_at DESC, id DESC) index from
+supabase_setup.sql.
+
+By default it runs on a local SQLite stand-in with the same table and
+index, seeded with --rows transactions for one account. With --supabase
+ACCOUNT_ID it pages through that account's existing rows on the configured
+SUPABASE_URL/SUPABASE_KEY (Postgres behind PostgREST) instead.
+
+Usage:
+    python bench_pagination.py --rows 1000000 --page-size 50 --depths 1 100 1000 10000
+    python bench_pagination.py --supabase test-user-1 --depths 1 10 100
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import sqlite3
+import statistics
+import time
+import uuid
+
+KEYSET_SQL = """
+    SELECT * FROM transactions
+    WHERE accountId = ? AND created_at <= ? AND (created_at < ? OR id < ?)
+    ORDER BY created_at DESC, id DESC LIMIT ?
+"""
+OFFSET_SQL = "SELECT * FROM transactions WHERE accountId = ? ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+
+def seed_sqlite(rows, account):
+    db = sqlite3.connect(":memory:")
+    db.execute("""
+        CREATE TABLE transactions (
+            id TEXT PRIMARY KEY, transaction_id TEXT, accountId TEXT NOT NULL, balance REAL,
+            amount REAL, description TEXT, category TEXT, status TEXT, created_at TEXT
+        )""")
+    rng = random.Random(0)
+    start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    batch = []
+    for i in range(rows):
+        # Bulk imports share timestamps, so ties on created_at are common
+        created = start + datetime.timedelta(seconds=i // 4 * 30)
+        batch.append((str(uuid.UUID(int=rng.getrandbits(128))), f"tx_{i}", account, 1000.0,
+                      round(rng.uniform(-500, 500), 2), "Marjane", "Shops > Supermarchés", "completed",
+                      created.isoformat()))
+        if len(batch) == 50000:
+            db.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    db.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    db.execute("CREATE INDEX idx_transactions_account_created_id ON transactions(accountId, created_at DESC, id DESC)")
+    db.execute("ANALYZE")
+    return db
+
+def timed(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, result
+
+def run_sqlite(args):
+    account = "acc_bench"
+    print(f"Seeding SQLite with {args.rows:,} transactions ...")
+    db = seed_sqlite(args.rows, account)
+    print(f"{'page':>8} {'offset ms':>10} {'keyset ms':>10}")
+    for depth in args.depths:
+        offset = (depth - 1) * args.page_size
+        if offset >= args.rows:
+            break
+        offset_ms, offset_rows = timed(lambda: db.execute(OFFSET_SQL, (account, args.page_size, offset)).fetchall(), args.repeat)
+        if offset:
+            # Cursor = last row of the previous page (fetched untimed)
+            created_at, row_id = db.execute(
+                "SELECT created_at, id FROM transactions WHERE accountId = ? ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?",
+                (account, offset - 1)).fetchone()
+            keyset_ms, keyset_rows = timed(lambda: db.execute(
+                KEYSET_SQL, (account, created_at, created_at, row_id, args.page_size)).fetchall(), args.repeat)
+        else:
+            keyset_ms, keyset_rows = offset_ms, offset_rows
+        assert keyset_rows == offset_rows, f"keyset and offset pages differ at page {depth}"
+        print(f"{depth:>8} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+def run_supabase(args):
+    from services.db_service import DatabaseService, get_supabase_client
+
+    def offset_page(offset):
+        return get_supabase_client().table('transactions').select('*').eq('accountId', args.supabase) \
+            .order('created_at', desc=True).order('id', desc=True).range(offset, offset + args.page_size - 1).execute().data
+
+    async def walk():
+        cursor, depth, pages = None, 1, {}
+        deepest = max(args.depths)
+        while depth <= deepest:
+            start = time.perf_counter()
+            page = await DatabaseService.get_transactions_page(args.supabase, args.page_size, cursor)
+            if depth in args.depths:
+                pages[depth] = ((time.perf_counter() - start) * 1000, page["transactions"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+            depth += 1
+        return pages
+
+    pages = asyncio.run(walk())
+    print(f"{'page':>8} {'offset ms':>10} {'keyset ms':>10}")
+    for depth, (keyset_ms, rows) in sorted(pages.items()):
+        offset_ms, offset_rows = timed(lambda: offset_page((depth - 1) * args.page_size), args.repeat)
+        assert [row["id"] for row in rows] == [row["id"] for row in offset_rows], f"pages differ at page {depth}"
+        print(f"{depth:>8} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offset vs keyset pagination benchmark")
+    parser.add_argument("--rows", type=int, default=1000000, help="Transactions to seed (SQLite stand-in)")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 10, 100, 1000, 10000, 20000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--supabase", metavar="ACCOUNT_ID", help="Page through this account on the configured Supabase instead")
+    args = parser.parse_args()
+    if args.supabase:
+        run_supabase(args)
+    else:
+        run_sqlite(args)
+
+if __name__ == "__main__":
+    main()
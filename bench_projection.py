@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Field Projection Benchmark
+
+Builds a /bank/transactions/get response body with --transactions
+transactions and serializes it the way FastAPI does (jsonable_encoder, then
+json.dumps) for the full body and for a few field sets. Reports payload bytes
+and the time to project and serialize, and the projection alone with the
+compiled extractor and with the generic projection it falls back to.
+
+Usage:
+    python bench_projection.py --transactions 5000 --repeat 20
+
+Requires the SUPABASE_URL/SUPABASE_KEY environment variables to import the
+API modules (any value works).
+"""
+
+import argparse
+import json
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from api.endpoints.bank.mock_data import ACCOUNTS, generate_transactions
+from api.endpoints.bank.projection import _field_tree, _project_slow, compile_projection, parse_fields
+
+FIELD_SETS = {
+    "amounts": "transactions.transaction_id,transactions.amount,transactions.date",
+    "ledger": "transactions.transaction_id,transactions.amount,transactions.date,transactions.merchant_name,"
+              "transactions.category,total_transactions",
+    "with city": "transactions.transaction_id,transactions.amount,transactions.date,transactions.location.city",
+}
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def serialize(body):
+    return json.dumps(jsonable_encoder(body), ensure_ascii=False, separators=(",", ":")).encode()
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload size and serialization time with field projection")
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    account_id = next(iter(ACCOUNTS))
+    body = {
+        "accounts": [ACCOUNTS[account_id]],
+        "transactions": generate_transactions(account_id, args.transactions, rng=random.Random(0)),
+        "item": {},
+        "total_transactions": args.transactions,
+    }
+
+    full_ms, full = timed(lambda: serialize(body), args.repeat)
+    print(f"{'fields':<11} {'bytes':>10} {'ratio':>6} {'total ms':>9} {'projection ms':>14} {'generic ms':>11}")
+    print(f"{'(all)':<11} {len(full):>10} {1:>6.2f} {full_ms:>9.1f}")
+    for name, fields in FIELD_SETS.items():
+        paths = parse_fields(fields)
+        extract = compile_projection(paths)
+        tree = _field_tree(paths)
+        total_ms, slim = timed(lambda: serialize(extract(body)), args.repeat)
+        compiled_ms, projected = timed(lambda: extract(body), args.repeat)
+        generic_ms, generic = timed(lambda: _project_slow(tree, body), args.repeat)
+        assert projected == generic
+        print(f"{name:<11} {len(slim):>10} {len(slim) / len(full):>6.2f} {total_ms:>9.1f} "
+              f"{compiled_ms:>14.2f} {generic_ms:>11.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Scraper Backend Comparison
+
+Runs the stub bank site (stub_bank_site.py) locally and drives the full
+credentials -> OTP -> balance flow through each scraper backend, checking
+the scraped balance and reporting per-step latency and the memory each open
+session costs (Python heap for the HTTP backend, Chrome processes for Selenium).
+
+Usage:
+    python bench_scrapers.py --backends http selenium --sessions 20
+
+Requires the SUPABASE_URL/SUPABASE_KEY environment variables (any value
+works). The Selenium backend needs Chrome; it is reported as unavailable
+otherwise. Note that its flow sleeps one second per password digit by design.
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+
+import uvicorn
+
+from bench_workers import memory_kb
+from stub_bank_site import create_app
+
+def descendants(pid):
+    """All child processes of pid, recursively (Linux)"""
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as file:
+            children.extend(int(child) for child in file.read().split())
+    return children + [grandchild for child in children for grandchild in descendants(child)]
+
+def start_stub(port, otp, balance, latency_ms):
+    server = uvicorn.Server(uvicorn.Config(create_app(otp, balance, latency_ms), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def summarize(label, values):
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return f"{label} p50 {statistics.median(values) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms"
+
+def run_backend(backend, sessions, password, otp, expected_balance):
+    login_times, otp_times = [], []
+    children_before = set(descendants(os.getpid()))
+    tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0]
+    users = [f"user{i:04d}" for i in range(sessions)]
+    try:
+        # Open every session before completing any, as concurrent users would
+        for user in users:
+            start = time.perf_counter()
+            assert backend.start_login(user, password)["status"] == "OTP_REQUIRED"
+            login_times.append(time.perf_counter() - start)
+        heap_per_session = (tracemalloc.get_traced_memory()[0] - heap_before) / sessions
+        browser_pids = [pid for pid in descendants(os.getpid()) if pid not in children_before]
+        browser_rss = sum(memory_kb(pid)[0] for pid in browser_pids) / sessions if browser_pids else 0
+        for user in users:
+            start = time.perf_counter()
+            result = backend.submit_otp(user, otp)
+            otp_times.append(time.perf_counter() - start)
+            assert result["balance"] == expected_balance, result
+    finally:
+        tracemalloc.stop()
+        for user in users:
+            backend.close(user)
+
+    print(f"[{backend.name}] {sessions} sessions, balance {expected_balance!r} scraped every time")
+    print(f"  {summarize('login', login_times)}; {summarize('otp+balance', otp_times)}")
+    print(f"  memory per open session: {heap_per_session / 1024:.0f} kB Python heap"
+          + (f", {browser_rss / 1024:.0f} MB browser RSS" if browser_rss else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare scraper backends against a local stub bank site")
+    parser.add_argument("--backends", nargs="+", default=["http", "selenium"], choices=["http", "selenium"])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated server delay per response")
+    args = parser.parse_args()
+
+    otp, balance = "123456", "12 345,67"
+    server = start_stub(args.port, otp, balance, args.latency_ms)
+    login_url = f"http://127.0.0.1:{args.port}/"
+    try:
+        for name in args.backends:
+            if name == "http":
+                from services.http_scraper import HttpSessionScraper
+                backend = HttpSessionScraper(login_url)
+                sessions = args.sessions
+            else:
+                from services.scraping_service import SeleniumScraper
+                backend = SeleniumScraper(login_url)
+                # Each Selenium session is a Chrome; keep the run short
+                sessions = min(args.sessions, 3)
+            try:
+                run_backend(backend, sessions, "1234", otp, balance)
+            except Exception as e:
+                print(f"[{name}] unavailable: {type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}")
+    finally:
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
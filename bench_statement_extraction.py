@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Statement Extraction Benchmark
+
+Generates a multi-page bank statement PDF (ruled Date | Libellé | Débit |
+Crédit | Solde tables, French number format) and measures how fast
+mode=transactions extraction turns it into transactions with 1..N pool
+workers. Also checks that every generated row was recovered.
+
+Usage:
+    python bench_statement_extraction.py --pages 100 --rows 30 --workers 1 2 4
+    python bench_statement_extraction.py --pdf statement.pdf --workers 4
+
+Requires the SUPABASE_URL/SUPABASE_KEY environment variables (any value
+works; nothing is stored).
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle
+
+from services.statement_service import iter_statement_rows
+
+MERCHANTS = [
+    "PAIEMENT CB MARJANE", "PAIEMENT CB CAFE MAURE", "VIREMENT SALAIRE",
+    "RETRAIT GAB AGENCE ANFA", "PRLV MAROC TELECOM", "PAIEMENT CB RIAD AL ANDALOUS",
+    "PAIEMENT CB ROYAL AIR MAROC", "PRLV LYDEC", "PAIEMENT CB HAMMAM",
+]
+
+def french_amount(value):
+    return f"{value:,.2f}".replace(",", " ").replace(".", ",")
+
+def generate_statement(path, pages, rows_per_page, seed):
+    """Write a statement PDF and return the number of transaction rows in it"""
+    rng = random.Random(seed)
+    balance = 25000.0
+    date = datetime.date(2024, 1, 1)
+    story = []
+    style = TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ])
+    for page in range(pages):
+        data = [["Date", "Libellé", "Débit", "Crédit", "Solde"]]
+        for _ in range(rows_per_page):
+            amount = round(rng.uniform(10, 3000), 2)
+            is_credit = rng.random() < 0.15
+            balance += amount if is_credit else -amount
+            date += datetime.timedelta(hours=rng.randint(0, 20))
+            data.append([
+                date.strftime("%d/%m/%Y"),
+                f"{rng.choice(MERCHANTS)} {rng.randint(1000, 9999)}",
+                "" if is_credit else french_amount(amount),
+                french_amount(amount) if is_credit else "",
+                french_amount(balance),
+            ])
+        story.append(Table(data, colWidths=[60, 250, 60, 60, 70], style=style))
+        if page < pages - 1:
+            story.append(PageBreak())
+    SimpleDocTemplate(path, pagesize=A4).build(story)
+    return pages * rows_per_page
+
+async def extract(path, executor, pages_per_task):
+    pages = rows = 0
+    async for _, page_rows in iter_statement_rows(path, executor, pages_per_task):
+        pages += 1
+        rows += len(page_rows)
+    return pages, rows
+
+def run(path, expected_rows, worker_counts, pages_per_task):
+    print(f"{'workers':>8}{'pages':>8}{'rows':>8}{'seconds':>10}{'pages/s':>10}{'rows/s':>10}")
+    for workers in worker_counts:
+        executor = ProcessPoolExecutor(workers) if workers > 1 else None
+        try:
+            if executor:
+                # Warm the pool so process start-up isn't timed
+                list(executor.map(abs, range(workers)))
+            start = time.perf_counter()
+            pages, rows = asyncio.run(extract(path, executor, pages_per_task))
+            elapsed = time.perf_counter() - start
+        finally:
+            if executor:
+                executor.shutdown()
+        print(f"{workers:>8}{pages:>8}{rows:>8}{elapsed:>10.2f}{pages / elapsed:>10.1f}{rows / elapsed:>10.0f}")
+        if expected_rows is not None and rows != expected_rows:
+            print(f"  warning: expected {expected_rows} rows, extracted {rows}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Statement PDF extraction benchmark")
+    parser.add_argument("--pdf", help="Benchmark an existing statement instead of a generated one")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=30, help="Transactions per generated page")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pages-per-task", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.pdf:
+        run(args.pdf, None, args.workers, args.pages_per_task)
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "statement.pdf")
+        expected = generate_statement(path, args.pages, args.rows, args.seed)
+        print(f"Generated {args.pages}-page statement ({os.path.getsize(path) / 1024:.0f} kB, {expected} rows)")
+        run(path, expected, args.workers, args.pages_per_task)
+
+if __name__ == "__main__":
+    main()
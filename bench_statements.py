@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Statement Precompute Benchmark
+
+Generates a bank dataset and measures /bank/statements/pdf and
+/bank/statements/get latency (through the app, and the statement lookups
+alone) for accounts whose last closed month has not been precomputed
+(built and rendered on demand), runs the month-end precompute (interrupting
+it once partway to check that a new scheduler resumes from the checkpoint
+rather than starting over), then measures the same requests for precomputed
+accounts.
+
+Usage:
+    python bench_statements.py --tokens 400 --sample 50 --rate 200
+
+Requires the SUPABASE_URL/SUPABASE_KEY environment variables (any value works).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from api.endpoints.bank.dataset import generate_dataset
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Statement latency before and after the month-end precompute")
+    parser.add_argument("--tokens", type=int, default=400, help="Items (two accounts each)")
+    parser.add_argument("--sample", type=int, default=50, help="Tokens measured before and after")
+    parser.add_argument("--rate", type=float, default=200, help="STATEMENT_PRECOMPUTE_RATE (0: unlimited)")
+    parser.add_argument("--interrupt-after", type=float, default=1.0, help="Seconds before the first run is stopped")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sahl-statements-")
+    dataset_dir = os.path.join(workdir, "dataset")
+    generate_dataset(dataset_dir, clients=1, tokens=args.tokens, accounts_per_item=2, transactions=10)
+    with open(os.path.join(dataset_dir, "dataset.json")) as file:
+        client_id, client_secret = next(iter(json.load(file)["clients"].items()))
+    os.environ.update({
+        "BANK_DATASET_DIR": dataset_dir,
+        "STATEMENT_PDF_CACHE_DIR": os.path.join(workdir, "statements"),
+        "STATEMENT_PRECOMPUTE_ENABLED": "false",
+        "STATEMENT_PRECOMPUTE_RATE": str(args.rate),
+        "WEBHOOKS_ENABLED": "false",
+        "ADMISSION_CONTROL_ENABLED": "false",
+    })
+
+    # Imported after the environment is set, so settings pick it up
+    from fastapi.testclient import TestClient
+    from main import app
+    from api.endpoints.bank.mock_data import ACCESS_TOKEN_MAP, ACCOUNTS, TokenLookups
+    from api.endpoints.bank.pdf_renderer import statement_pdf_path
+    from api.endpoints.bank.statement_store import closed_periods
+    from api.endpoints.bank.statement_scheduler import StatementPrecomputer, get_statement_precomputer
+
+    headers = {"X-Client-ID": client_id, "X-Client-Secret": client_secret}
+    period = closed_periods(1)[0][0]
+    tokens = sorted(ACCESS_TOKEN_MAP)
+    client = TestClient(app)
+
+    def timed(function):
+        start = time.perf_counter()
+        function()
+        return (time.perf_counter() - start) * 1000
+
+    def measure(sample, through_app):
+        pdf, listing = [], []
+        for token in sample:
+            if through_app:
+                listing.append(timed(lambda: client.post("/bank/statements/get", json={"access_token": token},
+                                                         headers=headers).raise_for_status()))
+            else:
+                listing.append(timed(lambda: TokenLookups(token).statements()))
+            for account_id in ACCESS_TOKEN_MAP[token]["accounts"]:
+                if through_app:
+                    body = {"access_token": token, "account_id": account_id, "statement_date": period}
+                    pdf.append(timed(lambda: client.post("/bank/statements/pdf", json=body,
+                                                         headers=headers).raise_for_status()))
+                else:
+                    pdf.append(timed(lambda: statement_pdf_path(account_id, ACCOUNTS[account_id], period)))
+        return pdf, listing
+
+    def run_samples(name, tokens_sample):
+        # A fresh half of the tokens for each mode, so neither warms the other's files
+        for through_app, sample in ((True, tokens_sample[:args.sample]), (False, tokens_sample[args.sample:])):
+            pdf, listing = measure(sample, through_app)
+            label = f"{name} ({'app' if through_app else 'lookup'})"
+            print(f"{label:<22} PDF p50 {statistics.median(pdf):6.2f} ms  p99 {percentile(pdf, 0.99):6.2f} ms   "
+                  f"statements p50 {statistics.median(listing):6.2f} ms  p99 {percentile(listing, 0.99):6.2f} ms")
+
+    # Before anything is precomputed
+    run_samples("on demand", tokens[:args.sample * 2])
+
+    async def interrupted_run():
+        task = asyncio.create_task(get_statement_precomputer().precompute())
+        await asyncio.sleep(args.interrupt_after)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    start = time.perf_counter()
+    asyncio.run(interrupted_run())
+    first = get_statement_precomputer().load_state(period)
+    print(f"First run stopped after {first['accounts']} accounts (cursor {first['cursor']})")
+    # A new scheduler, as after a restart
+    state = asyncio.run(StatementPrecomputer(get_statement_precomputer().directory).precompute())
+    elapsed = time.perf_counter() - start
+    print(f"Resumed run completed {state['accounts'] - first['accounts']} more accounts: "
+          f"{state['accounts']} of {len(tokens) * 2} in {elapsed:.1f}s, complete: {state['complete']}")
+
+    # Tokens nobody has requested yet
+    run_samples("precomputed", tokens[-args.sample * 2:])
+
+if __name__ == "__main__":
+    main()
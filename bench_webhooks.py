@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Webhook Delivery Benchmark
+
+Starts a local webhook receiver (stub_webhook_sink.py) that fails a share
+of deliveries, then:
+- points item_1 at it through /bank/item/webhook/update and fires sandbox
+  TRANSACTIONS and STATEMENTS webhooks through the API;
+- emits --events events spread over --items synthetic items straight from
+  a producer, timing the emit calls.
+It waits for the queue to drain and reports producer latency, delivery
+latency, events per POST, retries, the peak concurrent requests seen by the
+receiver, and checks signatures and per-item ordering.
+
+Usage:
+    python bench_webhooks.py --items 50 --events 5000 --fail-rate 0.2
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import httpx
+import uvicorn
+
+SECRET = "bench-signing-secret"
+
+def start_sink(port):
+    from stub_webhook_sink import create_app
+    server = uvicorn.Server(uvicorn.Config(create_app(SECRET), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook dispatcher benchmark against a local receiver")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--fail-rate", type=float, default=0.2)
+    parser.add_argument("--delay-ms", type=float, default=20, help="Receiver latency per request")
+    parser.add_argument("--concurrency", type=int, default=4, help="WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sahl-webhooks-")
+    os.environ.update({
+        "SUPABASE_URL": os.environ.get("SUPABASE_URL", "http://127.0.0.1:9"),
+        "SUPABASE_KEY": os.environ.get("SUPABASE_KEY", "stub.stub.stub"),
+        "FILE_PATH": os.path.join(workdir, "data.json"),
+        "WEBHOOK_SIGNING_SECRET": SECRET,
+        "WEBHOOK_ALLOW_PRIVATE_URLS": "true",
+        "WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT": str(args.concurrency),
+        "WEBHOOK_RETRY_BASE_SECONDS": "0.05",
+        "WEBHOOK_RETRY_MAX_SECONDS": "1",
+        "WEBHOOK_BATCH_WINDOW_SECONDS": "0.05",
+        "WEBHOOK_MAX_ATTEMPTS": "50",
+        "ADMISSION_CONTROL_ENABLED": "false",
+    })
+    start_sink(args.port)
+    sink = httpx.Client(base_url=f"http://127.0.0.1:{args.port}")
+    hook_url = f"http://127.0.0.1:{args.port}/hook"
+    sink.post("/_faults", json={"fail_rate": args.fail_rate, "delay_ms": args.delay_ms})
+
+    # Imported after the environment is set, so settings pick it up
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.webhook_service import get_webhook_dispatcher, queue_item_event
+
+    auth = {"X-Client-ID": "client_123456", "X-Client-Secret": "secret_abcdef123456"}
+    with TestClient(app) as client:
+        client.post("/bank/item/webhook/update", json={"access_token": "access-token-1", "webhook": hook_url},
+                    headers=auth).raise_for_status()
+        for webhook_type in ("TRANSACTIONS", "STATEMENTS"):
+            client.post("/bank/sandbox/item/fire_webhook", json={"access_token": "access-token-1", "webhook_type": webhook_type,
+                                                                "new_transactions": 3}, headers=auth).raise_for_status()
+
+        items = [{"item_id": f"item_bench_{i}", "webhook": hook_url} for i in range(args.items)]
+        emit_times = []
+        started = time.perf_counter()
+        for n in range(args.events):
+            start = time.perf_counter()
+            queue_item_event(items[n % args.items], "TRANSACTIONS", "DEFAULT_UPDATE", new_transactions=1, sequence=n)
+            emit_times.append((time.perf_counter() - start) * 1e6)
+        emitted_in = time.perf_counter() - started
+
+        queue = get_webhook_dispatcher().queue
+        deadline = time.time() + args.drain_timeout
+        while time.time() < deadline:
+            counts = queue.counts()
+            if not counts.get("pending") and not counts.get("inflight"):
+                break
+            time.sleep(0.1)
+        drained_in = time.perf_counter() - started
+        stats = get_webhook_dispatcher().snapshot()
+
+    received = sink.get("/_received").json()
+    deliveries = received["deliveries"]
+    events = [(delivery, event) for delivery in deliveries for event in delivery["events"]]
+    latencies = [(delivery["received_at"] - datetime.fromisoformat(event["created_at"]).timestamp()) * 1000
+                 for delivery, event in events]
+    per_item = {}
+    for _, event in events:
+        if "sequence" in event:
+            per_item.setdefault(event["item_id"], []).append(event["sequence"])
+    in_order = all(sequence == sorted(sequence) for sequence in per_item.values())
+    sandbox = [event["webhook_type"] + "/" + event["webhook_code"] for _, event in events if event["item_id"] == "item_1"]
+
+    print(f"Sandbox events for item_1: {sandbox}")
+    print(f"Producer: {args.events} emits in {emitted_in:.2f}s, p50 {statistics.median(emit_times):.0f} us, "
+          f"p99 {percentile(emit_times, 0.99):.0f} us")
+    print(f"Delivered {len(events)} events in {len(deliveries)} POSTs ({len(events) / max(len(deliveries), 1):.1f} per POST), "
+          f"drained in {drained_in:.2f}s")
+    print(f"Delivery latency p50 {statistics.median(latencies):.0f} ms, p99 {percentile(latencies, 0.99):.0f} ms")
+    print(f"Receiver: {received['requests']} requests, {received['failed']} failed (injected), "
+          f"{received['bad_signature']} bad signatures, peak concurrency {received['peak_active']} (cap {args.concurrency})")
+    print(f"Dispatcher: {stats}")
+    print(f"All events delivered once: {len(events) == args.events + 3 and len({e['webhook_id'] for _, e in events}) == len(events)}, "
+          f"per-item order kept: {in_order}")
+
+if __name__ == "__main__":
+    main()
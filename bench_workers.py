@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Worker Scaling Benchmark
+
+Starts the API under gunicorn with 1, 2, 4 and 8 workers, drives the cheap
+/bank JSON routes and the cached statement PDF route, then reports throughput
+and per-worker memory. RSS counts shared pages in every worker; PSS splits them
+between the processes sharing them, so PSS is the number that shows what
+preloading and SHARED_DATA_DIR save.
+
+Usage:
+    python bench_workers.py --workers 1 2 4 8 --duration 15 --clients 64
+
+Requires Linux (/proc/<pid>/smaps_rollup) and the SUPABASE_URL/SUPABASE_KEY
+environment variables (any value works; the benchmarked routes don't use them).
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from load_test import worker
+
+def memory_kb(pid):
+    """Return (RSS, PSS) in kB for a process"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0]] = int(parts[1])
+    return values.get("Rss:", 0), values.get("Pss:", 0)
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as children:
+        return [int(pid) for pid in children.read().split()]
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+async def drive(url, duration, clients):
+    statuses = defaultdict(Counter)
+    latencies = defaultdict(list)
+    deadline = time.perf_counter() + duration
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=httpx.Limits(max_connections=clients)) as client:
+        names = ["transactions", "auth", "statement_pdf"]
+        await asyncio.gather(*[
+            worker(client, names[i % len(names)], deadline, statuses, latencies) for i in range(clients)
+        ])
+    ok = sum(counts[200] for counts in statuses.values())
+    return ok / duration
+
+def run(worker_counts, duration, clients, port):
+    url = f"http://127.0.0.1:{port}"
+    print(f"{'workers':>8}{'req/s':>10}{'RSS/worker MB':>16}{'PSS/worker MB':>16}")
+    for count in worker_counts:
+        env = {**os.environ, "WEB_CONCURRENCY": str(count), "PORT": str(port), "ADMISSION_CONTROL_ENABLED": "false"}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "main:app"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_up(url)
+            throughput = asyncio.run(drive(url, duration, clients))
+            pids = worker_pids(server.pid)
+            rss, pss = zip(*(memory_kb(pid) for pid in pids)) if pids else ((0,), (0,))
+            print(f"{count:>8}{throughput:>10.0f}{sum(rss) / len(rss) / 1024:>16.1f}{sum(pss) / len(pss) / 1024:>16.1f}")
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description="Gunicorn worker scaling benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    run(args.workers, args.duration, args.clients, args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Synthetic Dataset Generator
+
+Creates a bank dataset for load testing: API clients, items, accounts and
+access tokens, with a fixed number of transactions per account. Shards of
+accounts are generated in parallel processes; every account has its own
+seeded RNG, so the same arguments give the same data whatever --workers is.
+Transactions are written as compact NDJSON or as fixed-width columnar files
+(about 28 bytes per transaction) that the API maps without loading them.
+
+Usage:
+    python generate_dataset.py --out /data/sahl-10k --tokens 10000 --accounts-per-item 2 \\
+        --transactions 5000 --workers 8
+    BANK_DATASET_DIR=/data/sahl-10k uvicorn main:app
+
+Access tokens are access-ds-000000 ... and client credentials are listed in
+dataset.json under "clients". Requires the SUPABASE_URL/SUPABASE_KEY
+environment variables to load the API (any value works).
+"""
+
+import argparse
+import datetime
+import os
+import time
+
+from api.endpoints.bank.dataset import generate_dataset
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic bank dataset for load testing")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=1000, help="Items, each with one access token")
+    parser.add_argument("--accounts-per-item", type=int, default=2)
+    parser.add_argument("--transactions", type=int, default=1000, help="Transactions per account")
+    parser.add_argument("--days", type=int, default=365, help="Transactions are spread over this many days")
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat, default=None,
+                        help="Last transaction date (YYYY-MM-DD, default today); fix it for reproducible output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["columnar", "ndjson"], default="columnar")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-accounts", type=int, default=256, help="Accounts per shard file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = generate_dataset(
+        args.out, args.clients, args.tokens, args.accounts_per_item, args.transactions,
+        seed=args.seed, days=args.days, end_date=args.end_date, file_format=args.format,
+        workers=args.workers, shard_accounts=args.shard_accounts,
+    )
+    elapsed = time.perf_counter() - start
+    size = directory_size(args.out)
+    print(f"Wrote {summary['transactions']:,} transactions for {summary['accounts']:,} accounts "
+          f"({args.tokens:,} tokens, {args.clients} clients) in {summary['shards']} shards to {args.out}")
+    print(f"  {elapsed:.1f} s, {summary['transactions'] / elapsed:,.0f} transactions/s, "
+          f"{size / 1e6:,.1f} MB ({size / max(summary['transactions'], 1):.1f} bytes/transaction)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration for multi-worker serving.
+
+Usage:
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py main:app
+
+The app is preloaded in the master process and then forked, so workers share
+its memory pages copy-on-write. Read-mostly datasets and rendered statement
+PDFs are placed in SHARED_DATA_DIR (defaults to /dev/shm/sahl when available)
+so every worker maps a single copy.
+"""
+
+import gc
+import multiprocessing
+import os
+
+# Must be set before the app is preloaded so mock_data picks it up
+if os.path.isdir("/dev/shm"):
+    os.environ.setdefault("SHARED_DATA_DIR", "/dev/shm/sahl")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+def when_ready(server):
+    # Move everything allocated during preload into the permanent generation so
+    # the cyclic GC in workers doesn't touch (and copy) those shared pages
+    gc.freeze()
+    server.log.info(f"Preloaded app; forking {workers} workers")
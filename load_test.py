@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Load Test Script
+
+Drives a running Sahl API with a mix of expensive and cheap requests to show how
+admission control degrades service: low-priority routes (statement PDFs) should
+start returning 503 with Retry-After while /health and the /bank JSON routes keep
+answering quickly.
+
+Usage:
+    uvicorn main:app --port 8000 &
+    python load_test.py --url http://localhost:8000 --duration 20 --heavy 64 --cheap 16
+
+Each concurrency slot loops for the whole duration. At the end the script prints,
+per request type, the status code counts and latency percentiles.
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+CLIENT_HEADERS = {
+    "X-Client-ID": "client_123456",
+    "X-Client-Secret": "secret_abcdef123456",
+}
+
+# Statements exist for closed months only: use the last one
+LAST_CLOSED_MONTH = (date.today().replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+SCENARIOS = {
+    "statement_pdf": ("POST", "/bank/statements/pdf", {
+        "access_token": "access-token-1", "account_id": "acc_1", "statement_date": LAST_CLOSED_MONTH
+    }),
+    "transactions": ("POST", "/bank/transactions/get", {"access_token": "access-token-1"}),
+    "auth": ("POST", "/bank/auth/get", {"access_token": "access-token-1"}),
+    "health": ("GET", "/health", None),
+}
+
+async def worker(client, name, deadline, statuses, latencies):
+    """Send one scenario in a loop until the deadline"""
+    method, path, body = SCENARIOS[name]
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body, headers=CLIENT_HEADERS)
+            statuses[name][response.status_code] += 1
+        except httpx.HTTPError as e:
+            statuses[name][type(e).__name__] += 1
+        latencies[name].append(time.perf_counter() - started)
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+async def run(url, duration, heavy, cheap):
+    statuses = defaultdict(Counter)
+    latencies = defaultdict(list)
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=heavy + 3 * cheap + 10)
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits) as client:
+        tasks = [worker(client, "statement_pdf", deadline, statuses, latencies) for _ in range(heavy)]
+        for name in ("transactions", "auth", "health"):
+            tasks += [worker(client, name, deadline, statuses, latencies) for _ in range(cheap)]
+        await asyncio.gather(*tasks)
+
+    print(f"{'scenario':<15}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}  statuses")
+    for name in SCENARIOS:
+        values = latencies[name]
+        print(
+            f"{name:<15}{len(values):>10}"
+            f"{percentile(values, 0.5) * 1000:>10.1f}{percentile(values, 0.99) * 1000:>10.1f}"
+            f"  {dict(statuses[name])}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Admission control load test")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    parser.add_argument("--heavy", type=int, default=64, help="concurrent statement PDF clients")
+    parser.add_argument("--cheap", type=int, default=16, help="concurrent clients per cheap route")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.duration, args.heavy, args.cheap))
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 # main.py
+import asyncio
 import logging
 import time
 from fastapi import FastAPI, Request, HTTPException, Depends
@@ -10,10 +11,16 @@ from fastapi.security import APIKeyHeader
 from mangum import Mangum  # This adapter allows your app to run on AWS Lambda
 
 # Import application modules
-from api.endpoints import pdf_parser, data_storage, scraper
+from api.endpoints import pdf_parser, data_storage, scraper, debug
 from api.endpoints.bank import router as bank_router
 from api.core.config import settings
-from services.db_service import init_db, get_supabase_client
+from api.core.tracing import start_trace, current_request_id
+from api.core.profiling import StackSampler, profile_store, get_loop_monitor, install_request_profiling
+from api.core.admission import admission_controller, classify
+from api.core.compression import CompressionMiddleware
+from services.db_service import init_db, get_supabase_client, start_write_replay
+from services.webhook_service import get_webhook_dispatcher
+from api.endpoints.bank.statement_scheduler import get_statement_precomputer
 
 # Configure logging
 logging.basicConfig(
@@ -49,33 +56,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Admission control middleware (sheds expensive routes first when overloaded)
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    if not settings.ADMISSION_CONTROL_ENABLED:
+        return await call_next(request)
+    
+    route_class = classify(request.url.path)
+    reason = admission_controller.try_admit(route_class)
+    if reason:
+        logger.warning(f"Shedding {route_class} request {request.method} {request.url.path}: {reason}")
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Service temporarily overloaded, please retry later"},
+            headers={"Retry-After": str(admission_controller.retry_after())}
+        )
+    try:
+        return await call_next(request)
+    finally:
+        admission_controller.release(route_class)
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
     
-    # Generate request ID for tracing
-    request_id = f"req_{time.time()}"
-    logger.info(f"Request started: {request_id} - {request.method} {request.url.path}")
+    # Start a trace; its ID doubles as the request ID in logs and responses
+    with start_trace(
+        f"{request.method} {request.url.path}",
+        traceparent=request.headers.get("traceparent"),
+        method=request.method,
+        path=request.url.path,
+    ) as root_span:
+        request_id = current_request_id()
+        logger.info(f"Request started: {request_id} - {request.method} {request.url.path}")
+        
+        try:
+            response = await call_next(request)
+            process_time = time.time() - start_time
+            response.headers["X-Process-Time"] = str(process_time)
+            response.headers["X-Request-ID"] = request_id
+            if root_span:
+                root_span.set_attribute("status_code", response.status_code)
+            logger.info(f"Request completed: {request_id} - Status: {response.status_code} - Time: {process_time:.4f}s")
+            return response
+        except Exception as e:
+            logger.error(f"Request failed: {request_id} - Error: {str(e)}")
+            if root_span:
+                root_span.error = f"{type(e).__name__}: {e}"
+            return JSONResponse(
+                status_code=500,
+                content={"detail": "Internal server error"},
+                headers={"X-Request-ID": request_id}
+            )
+
+# On-demand request profiling (admin only)
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if not settings.REQUEST_PROFILING_ENABLED or not request.headers.get("X-Profile") \
+            or request.headers.get("sahl-api-key") != settings.API_KEY:
+        return await call_next(request)
     
+    sampler = StackSampler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000, asyncio.get_running_loop())
+    sampler.start()
     try:
         response = await call_next(request)
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(process_time)
-        logger.info(f"Request completed: {request_id} - Status: {response.status_code} - Time: {process_time:.4f}s")
-        return response
-    except Exception as e:
-        logger.error(f"Request failed: {request_id} - Error: {str(e)}")
-        return JSONResponse(
-            status_code=500,
-            content={"detail": "Internal server error"}
-        )
+    finally:
+        sampler.stop()
+    profile_id = profile_store.add(request.url.path, sampler)
+    response.headers["X-Profile-ID"] = profile_id
+    response.headers["X-Profile-URL"] = f"/debug/profiles/{profile_id}"
+    return response
+
+# Response compression, outermost so it sees X-Process-Time and adds its own time
+app.add_middleware(CompressionMiddleware)
 
 # Include API routers
 app.include_router(pdf_parser.router, prefix="/parse-pdf", tags=["PDF Parser"])
 app.include_router(data_storage.router, prefix="/store-data", tags=["Data Storage"])
 app.include_router(scraper.router, prefix="/scrape", tags=["Scraper"])
 app.include_router(bank_router.router, prefix="/bank", tags=["Sahl Bank API"])
+app.include_router(debug.router, prefix="/debug", tags=["Debug"])
 
 # Root route for health checks
 @app.get("/")
@@ -107,6 +168,19 @@ async def health_check():
 @app.on_event("startup")
 async def on_startup():
     logger.info("Starting Sahl API Service")
+    if settings.REQUEST_PROFILING_ENABLED:
+        install_request_profiling(asyncio.get_running_loop())
+    if settings.LOOP_LAG_MONITOR_ENABLED:
+        await get_loop_monitor().start()
+    # Transactions queued while the database was unavailable (possibly before a restart)
+    start_write_replay()
+    if settings.WEBHOOKS_ENABLED:
+        try:
+            await get_webhook_dispatcher().start()
+        except Exception as e:
+            logger.error(f"Webhook dispatcher failed to start: {str(e)}")
+    if settings.STATEMENT_PRECOMPUTE_ENABLED:
+        get_statement_precomputer().start()
     try:
         init_db()
         logger.info("Database initialized successfully")
@@ -122,5 +196,12 @@ async def on_startup():
 handler = Mangum(app)
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    port = int(os.environ.get("PORT", "8000"))
+    if workers > 1:
+        # Each worker process imports the app itself; gunicorn.conf.py adds preloading
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
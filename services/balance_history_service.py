@@ -0,0 +1,86 @@
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from services.db_service import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+# Rollup periods, finest first, with their approximate length in days
+PERIODS = {"day": 1, "week": 7, "month": 30.44}
+
+class HistoryRangeError(ValueError):
+    """The requested range and granularity can't be served"""
+
+def period_start(day: date, period: str) -> date:
+    """Start of the rollup bucket holding day (weeks start on Monday, as date_trunc does)"""
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    raise HistoryRangeError(f"Unknown granularity: {period}")
+
+def bucket_count(start: date, end: date, period: str) -> int:
+    """Number of period buckets [start, end] touches, counted from the bucket start holds"""
+    first, last = period_start(start, period), period_start(end, period)
+    if period == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days // PERIODS[period] + 1
+
+def choose_period(start: date, end: date, max_points: int) -> str:
+    """The finest period that covers [start, end] in at most max_points buckets (else the coarsest)"""
+    for period in PERIODS:
+        if bucket_count(start, end, period) <= max_points:
+            return period
+    return "month"
+
+def _points(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "date": row["period_start"],
+            "min": float(row["min_balance"]),
+            "max": float(row["max_balance"]),
+            "close": float(row["close_balance"]),
+            "samples": row["samples"],
+        }
+        for row in rows
+    ]
+
+async def get_balance_history(
+    user_id: str,
+    start: date,
+    end: date,
+    granularity: str = "auto",
+    account_id: Optional[str] = None,
+    max_points: int = 400,
+) -> Dict[str, Any]:
+    """
+    Balance series for a user's accounts between start and end, one point per
+    day, week or month read straight from the rollups, so the cost follows the
+    number of points returned rather than the number of recorded balances.
+    """
+    if end < start:
+        raise HistoryRangeError("end_date is before start_date")
+    if granularity == "auto":
+        # Counted like the check below; auto falls back to months however long the range
+        period = choose_period(start, end, max_points)
+    else:
+        if granularity not in PERIODS:
+            raise HistoryRangeError(f"Unknown granularity: {granularity}")
+        period = granularity
+        if bucket_count(start, end, period) > max_points:
+            raise HistoryRangeError(f"Range spans more than {max_points} {period} points; use a coarser granularity")
+    first = period_start(start, period)
+
+    rows = await DatabaseService.get_balance_rollups(user_id, period, first, end, account_id)
+    series: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        series.setdefault(row["account_id"], []).append(row)
+    return {
+        "granularity": period,
+        "start_date": first.isoformat(),
+        "end_date": end.isoformat(),
+        "series": [{"account_id": account, "points": _points(account_rows)} for account, account_rows in series.items()],
+    }
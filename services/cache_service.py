@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sentinel returned by backends on a cache miss (None is a valid cached value)
+MISSING = object()
+
+class CacheBackend:
+    """Interface for key/value cache storage with per-entry TTL"""
+
+    def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> int:
+        raise NotImplementedError
+
+class InMemoryLRUBackend(CacheBackend):
+    """Process-local LRU cache, bounded by entry count"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+class RedisBackend(CacheBackend):
+    """Redis-compatible backend so several workers can share cached reads"""
+
+    def __init__(self, url: str, key_prefix: str = "sahl:cache:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        self.key_prefix = key_prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Any:
+        raw = self._client.get(self.key_prefix + key)
+        if raw is None:
+            return MISSING
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._client.set(self.key_prefix + key, json.dumps(value), px=max(int(ttl * 1000), 1))
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = list(self._client.scan_iter(match=f"{self.key_prefix}{prefix}*"))
+        if keys:
+            self._client.delete(*keys)
+        return len(keys)
+
+class ReadThroughCache:
+    """
+    Read-through cache with single-flight loading.
+    Concurrent misses for the same key share one upstream load, and
+    invalidating a namespace discards loads that started before the write.
+    """
+
+    def __init__(self, backend: CacheBackend, default_ttl: float):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generations: Dict[str, int] = {}
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        name: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """Return the cached value or load it once for all concurrent callers"""
+        key = f"{namespace}:{name}"
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {key}: {str(e)}")
+            value = MISSING
+        if value is not MISSING:
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leader was cancelled; load again unless this caller was too
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return await self.get_or_load(namespace, name, loader, ttl)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generations.get(namespace, 0)
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark as retrieved so a flight without waiters does not warn
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled leader: waiting callers retry the load instead of hanging
+            future.cancel()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+        # Skip caching if a write invalidated the namespace mid-load
+        if value is not None and self._generations.get(namespace, 0) == generation:
+            try:
+                self.backend.set(key, value, ttl or self.default_ttl)
+            except Exception as e:
+                logger.warning(f"Cache write failed for {key}: {str(e)}")
+        future.set_result(value)
+        return value
+
+    def invalidate(self, namespace: str) -> None:
+        """Drop every cached entry and in-flight load for a namespace"""
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        prefix = f"{namespace}:"
+        for key in [key for key in self._inflight if key.startswith(prefix)]:
+            del self._inflight[key]
+        try:
+            removed = self.backend.delete_prefix(prefix)
+            logger.debug(f"Invalidated {removed} cache entries for {namespace}")
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for {namespace}: {str(e)}")
+
+_cache = None
+
+def get_cache() -> ReadThroughCache:
+    """Get or initialize the shared read-through cache"""
+    global _cache
+    if _cache is None:
+        if settings.CACHE_BACKEND == "redis":
+            backend = RedisBackend(settings.CACHE_REDIS_URL)
+        else:
+            backend = InMemoryLRUBackend(settings.CACHE_MAX_ENTRIES)
+        _cache = ReadThroughCache(backend, settings.CACHE_TTL_SECONDS)
+    return _cache
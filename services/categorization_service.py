@@ -0,0 +1,142 @@
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.text_matching import AhoCorasick, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Two-level category taxonomy used by the bank API
+CATEGORY_TAXONOMY: List[List[str]] = [
+    ["Food and Drink", "Restaurants"],
+    ["Food and Drink", "Cafés"],
+    ["Shops", "Souk"],
+    ["Shops", "Épicerie"],
+    ["Transfer", "Dépôt"],
+    ["Transfer", "Retrait"],
+    ["Service", "Abonnement"],
+    ["Travel", "Royal Air Maroc"],
+    ["Travel", "Riads"],
+    ["Payment", "Carte de Crédit"],
+    ["Recreation", "Divertissement"],
+    ["Family", "Aïd al-Fitr"],
+    ["Family", "Aïd al-Adha"],
+]
+
+# Merchant/description keywords -> category. Keywords match whole words after
+# accent and case folding; when several match, the longest keyword wins.
+MERCHANT_RULES: Dict[str, Tuple[str, str]] = {
+    # Groceries and supermarkets
+    "marjane": ("Shops", "Épicerie"),
+    "carrefour": ("Shops", "Épicerie"),
+    "carrefour market": ("Shops", "Épicerie"),
+    "aswak assalam": ("Shops", "Épicerie"),
+    "label vie": ("Shops", "Épicerie"),
+    "bim": ("Shops", "Épicerie"),
+    "epicerie": ("Shops", "Épicerie"),
+    "hanout": ("Shops", "Épicerie"),
+    "pharmacie": ("Shops", "Épicerie"),
+    "electroplanet": ("Shops", "Souk"),
+    "souk": ("Shops", "Souk"),
+    "artisanat": ("Shops", "Souk"),
+    "medina": ("Shops", "Souk"),
+    "henna": ("Shops", "Souk"),
+    "acima": ("Shops", "Épicerie"),
+    # Food and drink
+    "cafe": ("Food and Drink", "Cafés"),
+    "cafe maure": ("Food and Drink", "Cafés"),
+    "patisserie": ("Food and Drink", "Cafés"),
+    "starbucks": ("Food and Drink", "Cafés"),
+    "restaurant": ("Food and Drink", "Restaurants"),
+    "snack": ("Food and Drink", "Restaurants"),
+    "mcdonald s": ("Food and Drink", "Restaurants"),
+    "glovo": ("Food and Drink", "Restaurants"),
+    # Transfers
+    "virement": ("Transfer", "Dépôt"),
+    "salaire": ("Transfer", "Dépôt"),
+    "salary": ("Transfer", "Dépôt"),
+    "deposit": ("Transfer", "Dépôt"),
+    "versement": ("Transfer", "Dépôt"),
+    "retrait": ("Transfer", "Retrait"),
+    "atm": ("Transfer", "Retrait"),
+    "gab": ("Transfer", "Retrait"),
+    "withdrawal": ("Transfer", "Retrait"),
+    # Utilities and subscriptions
+    "maroc telecom": ("Service", "Abonnement"),
+    "iam": ("Service", "Abonnement"),
+    "inwi": ("Service", "Abonnement"),
+    "orange": ("Service", "Abonnement"),
+    "onee": ("Service", "Abonnement"),
+    "lydec": ("Service", "Abonnement"),
+    "redal": ("Service", "Abonnement"),
+    "amendis": ("Service", "Abonnement"),
+    "abonnement": ("Service", "Abonnement"),
+    "utility": ("Service", "Abonnement"),
+    "netflix": ("Service", "Abonnement"),
+    # Travel
+    "royal air maroc": ("Travel", "Royal Air Maroc"),
+    "ram": ("Travel", "Royal Air Maroc"),
+    "air arabia": ("Travel", "Royal Air Maroc"),
+    "oncf": ("Travel", "Royal Air Maroc"),
+    "tanger med": ("Travel", "Royal Air Maroc"),
+    "riad": ("Travel", "Riads"),
+    "riads": ("Travel", "Riads"),
+    "hotel": ("Travel", "Riads"),
+    # Payments
+    "carte de credit": ("Payment", "Carte de Crédit"),
+    "credit card": ("Payment", "Carte de Crédit"),
+    "remboursement carte": ("Payment", "Carte de Crédit"),
+    # Recreation
+    "hammam": ("Recreation", "Divertissement"),
+    "salle de sport": ("Recreation", "Divertissement"),
+    "cinema": ("Recreation", "Divertissement"),
+    "megarama": ("Recreation", "Divertissement"),
+    # Family
+    "aid al fitr": ("Family", "Aïd al-Fitr"),
+    "aid el fitr": ("Family", "Aïd al-Fitr"),
+    "aid al adha": ("Family", "Aïd al-Adha"),
+    "aid el kebir": ("Family", "Aïd al-Adha"),
+    "mouton": ("Family", "Aïd al-Adha"),
+}
+
+class Categorizer:
+    """
+    Maps free-text transaction descriptions onto the category taxonomy.
+    All keywords are compiled into one word-level Aho-Corasick automaton, so a
+    description is scanned once whatever the number of rules. Results are
+    memoized per description because merchant strings repeat heavily.
+    """
+
+    def __init__(self, rules: Dict[str, Tuple[str, str]], cache_size: int = 100000):
+        self._keywords = list(rules)
+        self._categories = [list(rules[keyword]) for keyword in self._keywords]
+        self._automaton = AhoCorasick(tuple(tokenize(keyword)) for keyword in self._keywords)
+        self.categorize = lru_cache(maxsize=cache_size)(self._categorize)
+
+    def _categorize(self, description: str) -> Optional[List[str]]:
+        best = None
+        best_length = 0
+        for _, pattern_id in self._automaton.finditer(tokenize(description)):
+            length = len(self._keywords[pattern_id])
+            if length > best_length:
+                best, best_length = pattern_id, length
+        return self._categories[best] if best is not None else None
+
+    def categorize_many(self, descriptions: Iterable[Optional[str]]) -> List[Optional[List[str]]]:
+        """Categorize a batch of descriptions (None for descriptions with no match)"""
+        categorize = self.categorize
+        return [categorize(description) if description else None for description in descriptions]
+
+_categorizer: Optional[Categorizer] = None
+
+def get_categorizer() -> Categorizer:
+    """Get or initialize the shared categorizer (compiling the rules once)"""
+    global _categorizer
+    if _categorizer is None:
+        _categorizer = Categorizer(MERCHANT_RULES)
+        logger.info(f"Compiled {len(MERCHANT_RULES)} merchant categorization rules")
+    return _categorizer
+
+def category_label(category: Optional[List[str]]) -> Optional[str]:
+    """Flatten a category path for the transactions.category text column"""
+    return " > ".join(category) if category else None
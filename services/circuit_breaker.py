@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# SQLSTATE classes and PostgREST codes that mean the database, not the request, is at fault:
+# connection exceptions, insufficient resources, operator intervention (incl. statement
+# timeout), transaction rollbacks (serialization failures, deadlocks), pool/connection errors
+_TRANSIENT_SQLSTATE_CLASSES = ("08", "53", "57", "40")
+_TRANSIENT_POSTGREST_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed call says the upstream is unhealthy (worth retrying later) rather than the request bad"""
+    if isinstance(error, (CircuitOpen, httpx.TransportError)):
+        return True
+    if isinstance(error, APIError):
+        code = error.code
+        if code is None or isinstance(code, int):
+            # Gateway errors carry no SQLSTATE; non-JSON error bodies carry the HTTP status
+            return code is None or code >= 500
+        return code in _TRANSIENT_POSTGREST_CODES or code[:2] in _TRANSIENT_SQLSTATE_CLASSES
+    return False
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After failure_threshold transient
+    failures (or calls slower than slow_call_seconds) in a row the circuit
+    opens and calls fail fast with CircuitOpen. After reset_seconds one probe
+    call is let through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, slow_call_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.counts = {"success": 0, "failure": 0, "slow": 0, "rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (claims the probe slot when half-open)"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.counts["rejected"] += 1
+            return False
+
+    def record_success(self, duration: float) -> None:
+        if duration > self.slow_call_seconds:
+            with self._lock:
+                self.counts["slow"] += 1
+            self.record_failure()
+            return
+        with self._lock:
+            self.counts["success"] += 1
+            self._failures = 0
+            if self.state != CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state = CLOSED
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.counts["failure"] += 1
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                if self.state == CLOSED:
+                    logger.warning(f"Circuit {self.name} opened after {self._failures} failures")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.counts["opened"] += 1
+
+    def call(self, fn, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking upstream call through the breaker"""
+        if not self.allow():
+            raise CircuitOpen(f"Circuit {self.name} is open")
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_transient(e):
+                self.record_failure()
+            else:
+                # The upstream answered; the request itself was bad
+                self.record_success(0.0)
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in: Optional[float] = None
+            if self.state == OPEN:
+                retry_in = round(max(self.reset_seconds - (time.monotonic() - self._opened_at), 0.0), 1)
+            return {"name": self.name, "state": self.state, "consecutiveFailures": self._failures,
+                    "retryInSeconds": retry_in, **self.counts}
@@ -2,89 +2,297 @@ import os
 import json
 import logging
 import hashlib
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import fcntl
+import mmap
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from api.core.config import settings
+from services.id_service import new_id
 
 logger = logging.getLogger(__name__)
 
+# The backup is an append-only journal with one JSON record per line.
+# Its checksum is a hash chain over the lines, so appends stay O(1).
+_write_lock = threading.Lock()
+
+@contextmanager
+def _journal_lock(file_path: str):
+    """Serialize journal writers across threads and across worker processes"""
+    with _write_lock:
+        with open(f"{file_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Sidecar index: one fixed-size (byte offset, dateSaved epoch) record per journal line
+_INDEX_RECORD = struct.Struct("<Qd")
+
 def read_data() -> List[Dict[str, Any]]:
     """
-    Reads data from the JSON file. Returns an empty list if file is missing or corrupted.
+    Reads data from the journal file. Returns an empty list if file is missing or corrupted.
     Includes validation of file integrity.
     """
     file_path = settings.FILE_PATH
     checksum_path = f"{file_path}.checksum"
-    
+
     if not os.path.exists(file_path):
         logger.warning(f"Data file not found at {file_path}")
         return []
-        
+
     try:
-        # Read the file
-        with open(file_path, "r") as file:
-            try:
-                data = json.load(file)
-                
-                # Verify checksum if available
-                if os.path.exists(checksum_path):
-                    with open(checksum_path, "r") as checksum_file:
-                        stored_checksum = checksum_file.read().strip()
-                        
-                        # Calculate current checksum
-                        current_checksum = calculate_file_checksum(file_path)
-                        
-                        if stored_checksum != current_checksum:
-                            logger.error("File checksum validation failed - possible tampering")
-                            # In production, you might want to trigger an alert here
-                
-                return data
-            except json.JSONDecodeError as err:
-                logger.error(f"Error parsing JSON: {err}")
-                return []
+        if _is_legacy_format(file_path):
+            with open(file_path, "r") as file:
+                return json.load(file)
+
+        data = []
+        with open(file_path, "rb") as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    data.append(json.loads(line))
+
+        # Verify checksum if available
+        if os.path.exists(checksum_path):
+            with open(checksum_path, "r") as checksum_file:
+                stored_checksum = checksum_file.read().strip()
+
+            if stored_checksum != calculate_file_checksum(file_path):
+                logger.error("File checksum validation failed - possible tampering")
+                # In production, you might want to trigger an alert here
+
+        return data
+    except json.JSONDecodeError as err:
+        logger.error(f"Error parsing JSON: {err}")
+        return []
     except Exception as e:
         logger.error(f"Error reading data file: {str(e)}")
         return []
 
 def write_data(new_entry: dict) -> bool:
     """
-    Appends a new entry with a timestamp to the JSON file.
+    Appends a new entry with a timestamp to the journal file.
     Includes file integrity protection.
     """
+    return write_data_batch([new_entry]) == 1
+
+def write_data_batch(entries: Iterable[dict]) -> int:
+    """
+    Appends entries to the journal in a single write and returns how many were saved.
+    Each entry gets dateSaved and backupId fields for traceability.
+    """
     try:
         # Ensure directory exists
         file_path = settings.FILE_PATH
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Read existing data
-        data = read_data()
-        
-        # Add timestamp and transaction ID for traceability
-        new_entry["dateSaved"] = datetime.utcnow().isoformat()
-        new_entry["backupId"] = f"backup_{datetime.utcnow().timestamp()}"
-        
-        # Append new entry
-        data.append(new_entry)
-        
-        # Write data
-        with open(file_path, "w") as file:
-            json.dump(data, file, indent=2)
-            
-        # Update checksum
-        checksum = calculate_file_checksum(file_path)
-        with open(f"{file_path}.checksum", "w") as checksum_file:
-            checksum_file.write(checksum)
-            
-        logger.info(f"Successfully wrote data backup with ID {new_entry['backupId']}")
-        return True
+
+        with _journal_lock(file_path):
+            _migrate_legacy_format(file_path)
+            checksum = _read_checksum(file_path)
+
+            saved_at = datetime.utcnow()
+            lines = []
+            for entry in entries:
+                # Add timestamp and transaction ID for traceability
+                entry["dateSaved"] = saved_at.isoformat()
+                entry["backupId"] = new_id("backup")
+                line = json.dumps(entry, separators=(",", ":")).encode() + b"\n"
+                checksum = _chain_checksum(checksum, line)
+                lines.append(line)
+
+            if not lines:
+                return 0
+
+            _ensure_index(file_path)
+            offset = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            saved_ts = saved_at.replace(tzinfo=timezone.utc).timestamp()
+            index_records = []
+            for line in lines:
+                index_records.append(_INDEX_RECORD.pack(offset, saved_ts))
+                offset += len(line)
+
+            with open(file_path, "ab") as file:
+                file.write(b"".join(lines))
+            with open(_index_path(file_path), "ab") as index_file:
+                index_file.write(b"".join(index_records))
+
+            # Update checksum
+            with open(f"{file_path}.checksum", "w") as checksum_file:
+                checksum_file.write(checksum)
+
+        logger.info(f"Successfully wrote {len(lines)} data backup entries")
+        return len(lines)
     except Exception as e:
         logger.error(f"Error writing data: {str(e)}")
-        return False
+        return 0
+
+def iter_data_lines(
+    cursor: int = 0,
+    limit: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Tuple[Iterator[bytes], Optional[int]]:
+    """
+    Return raw journal lines for a page and the cursor of the next page.
+    The page boundaries come from the sidecar index, so only the requested
+    slice of the journal is read. Lines are yielded without re-serialization.
+    """
+    file_path = settings.FILE_PATH
+    if not os.path.exists(file_path):
+        return iter(()), None
+
+    with _journal_lock(file_path):
+        _migrate_legacy_format(file_path)
+        _ensure_index(file_path)
+
+    with open(_index_path(file_path), "rb") as index_file:
+        size = os.fstat(index_file.fileno()).st_size
+        count = size // _INDEX_RECORD.size
+        if count == 0:
+            return iter(()), None
+        with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index:
+            start = max(cursor, 0)
+            end = count
+            if since is not None:
+                start = max(start, _bisect_time(index, count, _to_epoch(since), inclusive=False))
+            if until is not None:
+                end = _bisect_time(index, count, _to_epoch(until), inclusive=True)
+            stop = end if limit is None else min(end, start + limit)
+            if start >= stop:
+                return iter(()), None
+            first_offset = _INDEX_RECORD.unpack_from(index, start * _INDEX_RECORD.size)[0]
+
+    next_cursor = stop if stop < end else None
+    return _read_lines(file_path, first_offset, stop - start), next_cursor
+
+def _read_lines(file_path: str, offset: int, count: int) -> Iterator[bytes]:
+    """Yield count journal lines starting at a byte offset"""
+    with open(file_path, "rb") as file:
+        file.seek(offset)
+        for _ in range(count):
+            line = file.readline()
+            if not line:
+                break
+            yield line.rstrip(b"\n")
+
+def _bisect_time(index: mmap.mmap, count: int, epoch: float, inclusive: bool) -> int:
+    """
+    Find the first index position whose time is >= epoch (or > epoch when inclusive).
+    Journal times are non-decreasing because entries are stamped under the write lock.
+    """
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        saved_ts = _INDEX_RECORD.unpack_from(index, middle * _INDEX_RECORD.size)[1]
+        if saved_ts < epoch or (inclusive and saved_ts == epoch):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def _to_epoch(value: datetime) -> float:
+    """Convert a datetime to epoch seconds, treating naive values as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _index_path(file_path: str) -> str:
+    return f"{file_path}.idx"
+
+def _ensure_index(file_path: str) -> None:
+    """Rebuild the sidecar index if it is missing or does not cover the journal"""
+    index_path = _index_path(file_path)
+    if not os.path.exists(file_path):
+        return
+    journal_size = os.path.getsize(file_path)
+    if os.path.exists(index_path):
+        index_size = os.path.getsize(index_path)
+        if index_size % _INDEX_RECORD.size == 0:
+            if index_size == 0 and journal_size == 0:
+                return
+            if index_size > 0:
+                with open(index_path, "rb") as index_file:
+                    index_file.seek(index_size - _INDEX_RECORD.size)
+                    last_offset = _INDEX_RECORD.unpack(index_file.read(_INDEX_RECORD.size))[0]
+                with open(file_path, "rb") as file:
+                    file.seek(last_offset)
+                    last_line = file.readline()
+                if last_offset + len(last_line) == journal_size:
+                    return
+    _rebuild_index(file_path)
+
+def _rebuild_index(file_path: str) -> None:
+    """Scan the journal once and write a fresh sidecar index"""
+    records = []
+    offset = 0
+    with open(file_path, "rb") as file:
+        for line in file:
+            saved_ts = 0.0
+            if line.strip():
+                try:
+                    date_saved = json.loads(line).get("dateSaved")
+                    if date_saved:
+                        saved_ts = _to_epoch(datetime.fromisoformat(date_saved))
+                except (ValueError, AttributeError):
+                    pass
+                records.append(_INDEX_RECORD.pack(offset, saved_ts))
+            offset += len(line)
+
+    tmp_path = f"{_index_path(file_path)}.tmp"
+    with open(tmp_path, "wb") as index_file:
+        index_file.write(b"".join(records))
+    os.replace(tmp_path, _index_path(file_path))
+    logger.info(f"Rebuilt journal index with {len(records)} entries")
 
 def calculate_file_checksum(file_path: str) -> str:
-    """Calculate SHA-256 checksum of a file"""
-    sha256 = hashlib.sha256()
+    """Calculate the chained SHA-256 checksum of a journal file"""
+    checksum = ""
     with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256.update(byte_block)
-    return sha256.hexdigest()
\ No newline at end of file
+        for line in f:
+            checksum = _chain_checksum(checksum, line)
+    return checksum
+
+def _chain_checksum(previous: str, line: bytes) -> str:
+    """Extend a hash chain with one journal line"""
+    return hashlib.sha256(previous.encode() + line).hexdigest()
+
+def _read_checksum(file_path: str) -> str:
+    """Return the stored chain head, recomputing it if missing"""
+    checksum_path = f"{file_path}.checksum"
+    if os.path.exists(checksum_path):
+        with open(checksum_path, "r") as checksum_file:
+            return checksum_file.read().strip()
+    if os.path.exists(file_path):
+        return calculate_file_checksum(file_path)
+    return ""
+
+def _is_legacy_format(file_path: str) -> bool:
+    """Backups written before the journal format are a single JSON array"""
+    with open(file_path, "rb") as file:
+        return file.read(64).lstrip().startswith(b"[")
+
+def _migrate_legacy_format(file_path: str) -> None:
+    """Rewrite a legacy JSON array backup as a journal, once"""
+    if not os.path.exists(file_path) or not _is_legacy_format(file_path):
+        return
+
+    with open(file_path, "r") as file:
+        legacy_entries = json.load(file)
+
+    checksum = ""
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as file:
+        for entry in legacy_entries:
+            line = json.dumps(entry, separators=(",", ":")).encode() + b"\n"
+            checksum = _chain_checksum(checksum, line)
+            file.write(line)
+    os.replace(tmp_path, file_path)
+
+    with open(f"{file_path}.checksum", "w") as checksum_file:
+        checksum_file.write(checksum)
+    _rebuild_index(file_path)
+    logger.info(f"Migrated {len(legacy_entries)} backup entries to journal format")
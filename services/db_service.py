@@ -1,8 +1,17 @@
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 from api.core.config import settings
+from services.cache_service import get_cache
+from services.circuit_breaker import CircuitBreaker, is_transient
+from services.write_journal import get_write_journal
+from services.id_service import new_id
+from api.core.tracing import span
+import asyncio
+import base64
 import logging
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+import uuid
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import date, datetime, timezone
 import json
 
 logger = logging.getLogger(__name__)
@@ -14,9 +23,36 @@ def get_supabase_client() -> Client:
     """Get or initialize the Supabase client"""
     global _supabase_client
     if _supabase_client is None:
-        _supabase_client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        _supabase_client = create_client(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_KEY,
+            options=ClientOptions(postgrest_client_timeout=settings.SUPABASE_TIMEOUT_SECONDS)
+        )
     return _supabase_client
 
+_db_breaker: Optional[CircuitBreaker] = None
+
+def get_db_breaker() -> CircuitBreaker:
+    """Get or initialize the circuit breaker guarding every Supabase call"""
+    global _db_breaker
+    if _db_breaker is None:
+        _db_breaker = CircuitBreaker(
+            "supabase",
+            settings.DB_BREAKER_FAILURE_THRESHOLD,
+            settings.DB_BREAKER_RESET_SECONDS,
+            settings.DB_SLOW_CALL_SECONDS,
+        )
+    return _db_breaker
+
+def _guarded(fn):
+    """Run a blocking Supabase call through the circuit breaker (fails fast with CircuitOpen while it is open)"""
+    return get_db_breaker().call(fn)
+
+# Outcomes of a transaction write
+STORED = "stored"
+QUEUED = "queued"
+FAILED = "failed"
+
 def init_db():
     """Initialize database connection and verify credentials"""
     try:
@@ -39,70 +75,402 @@ def init_db():
             # In development, we can continue with warnings
             logger.warning("Running in development mode without database connection")
 
+class InvalidCursor(ValueError):
+    """A pagination cursor that is malformed or wasn't issued by this service"""
+
+def encode_transactions_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past a transaction row"""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_transactions_cursor(cursor: str) -> Tuple[str, str]:
+    """The (created_at, id) position of a cursor"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        uuid.UUID(str(row_id))
+    except (ValueError, TypeError, AttributeError):
+        raise InvalidCursor("Invalid cursor")
+    return created_at, str(row_id)
+
+_replay_task: Optional[asyncio.Task] = None
+
+async def _replay_loop():
+    while True:
+        await asyncio.sleep(settings.DB_REPLAY_INTERVAL_SECONDS)
+        try:
+            if get_write_journal().has_pending():
+                # While the circuit is open this fails fast; once it half-opens the first batch is the probe
+                await DatabaseService.replay_pending_writes()
+        except Exception as e:
+            logger.error(f"Pending write replay error: {str(e)}")
+
+def start_write_replay() -> None:
+    """Start the background task replaying journaled writes (call from the running event loop)"""
+    global _replay_task
+    if _replay_task is None:
+        _replay_task = asyncio.get_running_loop().create_task(_replay_loop())
+        logger.info("Pending write replay started")
+
+def _user_namespace(user_id: str) -> str:
+    """Cache namespace holding every cached read for a user"""
+    return f"user:{user_id}"
+
+def _utc_iso(value: datetime) -> str:
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+
+def _transaction_snapshot(record: Dict[str, Any], created_at: datetime) -> Optional[Dict[str, Any]]:
+    """The balance snapshot a stored transaction implies (the account balance after it)"""
+    if record.get("balance") is None or not record.get("accountId"):
+        return None
+    recorded_at = _utc_iso(created_at)
+    if record.get("transaction_date"):
+        try:
+            recorded_at = _utc_iso(datetime.fromisoformat(str(record["transaction_date"]).replace("Z", "+00:00")))
+        except ValueError:
+            pass
+    return {"user_id": record["accountId"], "account_id": record["accountId"],
+            "balance": float(record["balance"]), "source": "transaction", "recorded_at": recorded_at}
+
 class DatabaseService:
     @staticmethod
     async def get_balance(user_id: str) -> Optional[Dict[str, Any]]:
-        """Get user balance from financial_data table"""
+        """Get user balance from financial_data table (cached per user)"""
+        def query():
+            with span("supabase.select", table="financial_data", user_id=user_id):
+                client = get_supabase_client()
+                response = client.table('financial_data') \
+                    .select('balance, last_updated') \
+                    .eq('user_id', user_id) \
+                    .execute()
+            return response.data[0] if response.data else None
+
         try:
-            client = get_supabase_client()
-            response = client.table('financial_data') \
-                .select('balance, last_updated') \
-                .eq('user_id', user_id) \
-                .execute()
-                
-            if response.data:
+            balance = await get_cache().get_or_load(
+                _user_namespace(user_id), "balance", lambda: asyncio.to_thread(_guarded, query)
+            )
+            if balance:
                 logger.info(f"Retrieved balance for user {user_id}")
-                return response.data[0]
             else:
                 logger.warning(f"No balance found for user {user_id}")
-                return None
+            return balance
         except Exception as e:
             logger.error(f"Database error retrieving balance: {str(e)}")
             return None
 
     @staticmethod
-    async def store_transaction(data: Dict[str, Any]) -> bool:
-        """Store transaction data with audit fields"""
+    async def upsert_balance(user_id: str, account_id: str, balance: float, updated_at: datetime) -> bool:
+        """Write a user's latest balance for one account to financial_data"""
+        row = {"balance": balance, "last_updated": updated_at.isoformat()}
+
+        def upsert():
+            client = get_supabase_client()
+            with span("supabase.update", table="financial_data", user_id=user_id):
+                response = client.table('financial_data') \
+                    .update(row) \
+                    .eq('user_id', user_id) \
+                    .eq('account_id', account_id) \
+                    .execute()
+            if response.data:
+                return response
+            with span("supabase.insert", table="financial_data", rows=1):
+                return client.table('financial_data') \
+                    .insert({**row, "user_id": user_id, "account_id": account_id}) \
+                    .execute()
+
         try:
-            # Add audit fields
-            data_with_audit = {
-                **data,
-                "created_at": datetime.utcnow().isoformat(),
-                "transaction_id": f"tx_{datetime.utcnow().timestamp()}",
+            response = await asyncio.to_thread(_guarded, upsert)
+            await DatabaseService.record_balance_snapshots([{
+                "user_id": user_id, "account_id": account_id, "balance": balance,
+                "source": "scrape", "recorded_at": _utc_iso(updated_at),
+            }])
+            return len(response.data) > 0
+        except Exception as e:
+            logger.error(f"Balance storage error: {str(e)}")
+            return False
+        finally:
+            get_cache().invalidate(_user_namespace(user_id))
+
+    @staticmethod
+    async def record_balance_snapshots(snapshots: List[Dict[str, Any]]) -> bool:
+        """
+        Append balance snapshots to balance_history; the database folds them
+        into the day/week/month rollups in the same statement.
+        """
+        if not snapshots:
+            return True
+
+        def record():
+            with span("supabase.rpc", function="record_balance_snapshots", rows=len(snapshots)):
+                client = get_supabase_client()
+                client.rpc('record_balance_snapshots', {"snapshots": snapshots}).execute()
+
+        try:
+            await asyncio.to_thread(_guarded, record)
+            return True
+        except Exception as e:
+            # History is derived data; a failure here must not fail the write that produced it
+            logger.error(f"Balance history error: {str(e)}")
+            return False
+
+    @staticmethod
+    async def get_balance_rollups(
+        user_id: str,
+        period: str,
+        start: date,
+        end: date,
+        account_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get a user's balance rollup rows for one period in [start, end] (cached per user and range)"""
+        def query():
+            with span("supabase.select", table="balance_rollups", user_id=user_id, period=period):
+                client = get_supabase_client()
+                request = client.table('balance_rollups') \
+                    .select('account_id, period_start, min_balance, max_balance, close_balance, samples') \
+                    .eq('user_id', user_id) \
+                    .eq('period', period) \
+                    .gte('period_start', start.isoformat()) \
+                    .lte('period_start', end.isoformat())
+                if account_id:
+                    request = request.eq('account_id', account_id)
+                response = request.order('account_id').order('period_start').execute()
+            return response.data
+
+        return await get_cache().get_or_load(
+            _user_namespace(user_id),
+            f"balance_rollups:{period}:{account_id or '*'}:{start.isoformat()}:{end.isoformat()}",
+            lambda: asyncio.to_thread(_guarded, query)
+        )
+
+    @staticmethod
+    def _audited(records: List[Dict[str, Any]], created_at: datetime) -> List[Dict[str, Any]]:
+        """Rows for records with audit fields; transaction_id doubles as the dedup key on replay"""
+        return [
+            {
+                **record,
+                "created_at": created_at.isoformat(),
+                "transaction_id": new_id("tx"),
                 "status": "completed"
             }
-            
-            client = get_supabase_client()
-            response = client.table('transactions') \
-                .insert(data_with_audit) \
-                .execute()
-                
-            success = len(response.data) > 0
-            if success:
-                logger.info(f"Successfully stored transaction: {data_with_audit['transaction_id']}")
-            else:
-                logger.warning("Transaction insert returned no data")
-                
-            return success
+            for record in records
+        ]
+
+    @staticmethod
+    async def _write_transactions(rows: List[Dict[str, Any]]) -> Tuple[str, int]:
+        """
+        Insert transaction rows, or queue them in the pending write journal
+        when the database is unavailable (circuit open, timeout, 5xx) or a
+        backlog is still waiting, so writes reach the database in order.
+        Returns the outcome and the number of rows the database acknowledged.
+        """
+        journal = get_write_journal()
+        if not journal.has_pending():
+            def insert():
+                with span("supabase.insert", table="transactions", rows=len(rows)):
+                    client = get_supabase_client()
+                    return client.table('transactions').insert(rows).execute()
+
+            try:
+                response = await asyncio.to_thread(_guarded, insert)
+                return STORED, len(response.data)
+            except Exception as e:
+                if not is_transient(e):
+                    logger.error(f"Transaction storage error: {str(e)}")
+                    return FAILED, 0
+                logger.warning(f"Database unavailable, queueing {len(rows)} transactions: {str(e)}")
+        try:
+            await asyncio.to_thread(journal.append, rows)
         except Exception as e:
-            logger.error(f"Transaction storage error: {str(e)}")
-            # Log detailed error info but don't expose in response
-            logger.debug(f"Failed transaction data: {json.dumps(data)}")
-            return False
+            logger.error(f"Pending write journal error: {str(e)}")
+            return FAILED, 0
+        return QUEUED, 0
+
+    @staticmethod
+    async def store_transaction(data: Dict[str, Any]) -> str:
+        """
+        Store transaction data with audit fields. Returns STORED, QUEUED (kept
+        in the pending write journal and replayed once the database is back)
+        or FAILED.
+        """
+        created_at = datetime.utcnow()
+        row = DatabaseService._audited([data], created_at)[0]
+        try:
+            outcome, stored = await DatabaseService._write_transactions([row])
+            if outcome == STORED and stored:
+                logger.info(f"Successfully stored transaction: {row['transaction_id']}")
+                snapshot = _transaction_snapshot(data, created_at)
+                if snapshot:
+                    await DatabaseService.record_balance_snapshots([snapshot])
+            elif outcome == STORED:
+                logger.warning("Transaction insert returned no data")
+                outcome = FAILED
+            elif outcome == QUEUED:
+                logger.info(f"Queued transaction for replay: {row['transaction_id']}")
+            else:
+                # Log detailed error info but don't expose in response
+                logger.debug(f"Failed transaction data: {json.dumps(data)}")
+            return outcome
+        finally:
+            # Cached reads may be stale whether or not the insert was acknowledged
+            if data.get("accountId"):
+                get_cache().invalidate(_user_namespace(data["accountId"]))
             
     @staticmethod
-    async def get_transactions(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get recent transactions for a user"""
+    async def store_transactions(records: List[Dict[str, Any]]) -> int:
+        """
+        Store a batch of transactions in one insert and return how many were
+        accepted: stored, or queued for replay while the database is unavailable
+        """
+        if not records:
+            return 0
+        created_at = datetime.utcnow()
+        rows = DatabaseService._audited(records, created_at)
+
         try:
+            outcome, stored = await DatabaseService._write_transactions(rows)
+            if outcome == QUEUED:
+                logger.info(f"Queued {len(rows)} transactions for replay")
+                return len(rows)
+            logger.info(f"Stored {stored}/{len(rows)} transactions in bulk")
+            if stored:
+                snapshots = [_transaction_snapshot(record, created_at) for record in records]
+                await DatabaseService.record_balance_snapshots([snapshot for snapshot in snapshots if snapshot])
+            return stored
+        finally:
+            for account_id in {record.get("accountId") for record in records}:
+                if account_id:
+                    get_cache().invalidate(_user_namespace(account_id))
+
+    @staticmethod
+    async def replay_pending_writes() -> int:
+        """
+        Send journaled transactions to the database in order, in batches of
+        DB_REPLAY_BATCH_SIZE, and return how many were replayed. Rows are
+        upserted on transaction_id, so a batch that reached the database
+        before its acknowledgement was lost isn't stored twice. Stops at the
+        first transient failure; rows the database rejects are set aside.
+        """
+        journal = get_write_journal()
+        replayed = 0
+        with journal.replaying() as owner:
+            if not owner:
+                return 0
+            while True:
+                rows, ends = await asyncio.to_thread(journal.read_batch, settings.DB_REPLAY_BATCH_SIZE)
+                if not rows:
+                    break
+                accepted, committed, paused = await DatabaseService._replay_batch(rows, ends)
+                if committed is not None:
+                    await asyncio.to_thread(journal.commit, committed)
+                replayed += len(accepted)
+                snapshots = []
+                for row in accepted:
+                    snapshot = _transaction_snapshot(row, datetime.fromisoformat(row["created_at"]))
+                    if snapshot:
+                        snapshots.append(snapshot)
+                    if row.get("accountId"):
+                        get_cache().invalidate(_user_namespace(row["accountId"]))
+                await DatabaseService.record_balance_snapshots(snapshots)
+                if paused:
+                    logger.info(f"Replay paused with {journal.pending_bytes()} bytes pending")
+                    break
+        if replayed:
+            logger.info(f"Replayed {replayed} journaled transactions")
+        return replayed
+
+    @staticmethod
+    async def _replay_batch(
+        rows: List[Dict[str, Any]],
+        ends: List[int]
+    ) -> Tuple[List[Dict[str, Any]], Optional[int], bool]:
+        """
+        Upsert one journal batch. Returns the rows the database accepted, the
+        journal offset replay got past (None if nowhere) and whether replay
+        must pause because the database is unavailable.
+        """
+        try:
+            await asyncio.to_thread(_guarded, lambda: DatabaseService._upsert_transactions(rows))
+            return rows, ends[-1], False
+        except Exception as e:
+            if is_transient(e):
+                logger.info(f"Replay batch failed: {str(e)}")
+                return [], None, True
+            logger.warning(f"Replay batch rejected, retrying row by row: {str(e)}")
+
+        # Set aside only the rows the database refuses, keeping the others in order
+        accepted, committed = [], None
+        for row, end in zip(rows, ends):
+            try:
+                await asyncio.to_thread(_guarded, lambda: DatabaseService._upsert_transactions([row]))
+                accepted.append(row)
+            except Exception as e:
+                if is_transient(e):
+                    return accepted, committed, True
+                await asyncio.to_thread(get_write_journal().reject, [row], str(e))
+            committed = end
+        return accepted, committed, False
+
+    @staticmethod
+    def _upsert_transactions(rows: List[Dict[str, Any]]):
+        with span("supabase.upsert", table="transactions", rows=len(rows)):
             client = get_supabase_client()
-            response = client.table('transactions') \
-                .select('*') \
-                .eq('accountId', user_id) \
-                .order('created_at', desc=True) \
-                .limit(limit) \
+            return client.table('transactions') \
+                .upsert(rows, on_conflict='transaction_id', ignore_duplicates=True) \
                 .execute()
-                
-            return response.data
+
+    @staticmethod
+    async def get_transactions(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get recent transactions for a user (cached per user and limit)"""
+        page = await DatabaseService.get_transactions_page(user_id, limit)
+        return page["transactions"]
+
+    @staticmethod
+    async def get_transactions_page(
+        user_id: str,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        category: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get one page of a user's transactions, newest first, with keyset
+        pagination on (created_at, id): a page resumes strictly after the
+        last row of the previous one, so deep pages cost the same as the
+        first (cached per user, page and filters). since/until bound
+        created_at. Raises InvalidCursor for a cursor this method didn't issue.
+        """
+        after = decode_transactions_cursor(cursor) if cursor else None
+
+        def query():
+            with span("supabase.select", table="transactions", user_id=user_id, limit=limit):
+                client = get_supabase_client()
+                request = client.table('transactions') \
+                    .select('*') \
+                    .eq('accountId', user_id)
+                if category:
+                    request = request.eq('category', category)
+                if since:
+                    request = request.gte('created_at', _utc_iso(since))
+                if until:
+                    request = request.lt('created_at', _utc_iso(until))
+                if after:
+                    created_at, row_id = after
+                    # The lte bound is what the index seeks to; the or only drops ties at created_at
+                    request = request.lte('created_at', created_at) \
+                        .or_(f'created_at.lt."{created_at}",id.lt.{row_id}')
+                response = request \
+                    .order('created_at', desc=True) \
+                    .order('id', desc=True) \
+                    .limit(limit + 1) \
+                    .execute()
+            rows = response.data
+            next_cursor = encode_transactions_cursor(rows[limit - 1]) if len(rows) > limit else None
+            return {"transactions": rows[:limit], "next_cursor": next_cursor}
+
+        key = f"transactions:{limit}:{cursor or ''}:{since and _utc_iso(since)}:{until and _utc_iso(until)}:{category or ''}"
+        try:
+            return await get_cache().get_or_load(_user_namespace(user_id), key, lambda: asyncio.to_thread(_guarded, query))
         except Exception as e:
             logger.error(f"Error retrieving transactions: {str(e)}")
-            return []
\ No newline at end of file
+            return {"transactions": [], "next_cursor": None}
@@ -0,0 +1,183 @@
+import csv
+import datetime
+import json
+import logging
+import math
+import random
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Stand-in rates (base currency units per unit) used when no FX_RATES_PATH is configured
+REFERENCE_RATES = {"EUR": 10.85, "USD": 9.95, "GBP": 12.70, "CHF": 11.25}
+
+class FxError(ValueError):
+    """A conversion the rate table can't serve (unknown currency or date before the table)"""
+
+class FxTable:
+    """
+    Daily FX rates against one base currency. Days are kept sorted, so a
+    lookup is a binary search that falls back to the latest earlier day
+    (weekends and holidays use the previous fixing). Each day is one rate
+    vector across all currencies, forward-filled at load, and the
+    conversion factors into a target currency are cached per day.
+    """
+
+    def __init__(self, base: str, days: Sequence[datetime.date], currencies: Sequence[str],
+                 rows: Sequence[Sequence[float]], cache_size: int = 4096):
+        self.base = base
+        self.currencies = [base] + [currency for currency in currencies if currency != base]
+        self._position = {currency: i for i, currency in enumerate(self.currencies)}
+        self.days = list(days)
+        self._ordinals = [day.toordinal() for day in self.days]
+        # Row i is the rate vector of days[i], in self.currencies order (base first, always 1.0)
+        self._rows: List[Tuple[float, ...]] = [tuple(row) for row in rows]
+        self.row_for = lru_cache(maxsize=cache_size)(self._row_for)
+        self.factors = lru_cache(maxsize=cache_size)(self._factors)
+
+    @classmethod
+    def from_rates(cls, base: str, rates: Iterable[Tuple[datetime.date, str, float]], cache_size: int = 4096) -> "FxTable":
+        """Build from (day, currency, rate) entries, carrying each rate forward over days that lack it"""
+        by_day: Dict[datetime.date, Dict[str, float]] = {}
+        for day, currency, rate in rates:
+            if rate <= 0:
+                raise FxError(f"Invalid rate {rate} for {currency} on {day}")
+            by_day.setdefault(day, {})[currency.upper()] = float(rate)
+        currencies = sorted({currency for day_rates in by_day.values() for currency in day_rates} - {base})
+        rows, last = [], {currency: math.nan for currency in currencies}
+        days = sorted(by_day)
+        for day in days:
+            last.update(by_day[day])
+            rows.append([1.0] + [last[currency] for currency in currencies])
+        return cls(base, days, currencies, rows, cache_size)
+
+    @classmethod
+    def load(cls, path: str, base: str, cache_size: int = 4096) -> "FxTable":
+        """
+        Load a rate file: CSV with date,currency,rate columns, or JSON
+        {"base": ..., "rates": {"YYYY-MM-DD": {"EUR": 10.8, ...}}}.
+        Rates are base currency units per unit of the currency.
+        """
+        if path.endswith(".json"):
+            with open(path) as file:
+                data = json.load(file)
+            base = data.get("base", base)
+            entries = [
+                (datetime.date.fromisoformat(day), currency, rate)
+                for day, day_rates in data["rates"].items()
+                for currency, rate in day_rates.items()
+            ]
+        else:
+            with open(path, newline="") as file:
+                entries = [
+                    (datetime.date.fromisoformat(row["date"]), row["currency"], float(row["rate"]))
+                    for row in csv.DictReader(file)
+                ]
+        table = cls.from_rates(base, entries, cache_size)
+        logger.info(f"Loaded FX table {path}: {len(table.days)} days, {len(table.currencies)} currencies")
+        return table
+
+    @classmethod
+    def stand_in(cls, base: str, days: int = 730, cache_size: int = 4096) -> "FxTable":
+        """Deterministic business-day rates drifting around REFERENCE_RATES, ending today"""
+        rng = random.Random(f"fx:{base}")
+        today = datetime.date.today()
+        entries, level = [], dict(REFERENCE_RATES)
+        for offset in range(days, -1, -1):
+            day = today - datetime.timedelta(days=offset)
+            if day.weekday() >= 5:
+                continue
+            for currency, reference in REFERENCE_RATES.items():
+                # Mean-reverting daily moves of about 0.3%
+                level[currency] *= 1 + rng.gauss(0, 0.003) + 0.02 * (reference / level[currency] - 1)
+                entries.append((day, currency, round(level[currency], 4)))
+        return cls.from_rates(base, entries, cache_size)
+
+    def _row_for(self, day: str) -> int:
+        """Index of the rate row in effect on day (YYYY-MM-DD or an ISO datetime)"""
+        try:
+            ordinal = datetime.date.fromisoformat(day[:10]).toordinal()
+        except (TypeError, ValueError):
+            raise FxError(f"Invalid date: {day}")
+        index = bisect_right(self._ordinals, ordinal) - 1
+        if index < 0:
+            raise FxError(f"No FX rates before {self.days[0].isoformat() if self.days else 'any date'}")
+        return index
+
+    def _factors(self, row: int, target: str) -> Tuple[float, ...]:
+        """Multipliers converting each currency into target with the rates of one row"""
+        rates = self._rows[row]
+        target_rate = rates[self.position(target)]
+        if math.isnan(target_rate):
+            raise FxError(f"No {target} rate on or before {self.days[row].isoformat()}")
+        return tuple(rate / target_rate for rate in rates)
+
+    def position(self, currency: str) -> int:
+        try:
+            return self._position[currency.upper()]
+        except (KeyError, AttributeError):
+            raise FxError(f"Unsupported currency: {currency}")
+
+    def rate(self, source: str, target: str, day: str) -> float:
+        factor = self.factors(self.row_for(day), target.upper())[self.position(source)]
+        if math.isnan(factor):
+            raise FxError(f"No {source} rate on or before {day}")
+        return factor
+
+    def convert_many(self, amounts: Sequence[Optional[float]], currencies: Sequence[str],
+                     days: Sequence[str], target: str) -> List[Optional[float]]:
+        """
+        Convert a batch of amounts into target. Rows and factor vectors are
+        resolved once per distinct day and currency positions once per code,
+        so the per-amount work is one multiply.
+        """
+        target = target.upper()
+        positions = {currency: self.position(currency) for currency in set(currencies)}
+        vectors = {day: self.factors(self.row_for(day), target) for day in set(days)}
+        converted = []
+        for amount, currency, day in zip(amounts, currencies, days):
+            if amount is None:
+                converted.append(None)
+                continue
+            factor = vectors[day][positions[currency]]
+            if math.isnan(factor):
+                raise FxError(f"No {currency} rate on or before {day}")
+            converted.append(round(amount * factor, 2))
+        return converted
+
+def convert_records(
+    records: List[Dict[str, Any]],
+    fields: Sequence[str],
+    target: str,
+    date_field: str = "date",
+    currency_field: str = "iso_currency_code",
+) -> List[Dict[str, Any]]:
+    """
+    Copies of records with a converted_<field> for each amount field, plus
+    converted_currency. The input records (often shared, cached objects) are left untouched.
+    """
+    table = get_fx_table()
+    currencies = [record.get(currency_field) or table.base for record in records]
+    days = [record[date_field] for record in records]
+    columns = [table.convert_many([record.get(field) for record in records], currencies, days, target) for field in fields]
+    target = target.upper()
+    return [
+        {**record, **{f"converted_{field}": column[i] for field, column in zip(fields, columns)}, "converted_currency": target}
+        for i, record in enumerate(records)
+    ]
+
+_fx_table: Optional[FxTable] = None
+
+def get_fx_table() -> FxTable:
+    """Get or load the FX rate table (FX_RATES_PATH, or the stand-in rates)"""
+    global _fx_table
+    if _fx_table is None:
+        if settings.FX_RATES_PATH:
+            _fx_table = FxTable.load(settings.FX_RATES_PATH, settings.FX_BASE_CURRENCY, settings.FX_CACHE_DAYS)
+        else:
+            _fx_table = FxTable.stand_in(settings.FX_BASE_CURRENCY, cache_size=settings.FX_CACHE_DAYS)
+    return _fx_table
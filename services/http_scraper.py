@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin
+
+import httpx
+from bs4 import BeautifulSoup
+
+from api.core.tracing import traced
+from services.scraping_service import (
+    ScraperBackend, ScraperError, ScraperUnsupported, ScraperSessionMissing,
+    USERNAME_SELECTOR, OTP_INPUT_SELECTOR, LOGIN_BUTTON_SELECTOR,
+    OTP_SUBMIT_BUTTON_SELECTOR, BALANCE_CELL_SELECTOR, ACCOUNT_CELL_SELECTOR,
+)
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0 Safari/537.36"
+)
+
+def form_fields(form) -> Dict[str, str]:
+    """
+    The name/value pairs a browser would submit for a form, minus its buttons:
+    hidden state such as __VIEWSTATE, text inputs, checked boxes and selects.
+    """
+    fields = {}
+    for element in form.select("input[name], select[name], textarea[name]"):
+        name = element["name"]
+        if element.name == "input":
+            kind = (element.get("type") or "text").lower()
+            if kind in ("submit", "button", "image", "reset", "file"):
+                continue
+            if kind in ("checkbox", "radio") and not element.has_attr("checked"):
+                continue
+            fields[name] = element.get("value", "on" if kind in ("checkbox", "radio") else "")
+        elif element.name == "select":
+            option = element.select_one("option[selected]") or element.select_one("option")
+            if option is not None:
+                fields[name] = option.get("value", option.get_text())
+        else:
+            fields[name] = element.get_text()
+    return fields
+
+class _FormPage:
+    """A fetched page and the form around one of its fields"""
+
+    def __init__(self, response: httpx.Response):
+        self.url = str(response.url)
+        self.soup = BeautifulSoup(response.text, "html.parser")
+
+    def form_for(self, field_selector: str, button_selector: str) -> Tuple[str, Dict[str, str]]:
+        """Return (action URL, fields) for submitting the form that holds field_selector via button_selector"""
+        field = self.soup.select_one(field_selector)
+        if field is None or not field.get("name"):
+            raise ScraperUnsupported(f"{field_selector} not found in the page HTML")
+        form = field.find_parent("form")
+        if form is None:
+            raise ScraperUnsupported(f"{field_selector} is not inside a form")
+        fields = form_fields(form)
+        button = self.soup.select_one(button_selector)
+        if button is None:
+            raise ScraperUnsupported(f"{button_selector} not found in the page HTML")
+        # Server-side frameworks (ASP.NET postbacks) dispatch on the clicked button's name
+        if button.get("name"):
+            fields[button["name"]] = button.get("value", "")
+        action = urljoin(self.url, form.get("action") or self.url)
+        return action, fields
+
+    def field_name(self, selector: str) -> str:
+        return self.soup.select_one(selector)["name"]
+
+class _Session:
+    def __init__(self, client: httpx.Client, page: _FormPage):
+        self.client = client
+        self.page = page
+        # Set once the OTP is accepted; re-fetching it refreshes the balance
+        self.accounts_url: Optional[str] = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+class HttpSessionScraper(ScraperBackend):
+    """
+    Drives the login flow with plain HTTP: a cookie-keeping client per user,
+    forms filled from the served HTML and the balance read with CSS selectors.
+    Uses a few MB and one round trip per step instead of a browser, but can't
+    run JavaScript (start_login raises ScraperUnsupported when that's needed).
+    """
+    name = "http"
+
+    def __init__(self, login_url: str, timeout: float = 15.0, session_ttl: float = 300.0):
+        self.login_url = login_url
+        self.timeout = timeout
+        self.session_ttl = session_ttl
+        self._sessions: Dict[str, _Session] = {}
+        self._lock = threading.Lock()
+
+    def _new_client(self) -> httpx.Client:
+        return httpx.Client(
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "fr-MA,fr;q=0.9"},
+        )
+
+    def _expire_sessions(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            expired = [user for user, session in self._sessions.items() if now - session.last_used > self.session_ttl]
+            for user in expired:
+                self._sessions.pop(user).client.close()
+
+    def has_session(self, username: str) -> bool:
+        self._expire_sessions()
+        return username in self._sessions
+
+    @traced("http_scraper.start_login")
+    def start_login(self, username: str, password: str) -> dict:
+        self._expire_sessions()
+        client = self._new_client()
+        try:
+            response = client.get(self.login_url)
+            response.raise_for_status()
+            page = _FormPage(response)
+            action, fields = page.form_for(USERNAME_SELECTOR, LOGIN_BUTTON_SELECTOR)
+            # Same input as the browser flow: the password is typed into the login field after the username
+            fields[page.field_name(USERNAME_SELECTOR)] = f"{username}{password}"
+            response = client.post(action, data=fields, headers={"Referer": page.url})
+            response.raise_for_status()
+            otp_page = _FormPage(response)
+            if otp_page.soup.select_one(OTP_INPUT_SELECTOR) is None:
+                raise ScraperError("Login was not accepted (no OTP prompt)")
+        except Exception:
+            client.close()
+            raise
+
+        with self._lock:
+            previous = self._sessions.pop(username, None)
+            self._sessions[username] = _Session(client, otp_page)
+        if previous:
+            previous.client.close()
+        return {"status": "OTP_REQUIRED"}
+
+    @traced("http_scraper.submit_otp")
+    def submit_otp(self, username: str, otp: str) -> dict:
+        self._expire_sessions()
+        with self._lock:
+            session = self._sessions.get(username)
+        if session is None:
+            raise ScraperSessionMissing("No login in progress for this user; submit credentials first")
+
+        with session.lock:
+            page = session.page
+            action, fields = page.form_for(OTP_INPUT_SELECTOR, OTP_SUBMIT_BUTTON_SELECTOR)
+            fields[page.field_name(OTP_INPUT_SELECTOR)] = otp
+            response = session.client.post(action, data=fields, headers={"Referer": page.url})
+            response.raise_for_status()
+            result = self.parse_balance(response.text)
+            if result:
+                session.accounts_url = str(response.url)
+                session.last_used = time.monotonic()
+        if result:
+            return result
+        raise ScraperError("Balance not found on page")
+
+    @traced("http_scraper.refresh")
+    def refresh(self, username: str) -> dict:
+        self._expire_sessions()
+        with self._lock:
+            session = self._sessions.get(username)
+        if session is None or session.accounts_url is None:
+            raise ScraperSessionMissing("No logged-in session for this user")
+        with session.lock:
+            response = session.client.get(session.accounts_url)
+            response.raise_for_status()
+            result = self.parse_balance(response.text)
+            if result:
+                session.last_used = time.monotonic()
+        if result:
+            return result
+        # The bank ended the session (timeout or logout elsewhere)
+        self.close(username)
+        raise ScraperSessionMissing("Session is no longer logged in")
+
+    @staticmethod
+    def _select_cell(soup: BeautifulSoup, selector: str):
+        # Browsers insert <tbody>; raw HTML often omits it
+        return soup.select_one(selector) or soup.select_one(selector.replace(" tbody", ""))
+
+    @classmethod
+    def parse_balance(cls, html: str) -> Optional[dict]:
+        soup = BeautifulSoup(html, "html.parser")
+        cell = cls._select_cell(soup, BALANCE_CELL_SELECTOR)
+        balance = cell.get_text(strip=True) if cell else None
+        if not balance:
+            return None
+        result = {"status": "balance", "balance": balance}
+        account = cls._select_cell(soup, ACCOUNT_CELL_SELECTOR)
+        if account and account.get_text(strip=True):
+            result["account"] = account.get_text(strip=True)
+        return result
+
+    def close(self, username: str) -> None:
+        with self._lock:
+            session = self._sessions.pop(username, None)
+        if session:
+            session.client.close()
@@ -0,0 +1,42 @@
+import os
+import threading
+import time
+
+# Crockford base32, as used by ULIDs
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+def new_ulid() -> str:
+    """
+    Generate a 26-character ULID: 48-bit millisecond timestamp + 80 random bits.
+    IDs from this process are strictly increasing: within the same millisecond
+    the random part is incremented instead of redrawn, so they never collide.
+    """
+    global _last_ms, _last_random
+    with _lock:
+        now_ms = int(time.time() * 1000)
+        if now_ms <= _last_ms:
+            now_ms = _last_ms
+            _last_random += 1
+            if _last_random >> _RANDOM_BITS:
+                # Random part overflowed: borrow the next millisecond
+                now_ms += 1
+                _last_random = int.from_bytes(os.urandom(10), "big")
+        else:
+            _last_random = int.from_bytes(os.urandom(10), "big")
+        _last_ms = now_ms
+        value = (now_ms << _RANDOM_BITS) | _last_random
+
+    chars = []
+    for _ in range(26):
+        chars.append(_ALPHABET[value & 0x1F])
+        value >>= 5
+    return "".join(reversed(chars))
+
+def new_id(prefix: str) -> str:
+    """Generate a prefixed, sortable, collision-free identifier such as tx_01J..."""
+    return f"{prefix}_{new_ulid()}"
@@ -0,0 +1,211 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyConflict(Exception):
+    """Raised when an Idempotency-Key is reused with a different request body"""
+
+class IdempotencyStore:
+    """
+    Bounded, time-windowed index of completed requests keyed by Idempotency-Key.
+    Entries live in an LRU dict and are appended to a journal file shared by
+    all workers (under an flock). Before treating a key as new, a worker reads
+    what the others appended, and compaction rewrites the journal from the
+    merged entries, so a replay is recognized on any worker and after a
+    restart. Concurrent requests with the same key on one worker wait for the
+    first one; across workers only completed keys are shared.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_keys: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        # key -> (expires_at, fingerprint, status_code, content)
+        self._entries: "OrderedDict[str, Tuple[float, str, int, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        # How far this process has read the journal, and which file that offset is in
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._journal_lines = 0
+        self._load()
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[Tuple[int, Any]]:
+        """
+        Return the stored (status_code, content) for a replayed key, or None
+        if the caller should process the request and then call complete/abort.
+        """
+        while True:
+            stored = self._lookup(key)
+            if stored is None and key not in self._inflight:
+                # Another worker may have completed it
+                await asyncio.to_thread(self._catch_up)
+                stored = self._lookup(key)
+            if stored is not None:
+                expires_at, stored_fingerprint, status_code, content = stored
+                if stored_fingerprint != fingerprint:
+                    raise IdempotencyConflict(key)
+                return status_code, content
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                self._inflight[key] = (fingerprint, asyncio.get_running_loop().create_future())
+                return None
+            if inflight[0] != fingerprint:
+                raise IdempotencyConflict(key)
+            # Wait for the first request, then re-check (it may have aborted)
+            await asyncio.shield(inflight[1])
+
+    async def complete(self, key: str, status_code: int, content: Any) -> None:
+        """Record the response for a key, release waiting duplicates and persist it off the event loop"""
+        fingerprint, future = self._inflight.pop(key, (None, None))
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, fingerprint, status_code, content)
+            self._entries.move_to_end(key)
+            self._evict()
+        if future is not None and not future.done():
+            future.set_result(None)
+        await asyncio.to_thread(self._append, key, expires_at, fingerprint, status_code, content)
+
+    def abort(self, key: str) -> None:
+        """Forget an in-flight key so a retry can execute the request again"""
+        _, future = self._inflight.pop(key, (None, None))
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def _lookup(self, key: str) -> Optional[Tuple[float, str, int, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            return entry
+
+    def _evict(self) -> None:
+        now = time.time()
+        # Entries are appended in completion order, so the oldest expire first
+        while self._entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if oldest[0] >= now and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[oldest_key]
+
+    @contextmanager
+    def _locked(self, operation: int):
+        """Serialize journal access across threads and worker processes"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._file_lock:
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, operation)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _catch_up(self) -> None:
+        """Load the journal lines appended since the last read, by any worker"""
+        try:
+            with self._locked(fcntl.LOCK_SH):
+                self._read_new()
+        except Exception as e:
+            logger.error(f"Error reading idempotency keys: {str(e)}")
+
+    def _read_new(self) -> None:
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            inode = os.fstat(file.fileno()).st_ino
+            if inode != self._inode:
+                # First read, or another worker compacted: start over in the new file
+                self._inode, self._offset, self._journal_lines = inode, 0, 0
+            file.seek(self._offset)
+            data = file.read()
+        # A torn last line (crash mid-write) is left for the writer that repairs it
+        end = data.rfind(b"\n") + 1
+        now = time.time()
+        with self._lock:
+            for line in data[:end].splitlines():
+                self._journal_lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record["expires_at"] < now:
+                    continue
+                self._entries[record["key"]] = (
+                    record["expires_at"], record["fingerprint"], record["status_code"], record["content"]
+                )
+                self._entries.move_to_end(record["key"])
+            self._evict()
+        self._offset += end
+
+    def _append(self, key: str, expires_at: float, fingerprint: str, status_code: int, content: Any) -> None:
+        record = {"key": key, "expires_at": expires_at, "fingerprint": fingerprint,
+                  "status_code": status_code, "content": content}
+        try:
+            with self._locked(fcntl.LOCK_EX):
+                with open(self.path, "a+b") as file:
+                    file.seek(0, os.SEEK_END)
+                    line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+                    if file.tell():
+                        file.seek(-1, os.SEEK_END)
+                        if file.read(1) != b"\n":
+                            line = b"\n" + line
+                    file.write(line)
+                # Also picks up every other worker's lines, so compaction keeps them
+                self._read_new()
+                if self._journal_lines > 2 * self.max_keys:
+                    self._compact()
+        except Exception as e:
+            logger.error(f"Error persisting idempotency key: {str(e)}")
+
+    def _compact(self) -> None:
+        """Rewrite the journal with only the live entries (called with the journal locked and read)"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            records = [
+                {"key": key, "expires_at": expires_at, "fingerprint": fingerprint,
+                 "status_code": status_code, "content": content}
+                for key, (expires_at, fingerprint, status_code, content) in self._entries.items()
+            ]
+        with open(tmp_path, "w") as file:
+            for record in records:
+                file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+        self._inode = os.stat(self.path).st_ino
+        self._offset = os.path.getsize(self.path)
+        self._journal_lines = len(records)
+
+    def _load(self) -> None:
+        self._catch_up()
+        logger.info(f"Loaded {len(self._entries)} idempotency keys")
+
+_store = None
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Get or initialize the shared idempotency store"""
+    global _store
+    if _store is None:
+        _store = IdempotencyStore(
+            settings.IDEMPOTENCY_PATH or f"{settings.FILE_PATH}.idempotency",
+            settings.IDEMPOTENCY_TTL_SECONDS,
+            settings.IDEMPOTENCY_MAX_KEYS,
+        )
+    return _store
@@ -1,9 +1,24 @@
 import io
-from pdfminer.high_level import extract_text
+from typing import BinaryIO, Iterator, Union
+from pdfminer.high_level import extract_text, extract_pages
+from pdfminer.layout import LTTextContainer
+from api.core.tracing import span
 
 def parse_pdf(pdf_bytes: bytes) -> str:
     """
     Converts PDF bytes into a text string.
     """
-    pdf_stream = io.BytesIO(pdf_bytes)
-    return extract_text(pdf_stream)
\ No newline at end of file
+    with span("pdfminer.extract_text") as current:
+        pdf_stream = io.BytesIO(pdf_bytes)
+        text = extract_text(pdf_stream)
+        if current:
+            current.set_attribute("chars", len(text))
+        return text
+
+def iter_page_texts(source: Union[str, BinaryIO]) -> Iterator[str]:
+    """
+    Yield the text of each page in turn (source is a path or binary file).
+    Pages are parsed lazily, so a consumer that stops early skips the rest of the document.
+    """
+    for page in extract_pages(source):
+        yield "".join(element.get_text() for element in page if isinstance(element, LTTextContainer))
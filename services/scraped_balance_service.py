@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+
+from api.core.config import settings
+from services.cache_service import MISSING, get_cache
+from services.db_service import DatabaseService
+from services.scraping_service import ScraperError, refresh_balance, scrape_balance, scrape_metrics
+from services.statement_service import parse_amount
+
+logger = logging.getLogger(__name__)
+
+# scrypt cost for credential fingerprints (~16 MB, tens of ms per check)
+_SCRYPT_N, _SCRYPT_R, _SCRYPT_P = 2 ** 14, 8, 1
+
+def _fingerprint(password: str, salt: bytes) -> str:
+    return hashlib.scrypt(password.encode(), salt=salt, n=_SCRYPT_N, r=_SCRYPT_R, p=_SCRYPT_P).hex()
+
+def _cache_key(username: str) -> str:
+    return f"scrape:{username}:balance"
+
+class ScrapedBalanceCache:
+    """
+    Last scraped balance per bank user, written through to the shared cache
+    and financial_data. Entries carry a salted scrypt fingerprint of the
+    password, so a cached balance is only served to callers who could have
+    scraped it themselves.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        try:
+            entry = get_cache().backend.get(_cache_key(username))
+        except Exception as e:
+            logger.warning(f"Scraped balance cache read failed: {str(e)}")
+            return None
+        return None if entry is MISSING else entry
+
+    @staticmethod
+    async def load_stored(username: str) -> Optional[Dict[str, Any]]:
+        """The balance persisted in financial_data, shaped like a cache entry (no fingerprint)"""
+        row = await DatabaseService.get_balance(username)
+        if not row or row.get("last_updated") is None:
+            return None
+        updated = datetime.fromisoformat(str(row["last_updated"]).replace("Z", "+00:00"))
+        if updated.tzinfo is None:
+            updated = updated.replace(tzinfo=timezone.utc)
+        return {"balance": str(row["balance"]), "scrapedAt": updated.timestamp(), "backend": "stored"}
+
+    @staticmethod
+    async def verify(entry: Dict[str, Any], password: str) -> bool:
+        if not entry.get("fingerprint"):
+            return False
+        expected = await asyncio.to_thread(_fingerprint, password, bytes.fromhex(entry["salt"]))
+        return hmac.compare_digest(expected, entry["fingerprint"])
+
+    async def put(self, username: str, result: Dict[str, Any], password: Optional[str] = None,
+                  previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Write a scraped balance through to the cache and financial_data"""
+        scraped_at = time.time()
+        entry = {"balance": result["balance"], "account": result.get("account"),
+                 "backend": result.get("backend"), "scrapedAt": scraped_at}
+        if password is not None:
+            salt = secrets.token_bytes(16)
+            entry.update(salt=salt.hex(), fingerprint=await asyncio.to_thread(_fingerprint, password, salt))
+        elif previous and previous.get("fingerprint"):
+            # Session refreshes keep the fingerprint of the login that opened the session
+            entry.update(salt=previous["salt"], fingerprint=previous["fingerprint"])
+        try:
+            get_cache().backend.set(_cache_key(username), entry, self.ttl)
+        except Exception as e:
+            logger.warning(f"Scraped balance cache write failed: {str(e)}")
+
+        amount = parse_amount(result["balance"])
+        if amount is None:
+            logger.warning(f"Scraped balance for {username} is not a number; not persisted")
+        else:
+            await DatabaseService.upsert_balance(
+                username, result.get("account") or "primary", amount,
+                datetime.fromtimestamp(scraped_at, timezone.utc),
+            )
+        return entry
+
+_balance_cache: Optional[ScrapedBalanceCache] = None
+# Users with a background refresh running, so each gets at most one
+_refreshing: Set[str] = set()
+_refresh_tasks: Set[asyncio.Task] = set()
+
+def get_scraped_balance_cache() -> ScrapedBalanceCache:
+    """Get or initialize the scraped balance cache"""
+    global _balance_cache
+    if _balance_cache is None:
+        _balance_cache = ScrapedBalanceCache(settings.SCRAPE_CACHE_TTL_SECONDS)
+    return _balance_cache
+
+def _response(entry: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+    response = {"status": "balance", "balance": entry["balance"], "backend": entry.get("backend"),
+                "cached": cached, "ageSeconds": round(max(time.time() - entry["scrapedAt"], 0.0), 1)}
+    if entry.get("account"):
+        response["account"] = entry["account"]
+    return response
+
+async def _refresh(username: str, previous: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Re-read the balance through the user's logged-in session; None if there isn't one"""
+    try:
+        result = await asyncio.to_thread(refresh_balance, username)
+    except ScraperError as e:
+        logger.info(f"No balance refresh for {username}: {str(e)}")
+        return None
+    return await get_scraped_balance_cache().put(username, result, previous=previous)
+
+def _refresh_in_background(username: str, previous: Dict[str, Any]) -> None:
+    if username in _refreshing:
+        return
+    _refreshing.add(username)
+
+    async def run():
+        try:
+            await _refresh(username, previous)
+        except Exception as e:
+            logger.warning(f"Background balance refresh failed for {username}: {str(e)}")
+        finally:
+            _refreshing.discard(username)
+
+    task = asyncio.create_task(run())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+async def get_scraped_balance(username: str, password: str, otp: Optional[str] = None,
+                              max_age: Optional[float] = None, trusted: bool = False) -> Dict[str, Any]:
+    """
+    The /scrape flow with a balance cache in front of it. Without an OTP and
+    with max_age set, a balance scraped at most max_age seconds ago is
+    returned without logging in; once it is older than
+    SCRAPE_REFRESH_AHEAD_FRACTION of max_age, a logged-in session refreshes
+    it in the background. A stale entry is refreshed inline through that
+    session when it is still open. trusted callers (service API key) may
+    read balances without a matching password, including from financial_data.
+    """
+    cache = get_scraped_balance_cache()
+    if not otp and max_age is not None:
+        entry = cache.get(username)
+        if entry is None and trusted:
+            entry = await cache.load_stored(username)
+        if entry is not None and (trusted or await cache.verify(entry, password)):
+            age = time.time() - entry["scrapedAt"]
+            if age <= max_age:
+                scrape_metrics.record_cache("hit")
+                if age > max_age * settings.SCRAPE_REFRESH_AHEAD_FRACTION:
+                    _refresh_in_background(username, entry)
+                return _response(entry, cached=True)
+            refreshed = await _refresh(username, entry)
+            if refreshed is not None:
+                scrape_metrics.record_cache("stale")
+                return _response(refreshed, cached=False)
+        scrape_metrics.record_cache("miss")
+
+    # Selenium blocks for seconds; keep it off the event loop
+    result = await asyncio.to_thread(scrape_balance, username, password, otp)
+    if result.get("status") == "balance":
+        entry = await cache.put(username, result, password)
+        return _response(entry, cached=False)
+    return result
@@ -1,81 +1,266 @@
 import time
 import os
+import logging
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
+from api.core.config import settings
+from api.core.tracing import traced
 
-# Store browser instances per username
-browser_instances = {}
+logger = logging.getLogger(__name__)
 
 NODE_ENV = os.environ.get("NODE_ENV", "development")
 
-def init_browser():
-    options = Options()
-    # Adjust headless mode based on environment
-    options.headless = False if NODE_ENV == "production" else True
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-setuid-sandbox")
-    return webdriver.Chrome(ChromeDriverManager().install(), options=options)
+# Online banking login flow being scraped
+USERNAME_SELECTOR = "input#Main_ctl00_txtHBLogin"
+OTP_INPUT_SELECTOR = "input#Main_ctl00_txtOtpValue"
+LOGIN_BUTTON_SELECTOR = "button#Main_ctl00_btn"
+OTP_SUBMIT_BUTTON_SELECTOR = "button#Main_ctl00_btnSendOtp"
+BALANCE_SELECTOR = "#itemPlaceholderContainer"
+BALANCE_CELL_SELECTOR = f"{BALANCE_SELECTOR} tbody tr td:nth-child(3)"
+ACCOUNT_CELL_SELECTOR = f"{BALANCE_SELECTOR} tbody tr td:nth-child(1)"
+
+class ScraperError(Exception):
+    """Base class for scraping failures"""
+
+class ScraperUnsupported(ScraperError):
+    """The backend can't drive this page (e.g. the form is rendered by JavaScript)"""
+
+class ScraperSessionMissing(ScraperError):
+    """An OTP arrived for a user with no login in progress"""
+
+class ScraperBackend:
+    """
+    A way of driving the bank's login flow. Implementations keep per-user
+    state between start_login (credentials) and submit_otp (OTP + balance).
+    """
+    name = "base"
+
+    def start_login(self, username: str, password: str) -> dict:
+        raise NotImplementedError
+
+    def submit_otp(self, username: str, otp: str) -> dict:
+        raise NotImplementedError
+
+    def has_session(self, username: str) -> bool:
+        raise NotImplementedError
+
+    def refresh(self, username: str) -> dict:
+        """Re-read the balance through a session that has already passed the OTP step"""
+        raise ScraperSessionMissing(f"The {self.name} backend can't refresh balances")
+
+    def close(self, username: str) -> None:
+        raise NotImplementedError
+
+class SeleniumScraper(ScraperBackend):
+    """Drives a real Chrome; works for any page but costs a browser per user"""
+    name = "selenium"
+
+    def __init__(self, login_url: str):
+        self.login_url = login_url
+        # Store browser instances per username
+        self.browser_instances = {}
+
+    @traced("selenium.init_browser")
+    def init_browser(self):
+        options = Options()
+        # Adjust headless mode based on environment
+        if NODE_ENV != "production":
+            options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-setuid-sandbox")
+        return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+
+    def _driver(self, username: str):
+        if username not in self.browser_instances:
+            self.browser_instances[username] = self.init_browser()
+        return self.browser_instances[username]
+
+    def has_session(self, username: str) -> bool:
+        return username in self.browser_instances
+
+    @traced("selenium.start_login")
+    def start_login(self, username: str, password: str) -> dict:
+        driver = self._driver(username)
+        driver.get(self.login_url)
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, USERNAME_SELECTOR))
+        )
+        # Enter username
+        driver.find_element(By.CSS_SELECTOR, USERNAME_SELECTOR).send_keys(username)
+        # Simulate entering the password digit-by-digit
+        for digit in str(password):
+            driver.find_element(By.CSS_SELECTOR, USERNAME_SELECTOR).send_keys(digit)
+            time.sleep(1)
+        driver.find_element(By.CSS_SELECTOR, LOGIN_BUTTON_SELECTOR).click()
+        # Wait for OTP input to appear
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, OTP_INPUT_SELECTOR))
+        )
+        return {"status": "OTP_REQUIRED"}
+
+    @traced("selenium.submit_otp")
+    def submit_otp(self, username: str, otp: str) -> dict:
+        driver = self._driver(username)
+        # Enter OTP and submit
+        otp_field = WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, OTP_INPUT_SELECTOR))
+        )
+        otp_field.clear()
+        otp_field.send_keys(otp)
+        time.sleep(1)
+        driver.find_element(By.CSS_SELECTOR, OTP_SUBMIT_BUTTON_SELECTOR).click()
+        return self._read_balance(driver)
+
+    @traced("selenium.refresh")
+    def refresh(self, username: str) -> dict:
+        driver = self.browser_instances.get(username)
+        if driver is None:
+            raise ScraperSessionMissing("No browser session for this user")
+        driver.refresh()
+        try:
+            return self._read_balance(driver)
+        except Exception as e:
+            # Logged out (session timeout): the page no longer shows the accounts table
+            raise ScraperSessionMissing(f"Session is no longer logged in: {str(e)}")
+
+    def _read_balance(self, driver) -> dict:
+        # Wait for the balance element
+        WebDriverWait(driver, 15).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, BALANCE_SELECTOR))
+        )
+        balance_element = driver.find_element(By.CSS_SELECTOR, BALANCE_CELL_SELECTOR)
+        balance = balance_element.text.strip() if balance_element else None
+        if balance:
+            accounts = driver.find_elements(By.CSS_SELECTOR, ACCOUNT_CELL_SELECTOR)
+            result = {"status": "balance", "balance": balance}
+            if accounts and accounts[0].text.strip():
+                result["account"] = accounts[0].text.strip()
+            return result
+        raise ScraperError("Balance not found on page")
+
+    def close(self, username: str) -> None:
+        driver = self.browser_instances.pop(username, None)
+        if driver is not None:
+            driver.quit()
+
+class ScrapeMetrics:
+    """Per backend and step (login, otp, refresh) counters and recent latencies"""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._counts: Dict[tuple, Dict[str, int]] = defaultdict(lambda: {"success": 0, "failure": 0})
+        self._latencies: Dict[tuple, deque] = defaultdict(lambda: deque(maxlen=window))
+        self.cache = {"hit": 0, "miss": 0, "stale": 0}
+
+    def record(self, backend: str, step: str, success: bool, seconds: float) -> None:
+        with self._lock:
+            self._counts[(backend, step)]["success" if success else "failure"] += 1
+            self._latencies[(backend, step)].append(seconds)
+
+    def record_cache(self, outcome: str) -> None:
+        with self._lock:
+            self.cache[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = []
+            for (backend, step), counts in sorted(self._counts.items()):
+                latencies = sorted(self._latencies[(backend, step)])
+                total = counts["success"] + counts["failure"]
+                steps.append({
+                    "backend": backend,
+                    "step": step,
+                    **counts,
+                    "successRate": round(counts["success"] / total, 4) if total else None,
+                    "p50Ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                    "p95Ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1)
+                    if latencies else None,
+                })
+            return {"steps": steps, "cache": dict(self.cache)}
+
+scrape_metrics = ScrapeMetrics()
+
+def _timed(backend: ScraperBackend, step: str, call, *args) -> dict:
+    start = time.perf_counter()
+    try:
+        result = call(*args)
+    except Exception:
+        scrape_metrics.record(backend.name, step, False, time.perf_counter() - start)
+        raise
+    scrape_metrics.record(backend.name, step, True, time.perf_counter() - start)
+    return result
+
+_backends: Dict[str, ScraperBackend] = {}
+_backends_lock = threading.Lock()
+# Backend holding each user's login in progress, so the OTP step reaches the same session
+_session_backends: Dict[str, str] = {}
+
+def get_scraper_backend(name: str) -> ScraperBackend:
+    """Get or initialize a scraper backend by name ("http" or "selenium")"""
+    with _backends_lock:
+        if name not in _backends:
+            if name == "http":
+                from services.http_scraper import HttpSessionScraper
+                _backends[name] = HttpSessionScraper(settings.SCRAPER_LOGIN_URL, settings.SCRAPER_TIMEOUT_SECONDS,
+                                                     settings.SCRAPER_SESSION_TTL_SECONDS)
+            elif name == "selenium":
+                _backends[name] = SeleniumScraper(settings.SCRAPER_LOGIN_URL)
+            else:
+                raise ValueError(f"Unknown scraper backend: {name}")
+        return _backends[name]
+
+def _login_backends() -> list:
+    """Backends to try for a new login, in order"""
+    if settings.SCRAPER_BACKEND == "auto":
+        return ["http", "selenium"]
+    return [settings.SCRAPER_BACKEND]
 
 def scrape_balance(username: str, password: str, otp: str = None) -> dict:
     """
     Drives the login/scraping flow:
       - Without OTP: navigates to the login page, fills in credentials, and waits for OTP.
       - With OTP: submits the OTP, waits for the balance element, and extracts the balance.
+    With SCRAPER_BACKEND=auto, logins use the HTTP-session backend and fall back
+    to Selenium when the page can't be driven without a browser.
     """
-    if username not in browser_instances:
-        browser_instances[username] = init_browser()
-    driver = browser_instances[username]
-    
     try:
-        login_url = "https://www.cihnet.co.ma"
-        username_selector = "input#Main_ctl00_txtHBLogin"
-        otp_input_selector = "input#Main_ctl00_txtOtpValue"
-        login_button_selector = "button#Main_ctl00_btn"
-        otp_submit_button_selector = "button#Main_ctl00_btnSendOtp"
-        balance_selector = "#itemPlaceholderContainer"
-
         if not otp:
-            driver.get(login_url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, username_selector))
-            )
-            # Enter username
-            driver.find_element(By.CSS_SELECTOR, username_selector).send_keys(username)
-            # Simulate entering the password digit-by-digit
-            for digit in str(password):
-                driver.find_element(By.CSS_SELECTOR, username_selector).send_keys(digit)
-                time.sleep(1)
-            driver.find_element(By.CSS_SELECTOR, login_button_selector).click()
-            # Wait for OTP input to appear
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, otp_input_selector))
-            )
-            return {"status": "OTP_REQUIRED"}
-        else:
-            # Enter OTP and submit
-            otp_field = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, otp_input_selector))
-            )
-            otp_field.clear()
-            otp_field.send_keys(otp)
-            time.sleep(1)
-            driver.find_element(By.CSS_SELECTOR, otp_submit_button_selector).click()
-            # Wait for the balance element
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, balance_selector))
-            )
-            balance_element = driver.find_element(
-                By.CSS_SELECTOR, f"{balance_selector} tbody tr td:nth-child(3)"
-            )
-            balance = balance_element.text.strip() if balance_element else None
-            if balance:
-                return {"status": "balance", "balance": balance}
-            else:
-                raise Exception("Balance not found on page")
+            for name in _login_backends():
+                backend = get_scraper_backend(name)
+                try:
+                    result = _timed(backend, "login", backend.start_login, username, password)
+                except ScraperUnsupported as e:
+                    logger.warning(f"Scraper backend {name} can't handle the login page, falling back: {str(e)}")
+                    backend.close(username)
+                    continue
+                _session_backends[username] = name
+                return {**result, "backend": name}
+            raise ScraperError("No scraper backend could handle the login page")
+
+        name = _session_backends.get(username)
+        if name is None or not get_scraper_backend(name).has_session(username):
+            # Sessions opened before a restart or by another worker are gone
+            raise ScraperSessionMissing("No login in progress for this user; submit credentials first")
+        backend = get_scraper_backend(name)
+        result = _timed(backend, "otp", backend.submit_otp, username, otp)
+        return {**result, "backend": name}
     except Exception as e:
-        print("Error during scraping:", e)
-        raise
\ No newline at end of file
+        logger.error(f"Error during scraping: {str(e)}")
+        raise
+
+def refresh_balance(username: str) -> dict:
+    """Re-read a user's balance through their logged-in session, without a new login or OTP"""
+    name = _session_backends.get(username)
+    if name is None:
+        raise ScraperSessionMissing("No logged-in session for this user")
+    backend = get_scraper_backend(name)
+    result = _timed(backend, "refresh", backend.refresh, username)
+    return {**result, "backend": name}
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Index entries: (key hash, record offset, record length), sorted by hash
+_INDEX_ENTRY = struct.Struct("<QQI")
+
+# Cached files used this recently are never evicted (a reader may be about to open them)
+EVICT_GRACE_SECONDS = 60
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+class SharedRecordStore(Mapping):
+    """
+    Read-only key -> JSON record mapping backed by mmap'd files.
+    Every worker maps the same files, so the data lives once in the page cache
+    instead of once per process. Records are decoded on access.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as data_file:
+            self._data = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) \
+                if os.fstat(data_file.fileno()).st_size else b""
+        with open(f"{path}.idx", "rb") as index_file:
+            self._index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) \
+                if os.fstat(index_file.fileno()).st_size else b""
+        self._count = len(self._index) // _INDEX_ENTRY.size
+
+    @classmethod
+    def build(cls, path: str, items: Iterable[Tuple[str, Any]]) -> "SharedRecordStore":
+        """Write records to path (+ .idx) atomically and open the result"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Unique temp names so concurrent builders never clobber each other mid-write
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        entries = []
+        offset = 0
+        with open(path + suffix, "wb") as data_file:
+            for key, value in items:
+                record = key.encode() + b"\t" + json.dumps(value, separators=(",", ":")).encode() + b"\n"
+                data_file.write(record)
+                entries.append((_key_hash(key), offset, len(record)))
+                offset += len(record)
+        entries.sort()
+        with open(f"{path}.idx{suffix}", "wb") as index_file:
+            for entry in entries:
+                index_file.write(_INDEX_ENTRY.pack(*entry))
+        # Index first: a reader never sees new data with a stale index that covers it
+        os.replace(f"{path}.idx{suffix}", f"{path}.idx")
+        os.replace(path + suffix, path)
+        logger.info(f"Built shared record store {path} with {len(entries)} records")
+        return cls(path)
+
+    def _entry(self, position: int) -> Tuple[int, int, int]:
+        return _INDEX_ENTRY.unpack_from(self._index, position * _INDEX_ENTRY.size)
+
+    def _find(self, key: str) -> Optional[bytes]:
+        target = _key_hash(key)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < target:
+                low = middle + 1
+            else:
+                high = middle
+        prefix = key.encode() + b"\t"
+        # Walk past hash collisions, comparing the stored key
+        while low < self._count:
+            key_hash, offset, length = self._entry(low)
+            if key_hash != target:
+                break
+            if self._data[offset:offset + len(prefix)] == prefix:
+                return self._data[offset + len(prefix):offset + length]
+            low += 1
+        return None
+
+    def __getitem__(self, key: str) -> Any:
+        raw = self._find(key)
+        if raw is None:
+            raise KeyError(key)
+        return json.loads(raw)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        offset = 0
+        while offset < len(self._data):
+            end = self._data.find(b"\n", offset)
+            tab = self._data.find(b"\t", offset, end)
+            yield self._data[offset:tab].decode()
+            offset = end + 1
+
+def share_mapping(name: str, source: Mapping, shared_dir: str) -> Mapping:
+    """
+    Return a shared, mmap'd copy of a read-mostly mapping when shared_dir is set,
+    or the mapping itself otherwise.
+    """
+    if not shared_dir:
+        return source
+    return SharedRecordStore.build(os.path.join(shared_dir, f"{name}.records"), source.items())
+
+class SharedFileCache:
+    """
+    Content cache of rendered artifacts on a directory shared by all workers.
+    Files are written atomically, so concurrent renders of the same key are harmless.
+    With max_bytes set, hits refresh a file's mtime and a sweep (after each
+    tenth of max_bytes written by this process) deletes the least recently
+    used files until the cache is back under 90% of the cap.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Sweep on the first write, to account for what earlier processes left
+        self._written = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str, extension: str = "") -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}{extension}")
+
+    def get_or_create(self, key: str, render: Callable[[], bytes], extension: str = "") -> str:
+        """Return the cached file path for key, rendering it first on a miss"""
+        path = self.path_for(key, extension)
+        if os.path.exists(path):
+            if not self.max_bytes:
+                return path
+            try:
+                os.utime(path)
+                return path
+            except FileNotFoundError:
+                pass  # Evicted meanwhile
+        content = render()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+        if self.max_bytes:
+            with self._lock:
+                self._written += len(content)
+                sweep = self._written >= self.max_bytes // 10
+                if sweep:
+                    self._written = 0
+            if sweep:
+                self.evict()
+        return path
+
+    def evict(self) -> int:
+        """Delete least recently used files until the cache is under 90% of max_bytes; returns how many"""
+        files = []
+        for subdirectory in os.scandir(self.directory):
+            if not subdirectory.is_dir():
+                continue
+            for entry in os.scandir(subdirectory.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return 0
+        target = self.max_bytes * 0.9
+        cutoff = time.time() - EVICT_GRACE_SECONDS
+        removed = 0
+        for mtime, size, path in sorted(files):
+            if total <= target or mtime > cutoff:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        logger.info(f"Evicted {removed} files from {self.directory} ({total} bytes left)")
+        return removed
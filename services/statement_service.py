@@ -0,0 +1,283 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import pdfplumber
+
+from api.core.config import settings
+from services.categorization_service import get_categorizer, category_label
+from services.text_matching import fold
+
+logger = logging.getLogger(__name__)
+
+_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})|(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4})")
+# Amounts always carry cents, which keeps reference numbers in descriptions from parsing as amounts
+_AMOUNT_TEXT = r"[-+]?\(?\d{1,3}(?:[  .,]?\d{3})*[.,]\d{2}\)?-?"
+_TEXT_ROW = re.compile(
+    rf"^(?P<date>\d{{1,2}}[/.-]\d{{1,2}}[/.-]\d{{2,4}}|\d{{4}}-\d{{2}}-\d{{2}})\s+"
+    rf"(?:\d{{1,2}}[/.-]\d{{1,2}}[/.-]\d{{2,4}}\s+)?"
+    rf"(?P<description>.+?)\s+(?P<amount>{_AMOUNT_TEXT})(?:\s+(?P<balance>{_AMOUNT_TEXT}))?$"
+)
+_CURRENCY = re.compile(r"\s*(?:mad|dhs?|eur|usd)\s*", re.IGNORECASE)
+
+# Header cell keywords (accent-folded) -> column role
+_HEADER_ROLES = [
+    ("valeur", None),
+    ("date", "date"),
+    ("libelle", "description"),
+    ("description", "description"),
+    ("designation", "description"),
+    ("operation", "description"),
+    ("details", "description"),
+    ("debit", "debit"),
+    ("credit", "credit"),
+    ("montant", "amount"),
+    ("amount", "amount"),
+    ("solde", "balance"),
+    ("balance", "balance"),
+]
+# Column layouts assumed for tables without a recognizable header row
+_POSITIONAL_LAYOUTS = {
+    3: ["date", "description", "amount"],
+    4: ["date", "description", "amount", "balance"],
+    5: ["date", "description", "debit", "credit", "balance"],
+}
+
+def parse_date(value: str) -> Optional[str]:
+    """Parse a statement date (DD/MM/YYYY, DD-MM-YY, DD.MM.YYYY or YYYY-MM-DD) to ISO format"""
+    match = _DATE.search(value or "")
+    if not match:
+        return None
+    if match.group(1):
+        year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    else:
+        day, month, year = int(match.group(4)), int(match.group(5)), int(match.group(6))
+        if year < 100:
+            year += 2000
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+def parse_amount(value: str) -> Optional[float]:
+    """
+    Parse an amount in French (1 234,56) or English (1,234.56) notation.
+    Parentheses and a trailing minus mark negative amounts.
+    """
+    text = _CURRENCY.sub("", (value or "").strip()).replace(" ", "").replace(" ", "")
+    if not text:
+        return None
+    negative = text.startswith("-") or text.endswith("-") or (text.startswith("(") and text.endswith(")"))
+    text = text.strip("+-()")
+    decimal = max(text.rfind(","), text.rfind("."))
+    # A lone separator followed by three digits is a thousands separator
+    if decimal != -1 and len(text) - decimal - 1 == 3 and text.count(text[decimal]) == 1 and \
+            not ("," in text and "." in text):
+        decimal = -1
+    if decimal == -1:
+        whole, cents = text, ""
+    else:
+        whole, cents = text[:decimal], text[decimal + 1:]
+    whole = whole.replace(",", "").replace(".", "")
+    if not whole.isdigit() or (cents and not cents.isdigit()):
+        return None
+    amount = float(f"{whole}.{cents or '0'}")
+    return -amount if negative else amount
+
+def _header_layout(cells: List[Optional[str]]) -> Optional[List[Optional[str]]]:
+    """Map header cells to column roles, or None if the row isn't a header"""
+    layout = []
+    for cell in cells:
+        folded = fold(cell or "")
+        role = next((role for keyword, role in _HEADER_ROLES if keyword in folded), None)
+        layout.append(role if role not in layout else None)
+    if "date" in layout and ({"amount", "debit", "credit"} & set(layout)):
+        return layout
+    return None
+
+def _row_from_cells(cells: List[Optional[str]], layout: List[Optional[str]]) -> Optional[Dict[str, Any]]:
+    values = {role: (cell or "").strip() for role, cell in zip(layout, cells) if role}
+    date = parse_date(values.get("date", ""))
+    description = " ".join(values.get("description", "").split())
+    if not date:
+        # Wrapped descriptions continue on a dateless row
+        return {"continuation": description} if description and not any(
+            values.get(role) for role in ("amount", "debit", "credit", "balance")
+        ) else None
+    if "amount" in values:
+        amount = parse_amount(values["amount"])
+    else:
+        debit = parse_amount(values.get("debit", ""))
+        credit = parse_amount(values.get("credit", ""))
+        if debit is None and credit is None:
+            amount = None
+        else:
+            amount = round((credit or 0.0) - abs(debit or 0.0), 2)
+    if amount is None:
+        return None
+    return {
+        "date": date,
+        "description": description,
+        "amount": amount,
+        "balance": parse_amount(values.get("balance", "")),
+    }
+
+def _rows_from_tables(tables: List[List[List[Optional[str]]]]) -> List[Dict[str, Any]]:
+    rows = []
+    for table in tables:
+        layout = None
+        for cells in table:
+            header = _header_layout(cells)
+            if header:
+                layout = header
+                continue
+            row = _row_from_cells(cells, layout or _POSITIONAL_LAYOUTS.get(len(cells), []))
+            if row is None:
+                continue
+            if "continuation" in row:
+                if rows:
+                    rows[-1]["description"] = f"{rows[-1]['description']} {row['continuation']}".strip()
+                continue
+            rows.append(row)
+    return rows
+
+def _rows_from_text(text: str) -> List[Dict[str, Any]]:
+    """Fallback for statements laid out without ruled tables"""
+    rows = []
+    for line in text.splitlines():
+        match = _TEXT_ROW.match(line.strip())
+        if not match:
+            continue
+        amount = parse_amount(match.group("amount"))
+        date = parse_date(match.group("date"))
+        if amount is None or date is None:
+            continue
+        rows.append({
+            "date": date,
+            "description": " ".join(match.group("description").split()),
+            "amount": amount,
+            "balance": parse_amount(match.group("balance") or ""),
+        })
+    return rows
+
+def extract_page_rows(page) -> List[Dict[str, Any]]:
+    """Transaction rows on one pdfplumber page: ruled tables first, text lines otherwise"""
+    rows = _rows_from_tables(page.extract_tables())
+    if not rows:
+        rows = _rows_from_text(page.extract_text() or "")
+    return rows
+
+def _open(source: Union[str, bytes]):
+    """Open a PDF from a path or from bytes (wrapped without copying)"""
+    return pdfplumber.open(source if isinstance(source, str) else io.BytesIO(source))
+
+def extract_pages(source: Union[str, bytes], page_numbers: List[int]) -> List[List[Dict[str, Any]]]:
+    """Extract rows from a batch of pages (runs in the worker pool, so it opens the document itself)"""
+    with _open(source) as pdf:
+        results = []
+        for page_number in page_numbers:
+            page = pdf.pages[page_number]
+            results.append(extract_page_rows(page))
+            # Release the page's parsed layout so memory stays bounded by the batch
+            page.close()
+        return results
+
+def count_pages(source: Union[str, bytes]) -> int:
+    with _open(source) as pdf:
+        return len(pdf.pages)
+
+_executor: Optional[Executor] = None
+
+def extraction_workers() -> int:
+    return settings.STATEMENT_EXTRACT_WORKERS or min(4, os.cpu_count() or 1)
+
+def get_extraction_executor() -> Optional[Executor]:
+    """Get or start the shared extraction process pool (None when configured for one worker)"""
+    global _executor
+    if _executor is None and extraction_workers() > 1:
+        # Spawned workers don't inherit the server's threads and event loop
+        _executor = ProcessPoolExecutor(extraction_workers(), mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"Started statement extraction pool with {extraction_workers()} workers")
+    return _executor
+
+def _reset_executor(executor: Optional[Executor]) -> None:
+    global _executor
+    if executor is not None and executor is _executor:
+        _executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+async def iter_statement_rows(
+    source: Union[str, bytes],
+    executor: Optional[Executor] = None,
+    pages_per_task: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Yield (page_number, rows) for every page of a statement, in page order.
+    Page batches are extracted concurrently by the worker pool with a bounded
+    number in flight, so memory stays flat however long the statement is.
+    Pass a path when a process pool is in use; bytes would be pickled for every batch.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor if executor is not None else get_extraction_executor()
+    pages_per_task = pages_per_task or settings.STATEMENT_EXTRACT_PAGES_PER_TASK
+    page_count = await asyncio.to_thread(count_pages, source)
+    batches = [list(range(start, min(start + pages_per_task, page_count)))
+               for start in range(0, page_count, pages_per_task)]
+    max_in_flight = 2 * (getattr(executor, "_max_workers", 1) if executor else 1)
+
+    pending = deque()
+    next_batch = 0
+    try:
+        while pending or next_batch < len(batches):
+            while next_batch < len(batches) and len(pending) < max_in_flight:
+                pending.append((batches[next_batch], loop.run_in_executor(executor, extract_pages, source, batches[next_batch])))
+                next_batch += 1
+            page_numbers, future = pending.popleft()
+            try:
+                results = await future
+            except BrokenProcessPool:
+                # A crashed worker poisons the pool; start a fresh one on the next request
+                _reset_executor(executor)
+                raise
+            for page_number, rows in zip(page_numbers, results):
+                yield page_number, rows
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+def to_bank_transaction(row: Dict[str, Any], account_id: str, index: int) -> Dict[str, Any]:
+    """Shape an extracted row like the /bank transactions"""
+    category = get_categorizer().categorize(row["description"]) if row["description"] else None
+    return {
+        "transaction_id": f"tx_{account_id}_stmt_{index}",
+        "account_id": account_id,
+        "amount": row["amount"],
+        "balance": row["balance"],
+        "date": row["date"],
+        "name": row["description"],
+        "merchant_name": row["description"],
+        "pending": False,
+        "category": list(category) if category else None,
+        "page": row["page"],
+    }
+
+def to_store_record(row: Dict[str, Any], account_id: str, statement_id: str, index: int) -> Dict[str, Any]:
+    """Shape an extracted row like StoreDataInput (requires a known balance)"""
+    category = get_categorizer().categorize(row["description"]) if row["description"] else None
+    record = {
+        "id": f"{statement_id}_{index}",
+        "balance": row["balance"],
+        "accountId": account_id,
+        "amount": row["amount"],
+        "description": row["description"],
+        "transaction_date": row["date"],
+    }
+    if category:
+        record["category"] = category_label(category)
+    return record
@@ -0,0 +1,82 @@
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, Iterator, List, Sequence, Tuple
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+
+@lru_cache(maxsize=65536)
+def fold(text: str) -> str:
+    """Lowercase and strip accents (Fès -> fes, Épicerie -> epicerie)"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+def tokenize(text: str) -> List[str]:
+    """Split folded text into alphanumeric words"""
+    return [token for token in _TOKEN_SPLIT.split(fold(text)) if token]
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: finds every occurrence of every pattern in one pass
+    over the text, in time linear in the text length plus matches.
+    Symbols can be characters (patterns are strings) or words (patterns are
+    token tuples matched against a token list, which gives word boundaries for free).
+    """
+
+    def __init__(self, patterns: Iterable[Sequence[Hashable]]):
+        self.patterns: List[Sequence[Hashable]] = list(patterns)
+        self._goto: List[Dict[Hashable, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            node = 0
+            for ch in pattern:
+                child = self._goto[node].get(ch)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][ch] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = child
+            self._out[node].append(pattern_id)
+
+        # Breadth-first so each node's failure link is computed after its parent's
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                link = self._goto[fallback].get(ch, 0)
+                self._fail[child] = link if link != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def step(self, state: int, ch: Hashable) -> int:
+        """Advance the automaton by one character (for callers feeding text incrementally)"""
+        goto, fail = self._goto, self._fail
+        while state and ch not in goto[state]:
+            state = fail[state]
+        return goto[state].get(ch, 0)
+
+    def matches_at(self, state: int) -> List[int]:
+        """Pattern IDs that end at the given state"""
+        return self._out[state]
+
+    def finditer(self, text: Sequence[Hashable]) -> Iterator[Tuple[int, int]]:
+        """Yield (start, pattern_id) for every match in text"""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        state = 0
+        for position, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for pattern_id in out[state]:
+                    yield position - len(patterns[pattern_id]) + 1, pattern_id
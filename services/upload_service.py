@@ -0,0 +1,222 @@
+import hashlib
+import io
+import logging
+import mmap
+import os
+import tempfile
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+# Bytes of the file part handed to the type sniffer
+SNIFF_BYTES = 2048
+# Allowance for multipart framing and form fields on top of the file size cap
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+class UploadError(Exception):
+    """Base class for rejected uploads"""
+
+class UploadTooLarge(UploadError):
+    pass
+
+class UnsupportedUpload(UploadError):
+    pass
+
+class MalformedUpload(UploadError):
+    pass
+
+class UploadBuffer:
+    """
+    Holds one uploaded file. Data stays in memory up to spool_max_bytes and
+    rolls over to a temp file beyond that, like SpooledTemporaryFile, but
+    readers get the bytes without another copy: the joined bytes object (or an
+    mmap of the file) backs the file object, memoryview and path accessors.
+    """
+
+    def __init__(self, max_bytes: int, spool_max_bytes: int, spill_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.spool_max_bytes = spool_max_bytes
+        self.spill_dir = spill_dir or None
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self._chunks: List[bytes] = []
+        self._data: Optional[bytes] = None
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._path_file = None
+
+    @property
+    def in_memory(self) -> bool:
+        return self._file is None
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"File exceeds the {self.max_bytes // (1024 * 1024)}MB limit")
+        self.sha256.update(data)
+        if self._file is None and self.size > self.spool_max_bytes:
+            self._file = tempfile.NamedTemporaryFile(dir=self.spill_dir, prefix="sahl-upload-", suffix=".pdf")
+            for chunk in self._chunks:
+                self._file.write(chunk)
+            self._chunks = []
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._chunks.append(data)
+
+    def finish(self) -> None:
+        """Seal the buffer once the upload is complete"""
+        if self._file is None:
+            self._data = b"".join(self._chunks)
+            self._chunks = []
+        else:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def getvalue(self) -> bytes:
+        """The uploaded bytes (in-memory uploads only; no copy is made)"""
+        if self._data is None:
+            raise ValueError("Upload was spooled to disk; use open() or as_path()")
+        return self._data
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self._data if self._data is not None else (self._mmap or b""))
+
+    def open(self) -> BinaryIO:
+        """A seekable binary file over the upload, for parsers that take file objects"""
+        if self._data is not None:
+            # BytesIO shares an immutable bytes object until something writes to it
+            return io.BytesIO(self._data)
+        if self._mmap is None:
+            return io.BytesIO(b"")
+        self._mmap.seek(0)
+        return self._mmap
+
+    def as_path(self) -> str:
+        """A filesystem path to the upload, for readers in other processes (writes memory uploads out once)"""
+        if self._file is not None:
+            return self._file.name
+        if self._path_file is None:
+            self._path_file = tempfile.NamedTemporaryFile(dir=self.spill_dir, prefix="sahl-upload-", suffix=".pdf")
+            self._path_file.write(self._data or b"")
+            self._path_file.flush()
+        return self._path_file.name
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        for file in (self._file, self._path_file):
+            if file is not None:
+                file.close()
+        self._chunks = []
+        self._data = None
+
+async def receive_upload(
+    request: Request,
+    file_field: str,
+    max_bytes: int,
+    spool_max_bytes: int,
+    sniff: Optional[Callable[[bytes], None]] = None,
+    spill_dir: Optional[str] = None,
+    max_fields: int = 32,
+    max_field_bytes: int = 4096,
+) -> Tuple[Dict[str, str], Optional[str], UploadBuffer]:
+    """
+    Stream a multipart/form-data body with a single file part straight into an UploadBuffer.
+    The size cap is enforced as bytes arrive, and sniff() sees the file's first
+    SNIFF_BYTES as soon as they are received, so bad uploads are rejected
+    without reading the rest of the body.
+    Returns (form fields, filename, buffer); the caller must close the buffer.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise UploadTooLarge(f"File exceeds the {max_bytes // (1024 * 1024)}MB limit")
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise MalformedUpload("Expected a multipart/form-data body")
+
+    fields: Dict[str, str] = {}
+    buffer = UploadBuffer(max_bytes, spool_max_bytes, spill_dir)
+    state = {"name": None, "filename": None, "is_file": False, "data": bytearray(),
+             "header_field": b"", "header_value": b"", "disposition": b"", "head": bytearray(),
+             "sniffed": sniff is None, "file_seen": False}
+
+    def check_sniff(final: bool) -> None:
+        if not state["sniffed"] and (final or len(state["head"]) >= SNIFF_BYTES):
+            state["sniffed"] = True
+            sniff(bytes(state["head"][:SNIFF_BYTES]))
+
+    def on_part_begin():
+        state.update(name=None, is_file=False, data=bytearray(), disposition=b"")
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        if state["header_field"].lower() == b"content-disposition":
+            state["disposition"] = state["header_value"]
+        state["header_field"] = state["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["disposition"])
+        if b"name" not in options:
+            raise MalformedUpload('The Content-Disposition header field "name" must be provided')
+        state["name"] = options[b"name"].decode("utf-8", "replace")
+        state["is_file"] = b"filename" in options
+        if state["is_file"]:
+            if state["name"] != file_field or state["file_seen"]:
+                raise MalformedUpload(f"Expected a single file in the '{file_field}' field")
+            state["file_seen"] = True
+            state["filename"] = options[b"filename"].decode("utf-8", "replace")
+        elif len(fields) >= max_fields:
+            raise MalformedUpload("Too many form fields")
+
+    def on_part_data(data, start, end):
+        chunk = data[start:end]
+        if state["is_file"]:
+            if not state["sniffed"]:
+                state["head"] += chunk
+                check_sniff(final=False)
+            buffer.write(chunk)
+        else:
+            state["data"] += chunk
+            if len(state["data"]) > max_field_bytes:
+                raise MalformedUpload(f"Form field '{state['name']}' is too long")
+
+    def on_part_end():
+        if state["is_file"]:
+            check_sniff(final=True)
+        else:
+            fields[state["name"]] = state["data"].decode("utf-8", "replace")
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+        if not state["file_seen"]:
+            raise MalformedUpload(f"Missing file field '{file_field}'")
+        buffer.finish()
+    except UploadError:
+        buffer.close()
+        raise
+    except Exception as e:
+        buffer.close()
+        raise MalformedUpload(f"Invalid multipart body: {str(e)}")
+
+    logger.info(f"Received upload {state['filename']} ({buffer.size} bytes, {'memory' if buffer.in_memory else 'spooled'})")
+    return fields, state["filename"], buffer
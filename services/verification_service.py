@@ -0,0 +1,245 @@
+import datetime
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.text_matching import AhoCorasick, fold, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Fields matched word by word (order- and case-insensitive partial credit)
+NAME_FIELDS = ("holderName", "documentName")
+# Fields matched on their alphanumeric characters, ignoring grouping (MA64 0112 ... == MA640112...)
+NUMBER_FIELDS = ("accountNumber", "iban")
+PERIOD_FIELD = "statementPeriod"
+
+MAX_POSITIONS = 10
+# Most a name's words can score when they are not next to each other (below any match threshold)
+PARTIAL_NAME_WEIGHT = 0.8
+
+_MONTHS = [
+    ("janvier", "january"), ("fevrier", "february"), ("mars", "march"), ("avril", "april"),
+    ("mai", "may"), ("juin", "june"), ("juillet", "july"), ("aout", "august"),
+    ("septembre", "september"), ("octobre", "october"), ("novembre", "november"),
+    ("decembre", "december"),
+]
+
+def _compact(value: str) -> str:
+    return "".join(ch for ch in fold(value) if ch.isalnum())
+
+def date_variants(value: datetime.date) -> List[str]:
+    """Compact spellings of a date as it may appear on a statement (01/03/2024, 2024-03-01, 1er mars 2024...)"""
+    dd, mm, yyyy = f"{value.day:02d}", f"{value.month:02d}", f"{value.year:04d}"
+    variants = {f"{dd}{mm}{yyyy}", f"{yyyy}{mm}{dd}"}
+    for month in _MONTHS[value.month - 1]:
+        for day in {str(value.day), dd} | ({"1er"} if value.day == 1 else set()):
+            variants.add(f"{day}{month}{yyyy}")
+    return sorted(variants)
+
+class _Page:
+    """
+    One normalization pass over a page's text, producing both views the
+    matchers need: folded word tokens and a compact alphanumeric stream.
+    Offsets map every token and compact character back to the original text.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens: List[str] = []
+        self.token_offsets: List[Tuple[int, int]] = []
+        self.compact: List[str] = []
+        self.compact_offsets: List[int] = []
+        # True where a match may start: after a separator or at a digit/letter switch
+        self.boundary: List[bool] = []
+
+        token: List[str] = []
+        token_start = 0
+        separated = True
+        for index, ch in enumerate(text):
+            for folded in fold(ch):
+                if folded.isalnum():
+                    previous = self.compact[-1] if self.compact else ""
+                    self.boundary.append(separated or previous.isdigit() != folded.isdigit())
+                    self.compact.append(folded)
+                    self.compact_offsets.append(index)
+                    if not token:
+                        token_start = index
+                    token.append(folded)
+                    separated = False
+                else:
+                    if token:
+                        self.tokens.append("".join(token))
+                        self.token_offsets.append((token_start, index))
+                        token = []
+                    separated = True
+        if token:
+            self.tokens.append("".join(token))
+            self.token_offsets.append((token_start, len(text)))
+
+    def compact_is_bounded(self, start: int, end: int) -> bool:
+        """Whether compact[start:end] is a whole alphanumeric run rather than part of a longer one"""
+        return self.boundary[start] and (end == len(self.compact) or self.boundary[end])
+
+class _FieldState:
+    def __init__(self, expected: str):
+        self.expected = expected
+        self.confidence = 0.0
+        self.positions: List[Dict[str, Any]] = []
+        self.seen_parts: set = set()
+        self.partial = False
+        # Token index of each name word's latest occurrence on the current page
+        self.last_seen: Dict[str, Tuple[int, int]] = {}
+
+    def record(self, confidence: float, page: int, start: int, end: int, text: str, partial: bool = False) -> None:
+        """
+        Record a match. Whole-value matches replace weaker evidence; partial
+        matches (single words, one end of a period) accumulate positions.
+        """
+        if confidence > self.confidence:
+            if not (partial and self.partial):
+                self.positions = []
+            self.confidence = confidence
+            self.partial = partial
+        if confidence == self.confidence or (partial and self.partial):
+            if len(self.positions) < MAX_POSITIONS:
+                self.positions.append({"page": page + 1, "start": start, "end": end, "text": text[start:end]})
+
+class DocumentVerifier:
+    """
+    Checks that a document mentions every expected field, in a single pass
+    over its pages. All fields are compiled into two Aho-Corasick automata
+    (word tokens for names, compact alphanumerics for numbers and dates), so
+    each page is scanned once however many fields are checked. Callers stop
+    feeding pages as soon as `resolved` is True.
+    """
+
+    def __init__(self, expected: Dict[str, Any]):
+        self.fields: Dict[str, _FieldState] = {}
+        self._name_parts: Dict[str, set] = {}
+        token_patterns: List[Tuple[str, ...]] = []
+        self._token_meta: List[Tuple[str, Optional[str]]] = []
+        compact_patterns: List[str] = []
+        self._compact_meta: List[Tuple[str, str, float]] = []
+        self._period_parts: set = set()
+
+        for field in NAME_FIELDS:
+            tokens = tuple(tokenize(expected.get(field) or ""))
+            if not tokens:
+                continue
+            self.fields[field] = _FieldState(expected[field])
+            self._name_parts[field] = set(tokens)
+            # The full name in order, plus each word for partial credit
+            token_patterns.append(tokens)
+            self._token_meta.append((field, None))
+            for token in self._name_parts[field]:
+                token_patterns.append((token,))
+                self._token_meta.append((field, token))
+
+        for field in NUMBER_FIELDS:
+            compact = _compact(expected.get(field) or "")
+            if not compact:
+                continue
+            self.fields[field] = _FieldState(expected[field])
+            compact_patterns.append(compact)
+            self._compact_meta.append((field, "value", 1.0))
+            # A Moroccan IBAN embeds the 24-digit RIB after the country code and check digits
+            if field == "iban" and len(compact) == 28 and compact[:2].isalpha():
+                compact_patterns.append(compact[4:])
+                self._compact_meta.append((field, "rib", 0.9))
+
+        period = [expected.get("statementStart"), expected.get("statementEnd")]
+        if any(period):
+            self.fields[PERIOD_FIELD] = _FieldState(" / ".join(str(value) for value in period if value))
+            for part, value in zip(("start", "end"), period):
+                if value:
+                    for variant in date_variants(value):
+                        compact_patterns.append(variant)
+                        self._compact_meta.append((PERIOD_FIELD, part, 1.0))
+                    self._period_parts.add(part)
+
+        self._token_automaton = AhoCorasick(token_patterns) if token_patterns else None
+        self._compact_automaton = AhoCorasick(compact_patterns) if compact_patterns else None
+        self.pages_scanned = 0
+
+    @property
+    def resolved(self) -> bool:
+        """True once every field has a full-confidence match"""
+        return all(state.confidence >= 1.0 for state in self.fields.values())
+
+    def feed(self, page_number: int, text: str) -> bool:
+        """Scan one page; returns True once every field is resolved"""
+        self.pages_scanned += 1
+        if self.resolved:
+            return True
+        page = _Page(text)
+        if self._token_automaton:
+            self._scan_tokens(page_number, page)
+        if self._compact_automaton and not self.resolved:
+            self._scan_compact(page_number, page)
+        return self.resolved
+
+    def feed_pages(self, pages: Iterable[str]) -> "DocumentVerifier":
+        for page_number, text in enumerate(pages):
+            if self.feed(page_number, text):
+                break
+        return self
+
+    def _scan_tokens(self, page_number: int, page: _Page) -> None:
+        patterns = self._token_automaton.patterns
+        for start, pattern_id in self._token_automaton.finditer(page.tokens):
+            field, part = self._token_meta[pattern_id]
+            state = self.fields[field]
+            end = start + len(patterns[pattern_id]) - 1
+            span = (page.token_offsets[start][0], page.token_offsets[end][1])
+            if part is None:
+                state.record(1.0, page_number, *span, page.text)
+                continue
+            parts = self._name_parts[field]
+            state.seen_parts.add(part)
+            state.last_seen[part] = (page_number, start)
+            # All words next to each other in another order (EL AMRANI Youssef) is the same name
+            latest = [state.last_seen.get(name_part) for name_part in parts]
+            if all(seen and seen[0] == page_number for seen in latest):
+                first = min(seen[1] for seen in latest)
+                if start - first == len(parts) - 1:
+                    state.record(1.0, page_number, page.token_offsets[first][0], span[1], page.text)
+                    continue
+            # Words present but never together are partial credit, capped well below a match
+            state.record(PARTIAL_NAME_WEIGHT * len(state.seen_parts) / len(parts), page_number, *span, page.text, partial=True)
+
+    def _scan_compact(self, page_number: int, page: _Page) -> None:
+        patterns = self._compact_automaton.patterns
+        for start, pattern_id in self._compact_automaton.finditer(page.compact):
+            field, part, weight = self._compact_meta[pattern_id]
+            state = self.fields[field]
+            end = start + len(patterns[pattern_id])
+            span = (page.compact_offsets[start], page.compact_offsets[end - 1] + 1)
+            # Digits embedded in a longer number are weak evidence
+            bounded = page.compact_is_bounded(start, end)
+            if field == PERIOD_FIELD:
+                if not bounded:
+                    continue
+                state.seen_parts.add(part)
+                confidence = len(state.seen_parts) / len(self._period_parts)
+                state.record(confidence, page_number, *span, page.text, partial=True)
+            else:
+                confidence = weight if bounded else 0.6 * weight
+                state.record(confidence, page_number, *span, page.text)
+            if self.resolved:
+                return
+
+    def results(self, threshold: float = 0.9) -> Dict[str, Any]:
+        """Per-field outcome, plus whether every field met the threshold"""
+        fields = {
+            field: {
+                "expected": state.expected,
+                "matched": state.confidence >= threshold,
+                "confidence": round(state.confidence, 2),
+                "positions": state.positions,
+            }
+            for field, state in self.fields.items()
+        }
+        return {
+            "verified": all(result["matched"] for result in fields.values()),
+            "pagesScanned": self.pages_scanned,
+            "fields": fields,
+        }
@@ -0,0 +1,433 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from api.core.config import settings
+from services.id_service import new_id
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "Sahl-Signature"
+
+# Responses that mean the endpoint will never accept the batch
+_PERMANENT_STATUSES = {400, 401, 403, 404, 410, 413, 422}
+
+def sign_payload(body: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Sahl-Signature header value: t=<unix time>,v1=<HMAC-SHA256 of "<t>.<body>">"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+def webhook_signing_secret() -> str:
+    """
+    WEBHOOK_SIGNING_SECRET, or else a key derived from API_KEY. Receivers see
+    the signing secret, so it must never be the API key itself.
+    """
+    if settings.WEBHOOK_SIGNING_SECRET:
+        return settings.WEBHOOK_SIGNING_SECRET
+    return hmac.new(settings.API_KEY.encode(), b"webhook-signing", hashlib.sha256).hexdigest()
+
+class WebhookUrlError(ValueError):
+    """Raised for a webhook URL the API must not send to"""
+
+def check_webhook_url(url: str) -> None:
+    """
+    Raise WebhookUrlError unless url is http(s) and every address its host
+    resolves to is public (unless WEBHOOK_ALLOW_PRIVATE_URLS), so webhooks can't
+    be aimed at loopback, private, link-local (cloud metadata) or other internal
+    hosts. Blocks on DNS; socket.gaierror propagates when the host doesn't resolve.
+    """
+    parts = urlsplit(url)
+    try:
+        port = parts.port
+    except ValueError:
+        raise WebhookUrlError("webhook must be an http(s) URL")
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise WebhookUrlError("webhook must be an http(s) URL")
+    if settings.WEBHOOK_ALLOW_PRIVATE_URLS:
+        return
+    for *_, sockaddr in socket.getaddrinfo(parts.hostname, port or 443, type=socket.SOCK_STREAM):
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise WebhookUrlError("webhook host must be a public address")
+
+def verify_signature(body: bytes, header: str, secret: str, tolerance_seconds: float = 300) -> bool:
+    """Check a Sahl-Signature header (for receivers), rejecting stale timestamps"""
+    try:
+        parts = dict(part.split("=", 1) for part in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance_seconds:
+        return False
+    return hmac.compare_digest(sign_payload(body, secret, timestamp), header)
+
+class WebhookQueue:
+    """
+    Persistent outbound queue (SQLite, shared by all workers). Events of one
+    item are delivered in order: a batch is only claimed when the item has
+    nothing in flight and its oldest pending event is due. Claims are leased,
+    so batches held by a worker that died are picked up again; a batch's
+    claimed_at is its lease, and only the current holder can settle it.
+    """
+
+    def __init__(self, path: str, lease_seconds: float):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS webhook_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                claimed_at REAL,
+                last_error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_webhook_events_item ON webhook_events(item_id, status, id);
+            CREATE INDEX IF NOT EXISTS idx_webhook_events_due ON webhook_events(status, next_attempt_at);
+            CREATE TABLE IF NOT EXISTS webhook_endpoints (
+                item_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL
+            );
+        """)
+
+    def set_endpoint(self, item_id: str, url: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO webhook_endpoints (item_id, url) VALUES (?, ?)", (item_id, url))
+
+    def endpoint(self, item_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT url FROM webhook_endpoints WHERE item_id = ?", (item_id,)).fetchone()
+        return row[0] if row else None
+
+    def enqueue(self, item_id: str, url: str, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO webhook_events (item_id, url, payload, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (item_id, url, json.dumps(event, separators=(",", ":")), time.time()),
+            )
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the earliest pending event is due (0 if one is due now), None if none are pending"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM webhook_events WHERE status = 'pending'"
+            ).fetchone()
+        return None if row[0] is None else max(row[0] - time.time(), 0.0)
+
+    def claim(self, max_batches: int, max_events: int) -> List[Tuple[str, str, List[int], List[Dict[str, Any]], int, float]]:
+        """Lease up to max_batches due batches as (item_id, url, event ids, events, attempts, lease)"""
+        now = time.time()
+        batches = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Leases of workers that died are released
+                self._conn.execute(
+                    "UPDATE webhook_events SET status = 'pending' WHERE status = 'inflight' AND claimed_at < ?",
+                    (now - self.lease_seconds,),
+                )
+                items = self._conn.execute("""
+                    SELECT e.item_id FROM webhook_events e
+                    WHERE e.status = 'pending' AND e.next_attempt_at <= ?
+                      AND e.id = (SELECT MIN(id) FROM webhook_events WHERE item_id = e.item_id AND status = 'pending')
+                      AND NOT EXISTS (SELECT 1 FROM webhook_events WHERE item_id = e.item_id AND status = 'inflight')
+                    ORDER BY e.id LIMIT ?
+                """, (now, max_batches)).fetchall()
+                for (item_id,) in items:
+                    rows = self._conn.execute(
+                        "SELECT id, url, payload, attempts FROM webhook_events WHERE item_id = ? AND status = 'pending' "
+                        "AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                        (item_id, now, max_events),
+                    ).fetchall()
+                    # A batch goes to one URL; events queued after a webhook change wait for the next one
+                    url = rows[0][1]
+                    for i, row in enumerate(rows):
+                        if row[1] != url:
+                            rows = rows[:i]
+                            break
+                    ids = [row[0] for row in rows]
+                    self._conn.execute(
+                        f"UPDATE webhook_events SET status = 'inflight', claimed_at = ? WHERE id IN ({','.join('?' * len(ids))})",
+                        (now, *ids),
+                    )
+                    batches.append((item_id, url, ids, [json.loads(row[2]) for row in rows], max(row[3] for row in rows), now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return batches
+
+    def _held(self, ids: List[int]) -> str:
+        """WHERE clause for a batch still under the given lease (parameters: ids, then the lease)"""
+        return f"id IN ({','.join('?' * len(ids))}) AND status = 'inflight' AND claimed_at = ?"
+
+    def renew(self, ids: List[int], lease: float) -> Optional[float]:
+        """Restart a batch's lease; returns the new lease, or None if it was lost (expired and re-claimed)"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(f"UPDATE webhook_events SET claimed_at = ? WHERE {self._held(ids)}", (now, *ids, lease))
+        return now if cursor.rowcount == len(ids) else None
+
+    def release(self, ids: List[int], lease: float) -> None:
+        """Hand a batch back unattempted"""
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE webhook_events SET status = 'pending', claimed_at = NULL WHERE {self._held(ids)}", (*ids, lease)
+            )
+
+    def delivered(self, ids: List[int], lease: float) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM webhook_events WHERE {self._held(ids)}", (*ids, lease))
+
+    def failed(self, ids: List[int], lease: float, error: str, retry_at: Optional[float]) -> None:
+        """Release a batch for retry at retry_at, or set it aside as dead when retry_at is None"""
+        with self._lock:
+            if retry_at is None:
+                self._conn.execute(
+                    f"UPDATE webhook_events SET status = 'dead', attempts = attempts + 1, last_error = ? WHERE {self._held(ids)}",
+                    (error, *ids, lease),
+                )
+            else:
+                self._conn.execute(
+                    f"UPDATE webhook_events SET status = 'pending', attempts = attempts + 1, next_attempt_at = ?, "
+                    f"claimed_at = NULL, last_error = ? WHERE {self._held(ids)}",
+                    (retry_at, error, *ids, lease),
+                )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM webhook_events GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+class WebhookDispatcher:
+    """
+    Delivers queued item webhooks in the background. Each endpoint (scheme,
+    host and port) gets its own pooled HTTP client and a cap on concurrent
+    requests. Events of one item that are due together go out as one signed
+    POST; failed batches are retried with exponential backoff and jitter
+    until WEBHOOK_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, queue: WebhookQueue):
+        self.queue = queue
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Set[asyncio.Task] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"delivered_events": 0, "delivered_batches": 0, "failed_attempts": 0, "dead_events": 0}
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+        if not settings.WEBHOOK_SIGNING_SECRET:
+            logger.warning("WEBHOOK_SIGNING_SECRET is not set; webhooks are signed with a key derived from API_KEY")
+        logger.info("Webhook dispatcher started")
+
+    def notify(self) -> None:
+        """Wake the dispatcher (safe to call from any thread)"""
+        if self._loop is None or self._wake is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            # Loop already closed
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # Cleared before looking, so an event queued meanwhile still wakes us
+                self._wake.clear()
+                due_in = await asyncio.to_thread(self.queue.next_due_in)
+                if due_in is None or due_in > 0:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=min(due_in if due_in is not None else 60.0, 60.0))
+                        # Let a burst of events for the same item land in one batch
+                        await asyncio.sleep(settings.WEBHOOK_BATCH_WINDOW_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                capacity = settings.WEBHOOK_MAX_INFLIGHT - len(self._inflight)
+                batches = []
+                if capacity > 0:
+                    batches = await asyncio.to_thread(self.queue.claim, capacity, settings.WEBHOOK_BATCH_MAX_EVENTS)
+                for batch in batches:
+                    task = asyncio.create_task(self._deliver(*batch))
+                    self._inflight.add(task)
+                    task.add_done_callback(self._on_done)
+                if not batches:
+                    # Due items all have a batch in flight (here or in another worker); a finished delivery wakes us
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook dispatcher error: {str(e)}")
+                await asyncio.sleep(1.0)
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _client(self, url: str) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self._clients:
+            limit = settings.WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT
+            self._clients[origin] = httpx.AsyncClient(
+                timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+            )
+            self._limits[origin] = asyncio.Semaphore(limit)
+        return self._clients[origin], self._limits[origin]
+
+    def _retry_delay(self, attempts: int, retry_after: Optional[str]) -> float:
+        delay = min(settings.WEBHOOK_RETRY_BASE_SECONDS * 2 ** attempts, settings.WEBHOOK_RETRY_MAX_SECONDS)
+        delay *= random.uniform(0.5, 1.0)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    async def _deliver(
+        self, item_id: str, url: str, ids: List[int], events: List[Dict[str, Any]], attempts: int, lease: float
+    ) -> None:
+        body = json.dumps({
+            "item_id": item_id,
+            "environment": settings.ENVIRONMENT,
+            "events": events,
+            "attempt": attempts + 1,
+        }, separators=(",", ":")).encode()
+        headers = {
+            "Content-Type": "application/json",
+            SIGNATURE_HEADER: sign_payload(body, webhook_signing_secret()),
+        }
+        error, retry_after, permanent = None, None, False
+        try:
+            # Checked on every delivery: the host's addresses may have changed since it was set
+            await asyncio.to_thread(check_webhook_url, url)
+        except WebhookUrlError as e:
+            error, permanent = str(e), True
+        except OSError as e:
+            error = f"{type(e).__name__}: {str(e)}"
+        if error is None:
+            client, limit = self._client(url)
+            # The lease runs from the claim: wait for a slot on this endpoint for at most half
+            # of it, then restart it for the request itself, or hand the batch back for later
+            try:
+                await asyncio.wait_for(limit.acquire(), timeout=self.queue.lease_seconds / 2)
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(self.queue.release, ids, lease)
+                return
+            try:
+                lease = await asyncio.to_thread(self.queue.renew, ids, lease)
+                if lease is None:
+                    logger.warning(f"Lost the lease on {len(ids)} webhook events for item {item_id}; not sending them")
+                    return
+                response = await client.post(url, content=body, headers=headers)
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {str(e)}"
+            finally:
+                limit.release()
+
+        if error is None:
+            if response.is_success:
+                await asyncio.to_thread(self.queue.delivered, ids, lease)
+                self.stats["delivered_events"] += len(ids)
+                self.stats["delivered_batches"] += 1
+                return
+            error = f"HTTP {response.status_code}"
+            retry_after = response.headers.get("Retry-After")
+            permanent = response.status_code in _PERMANENT_STATUSES
+
+        self.stats["failed_attempts"] += 1
+        if permanent or attempts + 1 >= settings.WEBHOOK_MAX_ATTEMPTS:
+            logger.error(f"Giving up on {len(ids)} webhook events for item {item_id} after {attempts + 1} attempts: {error}")
+            self.stats["dead_events"] += len(ids)
+            await asyncio.to_thread(self.queue.failed, ids, lease, error, None)
+            return
+        delay = self._retry_delay(attempts, retry_after)
+        logger.warning(f"Webhook delivery to {url} failed ({error}); retrying {len(ids)} events in {delay:.1f}s")
+        await asyncio.to_thread(self.queue.failed, ids, lease, error, time.time() + delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "inflight_batches": len(self._inflight), "endpoints": len(self._clients),
+                "queue": self.queue.counts()}
+
+_dispatcher: Optional[WebhookDispatcher] = None
+
+def get_webhook_dispatcher() -> WebhookDispatcher:
+    """Get or initialize the webhook dispatcher and its queue (WEBHOOK_QUEUE_PATH, default FILE_PATH + ".webhooks.db")"""
+    global _dispatcher
+    if _dispatcher is None:
+        queue = WebhookQueue(
+            settings.WEBHOOK_QUEUE_PATH or f"{settings.FILE_PATH}.webhooks.db",
+            lease_seconds=settings.WEBHOOK_TIMEOUT_SECONDS + 30,
+        )
+        _dispatcher = WebhookDispatcher(queue)
+    return _dispatcher
+
+def webhook_url(item_id: str, item: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """The item's webhook: one set through /item/webhook/update, else the one declared on the item"""
+    return get_webhook_dispatcher().queue.endpoint(item_id) or (item or {}).get("webhook")
+
+def queue_item_event(item: Dict[str, Any], webhook_type: str, webhook_code: str, **fields: Any) -> Optional[str]:
+    """
+    Queue a webhook event for an item and return its webhook_id, or None
+    when webhooks are off or the item has no webhook. Only writes to the
+    local queue; delivery happens in the background. Blocks on SQLite, so
+    async code uses emit_item_event.
+    """
+    if not settings.WEBHOOKS_ENABLED or not item:
+        return None
+    item_id = item["item_id"]
+    url = webhook_url(item_id, item)
+    if not url:
+        return None
+    event = {"webhook_id": new_id("whk"), "webhook_type": webhook_type, "webhook_code": webhook_code,
+             "item_id": item_id, "created_at": datetime.now(timezone.utc).isoformat(), **fields}
+    try:
+        dispatcher = get_webhook_dispatcher()
+        dispatcher.queue.enqueue(item_id, url, event)
+        dispatcher.notify()
+    except Exception as e:
+        logger.error(f"Failed to queue {webhook_type} webhook for item {item_id}: {str(e)}")
+        return None
+    return event["webhook_id"]
+
+async def emit_item_event(item: Dict[str, Any], webhook_type: str, webhook_code: str, **fields: Any) -> Optional[str]:
+    """queue_item_event off the event loop (the queue may wait on another worker's write lock)"""
+    return await asyncio.to_thread(queue_item_event, item, webhook_type, webhook_code, **fields)
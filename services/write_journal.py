@@ -0,0 +1,201 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class PendingWriteJournal:
+    """
+    Durable FIFO of database writes that couldn't be sent: one JSON row per
+    line, fsync'd before the write is acknowledged. Replay reads batches from
+    the committed offset (kept in a sidecar file) and commits past them once
+    the database has them; the file is truncated when fully replayed. Rows
+    that the database rejects outright are moved to a .rejected file so they
+    don't block the rows behind them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offset_path = f"{path}.offset"
+        self._rejected_path = f"{path}.rejected"
+        self._lock = threading.Lock()
+
+    def _ensure_directory(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """Serialize journal access across threads and worker processes"""
+        self._ensure_directory()
+        with self._lock:
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def replaying(self):
+        """
+        Yields True for the one process allowed to replay right now, False for
+        the others (batches and commits must not interleave across workers).
+        """
+        self._ensure_directory()
+        with open(f"{self.path}.replay.lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def _offset(self) -> int:
+        try:
+            with open(self._offset_path) as file:
+                return int(file.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_offset(self, offset: int) -> None:
+        temp_path = f"{self._offset_path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(str(offset))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self._offset_path)
+
+    @staticmethod
+    def _truncate_partial_tail(file) -> None:
+        """
+        Cut a line left without its newline by a crash mid-append (it was never
+        acknowledged), so the next rows don't get glued onto it.
+        """
+        end = file.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        position = end
+        while position > 0:
+            start = max(position - 4096, 0)
+            file.seek(start)
+            chunk = file.read(position - start)
+            if position == end and chunk.endswith(b"\n"):
+                return
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        logger.warning(f"Dropping {end - position} bytes of a partially written journal line")
+        file.truncate(position)
+
+    def append(self, rows: List[Dict[str, Any]]) -> None:
+        """Durably queue rows behind everything already pending"""
+        if not rows:
+            return
+        data = b"".join(json.dumps(row, separators=(",", ":")).encode() + b"\n" for row in rows)
+        with self._locked():
+            with open(self.path, "a+b") as file:
+                self._truncate_partial_tail(file)
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def pending_bytes(self) -> int:
+        return max(self._size() - self._offset(), 0)
+
+    def has_pending(self) -> bool:
+        return self.pending_bytes() > 0
+
+    def read_batch(self, max_rows: int) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        The next rows to replay, oldest first, and the offset just past each of
+        them. A line that isn't valid JSON is moved to the .rejected file and
+        committed past once it reaches the head, so it can't stall the journal.
+        """
+        with self._locked():
+            offset = self._offset()
+            rows, ends = [], []
+            try:
+                with open(self.path, "rb") as file:
+                    file.seek(offset)
+                    while len(rows) < max_rows:
+                        line = file.readline()
+                        if not line.endswith(b"\n"):
+                            # Missing or partially written tail
+                            break
+                        try:
+                            row = json.loads(line)
+                        except ValueError:
+                            if rows:
+                                # Rows before it are replayed first; it is at the head next time
+                                break
+                            offset += len(line)
+                            self._write_rejected([{"reason": "Undecodable journal line",
+                                                   "line": line.decode("utf-8", "replace").rstrip("\n")}])
+                            self._write_offset(offset)
+                            logger.error(f"Rejected an undecodable journal line ending at offset {offset}")
+                            continue
+                        offset += len(line)
+                        rows.append(row)
+                        ends.append(offset)
+            except FileNotFoundError:
+                pass
+            return rows, ends
+
+    def commit(self, offset: int) -> None:
+        """Mark everything before offset as replayed; compacts the journal once it is drained"""
+        with self._locked():
+            if offset >= self._size():
+                with open(self.path, "wb"):
+                    pass
+                offset = 0
+            self._write_offset(offset)
+
+    def _write_rejected(self, entries: List[Dict[str, Any]]) -> None:
+        with open(self._rejected_path, "ab") as file:
+            for entry in entries:
+                file.write(json.dumps(entry, separators=(",", ":")).encode() + b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def reject(self, rows: List[Dict[str, Any]], reason: str) -> None:
+        """Set aside rows the database refuses, with the reason"""
+        with self._locked():
+            self._write_rejected([{"reason": reason, "row": row} for row in rows])
+        logger.error(f"Rejected {len(rows)} journaled rows: {reason}")
+
+    def stats(self) -> Dict[str, Any]:
+        rejected = 0
+        try:
+            with open(self._rejected_path, "rb") as file:
+                rejected = sum(1 for _ in file)
+        except FileNotFoundError:
+            pass
+        return {"path": self.path, "pendingBytes": self.pending_bytes(), "rejectedRows": rejected}
+
+_write_journal: Optional[PendingWriteJournal] = None
+
+def get_write_journal() -> PendingWriteJournal:
+    """Get or initialize the pending write journal (DB_JOURNAL_PATH, default FILE_PATH + ".pending")"""
+    global _write_journal
+    if _write_journal is None:
+        _write_journal = PendingWriteJournal(settings.DB_JOURNAL_PATH or f"{settings.FILE_PATH}.pending")
+    return _write_journal
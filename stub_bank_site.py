@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Stub Online Banking Site
+
+A local stand-in for the bank's ASP.NET login flow, for exercising the
+scraper backends without real credentials: a login form with __VIEWSTATE
+and session cookie, an OTP form, then a redirect to an accounts page whose
+#itemPlaceholderContainer table holds the balance in its third column
+(app.state.balance; reloading the page re-reads it while the session lasts).
+/js serves the same login form rendered by JavaScript, which the HTTP
+backend can't drive (the scraper falls back to Selenium for it).
+
+Usage:
+    python stub_bank_site.py --port 8765 --otp 123456 --balance "12 345,67"
+    SCRAPER_LOGIN_URL=http://127.0.0.1:8765/ python main.py
+"""
+
+import argparse
+import asyncio
+import secrets
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, RedirectResponse
+
+SESSION_COOKIE = "ASP.NET_SessionId"
+
+def create_app(otp: str = "123456", balance: str = "12 345,67", latency_ms: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    # session id -> {"stage": ..., "viewstate": ..., "login": ...}
+    sessions = {}
+    app.state.sessions = sessions
+    app.state.balance = balance
+
+    async def delay():
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+    def page(title: str, body: str, session_id: str) -> HTMLResponse:
+        response = HTMLResponse(f"<!DOCTYPE html><html><head><title>{title}</title></head><body>{body}</body></html>")
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True)
+        return response
+
+    def login_form(viewstate: str) -> str:
+        return f"""
+        <form method="post" action="./Login.aspx" id="form1">
+          <input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />
+          <input type="hidden" name="__EVENTVALIDATION" value="ev-{viewstate[:8]}" />
+          <label>Identifiant</label>
+          <input name="ctl00$Main$ctl00$txtHBLogin" type="text" id="Main_ctl00_txtHBLogin" />
+          <input type="checkbox" name="ctl00$Main$ctl00$chkRemember" />
+          <button type="submit" name="ctl00$Main$ctl00$btn" id="Main_ctl00_btn" value="Connexion">Connexion</button>
+        </form>"""
+
+    def new_session() -> tuple:
+        session_id = secrets.token_hex(12)
+        viewstate = secrets.token_urlsafe(48)
+        sessions[session_id] = {"stage": "login", "viewstate": viewstate}
+        return session_id, viewstate
+
+    @app.get("/")
+    async def login_page():
+        await delay()
+        session_id, viewstate = new_session()
+        return page("Connexion", login_form(viewstate), session_id)
+
+    @app.get("/js")
+    async def login_page_js():
+        await delay()
+        session_id, viewstate = new_session()
+        script = login_form(viewstate).replace("\n", " ").replace('"', '\\"')
+        return page("Connexion", f'<div id="root"></div><script>document.getElementById("root").innerHTML = "{script}";</script>', session_id)
+
+    @app.post("/Login.aspx")
+    async def login(request: Request):
+        await delay()
+        form = await request.form()
+        session_id = request.cookies.get(SESSION_COOKIE)
+        session = sessions.get(session_id)
+        if (session is None or session["stage"] != "login" or form.get("__VIEWSTATE") != session["viewstate"]
+                or "ctl00$Main$ctl00$btn" not in form or not form.get("ctl00$Main$ctl00$txtHBLogin")):
+            return HTMLResponse("<html><body><p class='error'>Session expirée</p></body></html>", status_code=200)
+        session.update(stage="otp", login=form["ctl00$Main$ctl00$txtHBLogin"], viewstate=secrets.token_urlsafe(48))
+        return page("Code OTP", f"""
+        <form method="post" action="./Otp.aspx">
+          <input type="hidden" name="__VIEWSTATE" value="{session['viewstate']}" />
+          <p>Un code vous a été envoyé par SMS.</p>
+          <input name="ctl00$Main$ctl00$txtOtpValue" type="text" id="Main_ctl00_txtOtpValue" />
+          <button type="submit" name="ctl00$Main$ctl00$btnSendOtp" id="Main_ctl00_btnSendOtp" value="Valider">Valider</button>
+        </form>""", session_id)
+
+    @app.post("/Otp.aspx")
+    async def submit_otp(request: Request):
+        await delay()
+        form = await request.form()
+        session_id = request.cookies.get(SESSION_COOKIE)
+        session = sessions.get(session_id)
+        if (session is None or session["stage"] != "otp" or form.get("__VIEWSTATE") != session["viewstate"]
+                or "ctl00$Main$ctl00$btnSendOtp" not in form or form.get("ctl00$Main$ctl00$txtOtpValue") != otp):
+            return HTMLResponse("<html><body><p class='error'>Code invalide</p></body></html>", status_code=200)
+        session["stage"] = "accounts"
+        return RedirectResponse("./Comptes.aspx", status_code=303)
+
+    @app.get("/Comptes.aspx")
+    async def accounts(request: Request):
+        await delay()
+        session_id = request.cookies.get(SESSION_COOKIE)
+        session = sessions.get(session_id)
+        if session is None or session["stage"] != "accounts":
+            return RedirectResponse("./", status_code=302)
+        # No <tbody> in the markup, as on the real site; browsers add it when building the DOM
+        return page("Mes comptes", f"""
+        <table id="itemPlaceholderContainer">
+          <tr><th>Compte</th><th>Intitulé</th><th>Solde</th></tr>
+          <tr><td>0123456789</td><td>Compte courant</td><td>{app.state.balance}</td></tr>
+        </table>""", session_id)
+
+    return app
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub online banking site for scraper testing")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--otp", default="123456")
+    parser.add_argument("--balance", default="12 345,67")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added delay per response")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.otp, args.balance, args.latency_ms), host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Stub PostgREST
+
+A local stand-in for the Supabase REST endpoint with fault injection, for
+exercising the circuit breaker and pending write journal without a real
+database. Tables live in memory. Inserts honour on_conflict with
+Prefer: resolution=ignore-duplicates, and a duplicate transaction_id
+without it fails with SQLSTATE 23505, as the unique index does. Filters
+support eq. only. RPCs succeed without doing anything.
+
+POST /_faults {"mode": ..., "delay_ms": ..., "count": ...} sets how the next
+count requests fail (count 0 means until changed):
+  ok        answer normally
+  slow      sleep delay_ms, then answer normally
+  down      503 with a gateway error body (no SQLSTATE)
+  lost_ack  apply the write, then answer 503 (the acknowledgement is lost)
+GET /_rows/{table} returns a table's rows in insertion order.
+
+Usage:
+    python stub_postgrest.py --port 8766
+    SUPABASE_URL=http://127.0.0.1:8766 SUPABASE_KEY=stub.stub.stub python main.py
+"""
+
+import argparse
+import asyncio
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+UNIQUE_COLUMNS = {"transactions": "transaction_id"}
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+    tables: Dict[str, List[Dict[str, Any]]] = {}
+    app.state.tables = tables
+    app.state.fault = {"mode": "ok", "delay_ms": 0, "count": 0}
+
+    def take_fault() -> Dict[str, Any]:
+        fault = dict(app.state.fault)
+        if fault["mode"] != "ok" and fault["count"]:
+            app.state.fault["count"] -= 1
+            if app.state.fault["count"] == 0:
+                app.state.fault = {"mode": "ok", "delay_ms": 0, "count": 0}
+        return fault
+
+    def unavailable() -> JSONResponse:
+        return JSONResponse(status_code=503, content={"message": "An invalid response was received from the upstream server"})
+
+    @app.post("/_faults")
+    async def set_faults(request: Request):
+        body = await request.json()
+        app.state.fault = {"mode": body.get("mode", "ok"), "delay_ms": body.get("delay_ms", 0), "count": body.get("count", 0)}
+        return app.state.fault
+
+    @app.get("/_rows/{table}")
+    async def get_rows(table: str):
+        return tables.get(table, [])
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rpc(function: str):
+        fault = take_fault()
+        if fault["mode"] == "slow":
+            await asyncio.sleep(fault["delay_ms"] / 1000)
+        elif fault["mode"] in ("down", "lost_ack"):
+            return unavailable()
+        return Response(status_code=204)
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        fault = take_fault()
+        if fault["mode"] == "slow":
+            await asyncio.sleep(fault["delay_ms"] / 1000)
+        elif fault["mode"] in ("down", "lost_ack"):
+            return unavailable()
+        rows = tables.get(table, [])
+        for column, condition in request.query_params.items():
+            if condition.startswith("eq."):
+                rows = [row for row in rows if str(row.get(column)) == condition[3:]]
+        limit = request.query_params.get("limit")
+        return rows[:int(limit)] if limit else rows
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        body = await request.json()
+        fault = take_fault()
+        if fault["mode"] == "slow":
+            await asyncio.sleep(fault["delay_ms"] / 1000)
+        elif fault["mode"] == "down":
+            return unavailable()
+        rows = body if isinstance(body, list) else [body]
+        rows_table = tables.setdefault(table, [])
+        unique = UNIQUE_COLUMNS.get(table)
+        ignore_duplicates = "resolution=ignore-duplicates" in request.headers.get("prefer", "")
+        existing = {row.get(unique) for row in rows_table} if unique else set()
+        inserted = []
+        for row in rows:
+            if unique and row.get(unique) in existing:
+                if ignore_duplicates:
+                    continue
+                return JSONResponse(status_code=409, content={
+                    "code": "23505", "message": f"duplicate key value violates unique constraint on {unique}",
+                    "details": None, "hint": None,
+                })
+            if unique:
+                existing.add(row.get(unique))
+            inserted.append(row)
+        rows_table.extend(inserted)
+        if fault["mode"] == "lost_ack":
+            return unavailable()
+        return JSONResponse(status_code=201, content=inserted)
+
+    return app
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="In-memory PostgREST stand-in with fault injection")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host="127.0.0.1", port=args.port)
+
+if __name__ == "__main__":
+    main()
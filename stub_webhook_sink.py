@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Stub Webhook Receiver
+
+A local HTTP sink for item webhooks. It records every delivery, checks its
+Sahl-Signature against --secret, and tracks the peak number of concurrent
+requests (to observe the per-endpoint concurrency cap). Faults are set with
+POST /_faults {"fail_rate": 0.3, "delay_ms": 50, "fail_next": 2}:
+fail_rate answers that share of deliveries with 503, fail_next fails the
+next N, delay_ms holds every request open that long.
+GET /_received returns the recorded deliveries and counters.
+
+Usage:
+    python stub_webhook_sink.py --port 8767 --secret my-signing-secret
+    # then, with WEBHOOK_ALLOW_PRIVATE_URLS=true on the API, point an item at it:
+    # POST /bank/item/webhook/update {"webhook": "http://127.0.0.1:8767/hook", ...}
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from services.webhook_service import SIGNATURE_HEADER, verify_signature
+
+def create_app(secret: str) -> FastAPI:
+    app = FastAPI()
+    app.state.deliveries = []
+    app.state.faults = {"fail_rate": 0.0, "delay_ms": 0, "fail_next": 0}
+    app.state.counters = {"requests": 0, "failed": 0, "bad_signature": 0, "active": 0, "peak_active": 0}
+
+    @app.post("/_faults")
+    async def set_faults(request: Request):
+        app.state.faults.update(await request.json())
+        return app.state.faults
+
+    @app.get("/_received")
+    async def received():
+        return {"deliveries": app.state.deliveries, **app.state.counters}
+
+    @app.post("/hook")
+    async def hook(request: Request):
+        counters, faults = app.state.counters, app.state.faults
+        counters["requests"] += 1
+        counters["active"] += 1
+        counters["peak_active"] = max(counters["peak_active"], counters["active"])
+        try:
+            body = await request.body()
+            if faults["delay_ms"]:
+                await asyncio.sleep(faults["delay_ms"] / 1000)
+            if not verify_signature(body, request.headers.get(SIGNATURE_HEADER, ""), secret):
+                counters["bad_signature"] += 1
+                return JSONResponse(status_code=401, content={"error": "bad signature"})
+            if faults["fail_next"] > 0 or random.random() < faults["fail_rate"]:
+                faults["fail_next"] = max(faults["fail_next"] - 1, 0)
+                counters["failed"] += 1
+                return JSONResponse(status_code=503, content={"error": "injected failure"})
+            app.state.deliveries.append({"received_at": time.time(), **json.loads(body)})
+            return {"received": True}
+        finally:
+            counters["active"] -= 1
+
+    return app
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Local webhook receiver with signature checks and fault injection")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--secret", required=True, help="WEBHOOK_SIGNING_SECRET of the API")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.secret), host="127.0.0.1", port=args.port)
+
+if __name__ == "__main__":
+    main()
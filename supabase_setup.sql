@@ -22,9 +22,67 @@ CREATE TABLE IF NOT EXISTS public.transactions (
     transaction_date TIMESTAMP WITH TIME ZONE DEFAULT now()
 );
 
+-- Create balance_history table (every recorded balance)
+CREATE TABLE IF NOT EXISTS public.balance_history (
+    id BIGSERIAL PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    balance DECIMAL(15, 2) NOT NULL,
+    source TEXT NOT NULL,
+    recorded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+-- Create balance_rollups table (min/max/close per day, week and month,
+-- maintained on write so history queries read one row per point)
+CREATE TABLE IF NOT EXISTS public.balance_rollups (
+    user_id TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    period TEXT NOT NULL CHECK (period IN ('day', 'week', 'month')),
+    period_start DATE NOT NULL,
+    min_balance DECIMAL(15, 2) NOT NULL,
+    max_balance DECIMAL(15, 2) NOT NULL,
+    close_balance DECIMAL(15, 2) NOT NULL,
+    close_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (user_id, period, period_start, account_id)
+);
+
+-- Record balance snapshots and fold them into the rollups in one statement.
+-- Snapshots are grouped per bucket first, so late (out of order) snapshots
+-- only move the close when they are newer than the bucket's current close.
+CREATE OR REPLACE FUNCTION public.record_balance_snapshots(snapshots JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    WITH snapshot AS (
+        SELECT * FROM jsonb_to_recordset(snapshots)
+            AS s(user_id TEXT, account_id TEXT, balance DECIMAL(15, 2), source TEXT, recorded_at TIMESTAMPTZ)
+    ), history AS (
+        INSERT INTO public.balance_history (user_id, account_id, balance, source, recorded_at)
+        SELECT user_id, account_id, balance, source, recorded_at FROM snapshot
+    )
+    INSERT INTO public.balance_rollups AS r
+        (user_id, account_id, period, period_start, min_balance, max_balance, close_balance, close_at, samples)
+    SELECT s.user_id, s.account_id, p.period,
+           date_trunc(p.period, s.recorded_at AT TIME ZONE 'UTC')::date,
+           min(s.balance), max(s.balance),
+           (array_agg(s.balance ORDER BY s.recorded_at DESC))[1],
+           max(s.recorded_at), count(*)
+    FROM snapshot s CROSS JOIN (VALUES ('day'), ('week'), ('month')) AS p(period)
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (user_id, period, period_start, account_id) DO UPDATE SET
+        min_balance = LEAST(r.min_balance, EXCLUDED.min_balance),
+        max_balance = GREATEST(r.max_balance, EXCLUDED.max_balance),
+        close_balance = CASE WHEN EXCLUDED.close_at >= r.close_at THEN EXCLUDED.close_balance ELSE r.close_balance END,
+        close_at = GREATEST(r.close_at, EXCLUDED.close_at),
+        samples = r.samples + EXCLUDED.samples
+$$;
+
 -- Add Row Level Security (RLS) policies
 ALTER TABLE public.financial_data ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.transactions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.balance_history ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.balance_rollups ENABLE ROW LEVEL SECURITY;
 
 -- Create policy for financial_data
 CREATE POLICY "Users can view their own financial data"
@@ -43,10 +101,27 @@ CREATE POLICY "Users can view their own transactions"
     FOR SELECT
     USING (auth.uid()::text = accountId);
 
+-- Create policy for balance history
+CREATE POLICY "Users can view their own balance history"
+    ON public.balance_history
+    FOR SELECT
+    USING (auth.uid()::text = user_id);
+
+CREATE POLICY "Users can view their own balance rollups"
+    ON public.balance_rollups
+    FOR SELECT
+    USING (auth.uid()::text = user_id);
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_financial_data_user_id ON public.financial_data(user_id);
 CREATE INDEX IF NOT EXISTS idx_transactions_account_id ON public.transactions(accountId);
 CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON public.transactions(created_at);
+-- Journal replay upserts on transaction_id, so a write is never stored twice
+CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_transaction_id ON public.transactions(transaction_id);
+-- Keyset pagination: (account, created_at, id) in page order, so a page seeks straight to its cursor
+CREATE INDEX IF NOT EXISTS idx_transactions_account_created_id ON public.transactions(accountId, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_category_created_id ON public.transactions(accountId, category, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_balance_history_user_recorded ON public.balance_history(user_id, account_id, recorded_at);
 
 -- Sample data for testing (optional)
 INSERT INTO public.financial_data (user_id, balance, account_id)
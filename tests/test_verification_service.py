@@ -0,0 +1,18 @@
+from services.verification_service import DocumentVerifier
+
+def test_name_in_order_matches():
+    results = DocumentVerifier({"holderName": "Youssef Amrani"}).feed_pages(["Titulaire: Youssef Amrani"]).results()
+    assert results["verified"]
+    assert results["fields"]["holderName"]["confidence"] == 1.0
+
+def test_name_words_reordered_match():
+    results = DocumentVerifier({"holderName": "Youssef Amrani"}).feed_pages(["AMRANI YOUSSEF"]).results()
+    assert results["verified"]
+
+def test_scattered_name_words_do_not_match():
+    results = DocumentVerifier({"holderName": "Youssef Amrani"}).feed_pages(
+        ["Youssef went to the market. Amrani later."]
+    ).results()
+    assert not results["verified"]
+    assert not results["fields"]["holderName"]["matched"]
+    assert results["fields"]["holderName"]["confidence"] < 0.9